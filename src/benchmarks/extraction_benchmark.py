@@ -0,0 +1,252 @@
+"""
+Benchmark suite of the review extractors on synthetic review files, see `synthetic_reviews`.
+
+Runs each extractor over a grid of chunk sizes, extracting and saving the reviews to Parquet,
+and reports rows per second, peak resident memory and output bytes of each run as JSON.
+Each run is a separate process, so peak memory is measured per run.
+Results include the git commit, and can be compared with the results of another commit with `--compare`.
+
+Run from the repository root:
+    python -m src.benchmarks.extraction_benchmark --rows 1000000 --gzip --output results.json
+    python -m src.benchmarks.extraction_benchmark --rows 1000000 --gzip --compare results.json
+
+The spark extractor requires pyspark, its peak memory excludes the JVM.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import pyarrow.dataset as ds
+
+from src.benchmarks.synthetic_reviews import write_reviews, RATING_WEIGHTS, TEXT_LENGTHS
+
+from typing import List, Optional, Dict, Any
+
+EXTRACTORS = ("pandas", "pandas_fast", "arrow", "spark")
+
+
+def run_extractor(
+        extractor: str,
+        path: str,
+        chunksize: Optional[int],
+        features: List[str],
+        maximum_words: Optional[int]
+    ) -> Dict[str, Any]:
+
+    """
+    Extracts `path` to Parquet in a temporary directory with one extractor, and measures the run.
+    Meant to run in a fresh process, see `run_in_subprocess`.
+    """
+    with tempfile.TemporaryDirectory() as outdir:
+        start_time = perf_counter()
+
+        if extractor in ("pandas", "pandas_fast"):
+            from src.etl.amazon_reviews.AmazonReviewsExtractor import AmazonReviewsExtractor
+
+            for _ in AmazonReviewsExtractor(
+                path,
+                chunksize = chunksize,
+                features = features,
+                maximum_words = maximum_words,
+                outdir = outdir,
+                parser = "fast" if extractor == "pandas_fast" else "pandas"
+            ):
+                pass
+
+        elif extractor == "arrow":
+            from src.etl.amazon_reviews.ArrowAmazonReviewsExtractor import ArrowAmazonReviewsExtractor
+
+            ArrowAmazonReviewsExtractor(
+                path,
+                max_chunksize = chunksize,
+                features = features,
+                maximum_words = maximum_words,
+                outdir = outdir
+            ).load()
+
+        elif extractor == "spark":
+            from src.etl.amazon_reviews.SparkAmazonReviewsExtractor import SparkAmazonReviewsExtractor
+
+            spark_extractor = SparkAmazonReviewsExtractor(
+                path,
+                features = features,
+                maximum_words = maximum_words,
+                outdir = f"{outdir}/spark"
+            )
+            spark_extractor.load()
+            spark_extractor.spark_session.stop()
+
+        else:
+            raise ValueError(f"extractor must be one of {EXTRACTORS}, got {extractor!r}.")
+
+        seconds = perf_counter() - start_time
+
+        return {
+            "seconds": seconds,
+            "peak_rss": peak_rss(),
+            "output_bytes": sum(file.stat().st_size for file in Path(outdir).rglob("*") if file.is_file()),
+            "output_rows": ds.dataset(outdir, format="parquet", partitioning="hive").count_rows(),
+        }
+
+
+def peak_rss() -> int:
+    """
+    Peak resident memory of this process in bytes.
+
+    Read from `/proc` on Linux, where `ru_maxrss` of a subprocess starts at the memory of its parent when forked.
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+
+    except OSError:
+        pass
+
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def run_in_subprocess(config: Dict[str, Any]) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-m", "src.benchmarks.extraction_benchmark", "--run", json.dumps(config)],
+        capture_output = True,
+        text = True
+    )
+
+    if result.returncode != 0:
+        return dict(config, error=result.stderr.strip().splitlines()[-1:])
+
+    return dict(config, **json.loads(result.stdout))
+
+
+def count_lines(path: str) -> int:
+    from pandas.io.common import get_handle
+
+    with get_handle(path, "rb", compression="infer", is_text=False) as handles:
+        return sum(1 for _ in handles.handle)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    The ratio of rows per second, peak memory and output bytes of each run to the same run in `baseline`.
+    """
+    key = lambda run: (run["extractor"], run["chunksize"])
+    baseline_runs = {key(run): run for run in baseline["runs"] if "error" not in run}
+    comparison = []
+
+    for run in results["runs"]:
+        if "error" in run or key(run) not in baseline_runs:
+            continue
+
+        baseline_run = baseline_runs[key(run)]
+        comparison.append({
+            "extractor": run["extractor"],
+            "chunksize": run["chunksize"],
+            "rows_per_sec_ratio": run["rows_per_sec"] / baseline_run["rows_per_sec"],
+            "peak_rss_ratio": run["peak_rss"] / baseline_run["peak_rss"],
+            "output_bytes_ratio": run["output_bytes"] / max(baseline_run["output_bytes"], 1),
+        })
+
+    return comparison
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--rating-weights", type=float, nargs=5, default=RATING_WEIGHTS)
+    parser.add_argument("--mean-words", type=int, default=60)
+    parser.add_argument("--text-length", choices=TEXT_LENGTHS, default="exponential")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--path", default=None, help="an existing review file to use instead of a synthetic one")
+    parser.add_argument("--extractors", nargs="+", choices=EXTRACTORS, default=["pandas", "pandas_fast", "arrow"])
+    parser.add_argument("--chunksizes", type=int, nargs="+", default=[50_000, 100_000, 500_000])
+    parser.add_argument("--features", nargs="+", default=["overall", "reviewText", "unixReviewTime"])
+    parser.add_argument("--maximum-words", type=int, default=100)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="results of an earlier run to compare with")
+    parser.add_argument("--run", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_extractor(**json.loads(args.run))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = args.path or os.path.join(tmpdir, "Synthetic_5.json" + (".gz" if args.gzip else ""))
+
+        if not args.path:
+            write_reviews(
+                path,
+                args.rows,
+                rating_weights = args.rating_weights,
+                mean_words = args.mean_words,
+                text_length = args.text_length
+            )
+
+        rows = count_lines(path)
+        runs = []
+
+        for extractor in args.extractors:
+            # Spark does not load in chunks
+            for chunksize in ([None] if extractor == "spark" else args.chunksizes):
+                run = run_in_subprocess({
+                    "extractor": extractor,
+                    "path": path,
+                    "chunksize": chunksize,
+                    "features": args.features,
+                    "maximum_words": args.maximum_words,
+                })
+
+                if "error" not in run:
+                    run["rows_per_sec"] = rows / run["seconds"]
+
+                runs.append(run)
+
+        results = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "dataset": {
+                "path": args.path,
+                "rows": rows,
+                "size_bytes": os.path.getsize(path),
+                "gzip": path.endswith(".gz"),
+                "rating_weights": None if args.path else args.rating_weights,
+                "mean_words": None if args.path else args.mean_words,
+                "text_length": None if args.path else args.text_length,
+            },
+            "runs": runs,
+        }
+
+    if args.compare:
+        with open(args.compare) as file:
+            results["comparison"] = compare(json.load(file), results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark of the projection-aware review parser against the `JsonReader` path of `AmazonReviewsExtractor`.
+
+Parses the same chunk of json lines with both parsers, keeping only `--features`, and with all fields.
+Uses synthetic reviews with the fields of the amazon review files, or the first `--rows` lines of `--path`.
+
+Run from the repository root:
+    python -m src.benchmarks.json_parsing_benchmark --rows 200000
+    python -m src.benchmarks.json_parsing_benchmark --path Books_5.json.gz --rows 200000
+"""
+import argparse
+import json
+from itertools import islice
+
+import pandas as pd
+from pandas.io.common import get_handle
+
+from src.etl.amazon_reviews import review_parsing
+from src.etl.amazon_reviews.review_parsing import parse_review_lines
+from src.etl.amazon_reviews.AmazonReviewsExtractor import AmazonReviewsExtractor
+from src.benchmarks.text_normalization_benchmark import time_it
+from src.benchmarks.synthetic_reviews import make_review_lines
+
+from typing import List, Optional
+
+
+def read_lines(path: str, rows: int) -> List[str]:
+    with get_handle(path, "r", compression="infer") as handles:
+        return list(islice(handles.handle, rows))
+
+
+def parse_json_reader(
+        extractor: AmazonReviewsExtractor,
+        lines: List[str],
+        features: Optional[List[str]]
+    ) -> pd.DataFrame:
+
+    """
+    The `JsonReader` path, every field is parsed before the features are selected.
+    """
+    df = extractor._get_object_parser(extractor._combine_lines(lines))
+
+    return df.loc[:, features] if features else df
+
+
+def parse_stdlib(lines: List[str], features: Optional[List[str]]) -> pd.DataFrame:
+    """
+    The projection-aware parser with the standard library `json` fallback.
+    """
+    loads = review_parsing.loads
+    review_parsing.loads = json.loads
+
+    try:
+        return parse_review_lines(lines, features)
+
+    finally:
+        review_parsing.loads = loads
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=None)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--features", nargs="+", default=["overall", "reviewText"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = read_lines(args.path, args.rows) if args.path else make_review_lines(args.rows)
+    extractor = AmazonReviewsExtractor(args.path or __file__, convert_dates=False)
+
+    pd.testing.assert_frame_equal(
+        parse_json_reader(extractor, lines[:1000], args.features),
+        parse_review_lines(lines[:1000], args.features)
+    )
+
+    results = {
+        "rows": len(lines),
+        "features": args.features,
+        "orjson": review_parsing.orjson is not None,
+    }
+
+    for name, features in (("projected", args.features), ("all_fields", None)):
+        json_reader = time_it(parse_json_reader, extractor, lines, features, repeat=args.repeat)
+        fast = time_it(parse_review_lines, lines, features, repeat=args.repeat)
+        stdlib = time_it(parse_stdlib, lines, features, repeat=args.repeat)
+
+        results[name] = {
+            "json_reader": json_reader,
+            "parse_review_lines": fast,
+            "parse_review_lines_stdlib": stdlib,
+            "speedup": json_reader / fast,
+            "speedup_stdlib": json_reader / stdlib,
+        }
+
+    extractor.close()
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
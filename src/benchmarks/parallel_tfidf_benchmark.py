@@ -0,0 +1,54 @@
+"""
+Benchmark of `ParallelTfIdfVectorizer` against fitting a single `TfidfVectorizer`, as `TfIdf.tf_idf_model` does.
+
+Runs on synthetic texts with the configuration of `TfIdf`, checks that the vocabularies and scores are equal,
+and reports seconds of `fit_transform` for each number of workers.
+
+Run from the repository root:
+    python -m src.benchmarks.parallel_tfidf_benchmark --rows 500000 --workers 2 4 8
+"""
+import argparse
+import json
+import os
+from time import perf_counter
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.benchmarks.synthetic_reviews import make_texts
+from src.models.tf_idf.ParallelTfIdfVectorizer import ParallelTfIdfVectorizer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--mean-words", type=int, default=60)
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count()])
+    parser.add_argument("--shard-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    texts = make_texts(args.rows, args.mean_words)
+    vectorizer_params = {"max_features": 1000, "min_df": 5, "ngram_range": (1, 3)}
+
+    start_time = perf_counter()
+    vectorizer = TfidfVectorizer(**vectorizer_params)
+    expected = vectorizer.fit_transform(texts)
+    results = {"rows": args.rows, "single_seconds": perf_counter() - start_time}
+
+    for workers in args.workers:
+        start_time = perf_counter()
+        parallel = ParallelTfIdfVectorizer(workers, args.shard_size, **vectorizer_params)
+        vectors = parallel.fit_transform(texts)
+        seconds = perf_counter() - start_time
+
+        assert (parallel.get_feature_names_out() == vectorizer.get_feature_names_out()).all()
+        assert np.allclose((vectors - expected).data, 0)
+
+        results[f"workers_{workers}_seconds"] = seconds
+        results[f"workers_{workers}_speedup"] = results["single_seconds"] / seconds
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
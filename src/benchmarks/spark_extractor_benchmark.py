@@ -0,0 +1,90 @@
+"""
+Benchmark of `SparkAmazonReviewsExtractor` against `AmazonReviewsExtractor` on the same file.
+
+Both extract, transform and save the reviews to Parquet in a temporary directory,
+the Spark extractor in `local[*]` mode on all cores of this machine.
+Spark session startup is timed separately, and not counted in the extraction time.
+
+Run from the repository root, requires pyspark:
+    python -m src.benchmarks.spark_extractor_benchmark --path data/raw/Sports_and_Outdoors_5.json.gz
+"""
+import argparse
+import json
+import os
+import tempfile
+from time import perf_counter
+
+import pyarrow.dataset as ds
+from pyspark.sql import SparkSession
+
+from src.etl.amazon_reviews.AmazonReviewsExtractor import AmazonReviewsExtractor
+from src.etl.amazon_reviews.SparkAmazonReviewsExtractor import SparkAmazonReviewsExtractor
+
+
+def count_rows(outdir: str) -> int:
+    return ds.dataset(outdir, format="parquet", partitioning="hive").count_rows()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", required=True)
+    parser.add_argument("--features", nargs="+", default=["overall", "reviewText", "unixReviewTime"])
+    parser.add_argument("--maximum-words", type=int, default=100)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--master", default="local[*]")
+    args = parser.parse_args()
+
+    results = {
+        "path": args.path,
+        "size_bytes": os.path.getsize(args.path),
+        "features": args.features,
+    }
+
+    with tempfile.TemporaryDirectory() as outdir:
+        pandas_outdir = os.path.join(outdir, "pandas")
+        os.makedirs(pandas_outdir)
+
+        start_time = perf_counter()
+        for _ in AmazonReviewsExtractor(
+            args.path,
+            chunksize = args.chunksize,
+            features = args.features,
+            maximum_words = args.maximum_words,
+            outdir = pandas_outdir
+        ):
+            pass
+
+        results["pandas"] = {
+            "seconds": perf_counter() - start_time,
+            "rows": count_rows(pandas_outdir),
+        }
+
+        start_time = perf_counter()
+        spark_session = SparkSession.builder.master(args.master).getOrCreate()
+        results["spark_startup_seconds"] = perf_counter() - start_time
+
+        spark_outdir = os.path.join(outdir, "spark")
+
+        start_time = perf_counter()
+        SparkAmazonReviewsExtractor(
+            args.path,
+            features = args.features,
+            maximum_words = args.maximum_words,
+            outdir = spark_outdir,
+            spark_session = spark_session
+        ).load()
+
+        results["spark"] = {
+            "seconds": perf_counter() - start_time,
+            "rows": count_rows(spark_outdir),
+            "default_parallelism": spark_session.sparkContext.defaultParallelism,
+        }
+        results["speedup"] = results["pandas"]["seconds"] / results["spark"]["seconds"]
+
+        spark_session.stop()
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
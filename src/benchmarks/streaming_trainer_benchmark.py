@@ -0,0 +1,111 @@
+"""
+Benchmark of `StreamingLinearTrainer` on synthetic Parquet review shards of growing size, see `synthetic_reviews`.
+
+Trains one epoch on each number of rows, and reports rows per second and peak resident memory of each run as JSON.
+Each run is a separate process, so peak memory is measured per run, and should stay flat as the rows grow.
+
+Run from the repository root:
+    python -m src.benchmarks.streaming_trainer_benchmark --rows 100000 1000000 5000000
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from src.benchmarks.extraction_benchmark import peak_rss
+from src.benchmarks.synthetic_reviews import make_texts, RATING_WEIGHTS
+from src.models.machine_learning.StreamingLinearTrainer import StreamingLinearTrainer
+
+from typing import Dict, Any
+
+
+def write_shards(
+        root: Path,
+        rows: int,
+        shard_size: int = 100_000,
+        mean_words: int = 60,
+        seed: int = 0
+    ) -> None:
+
+    """
+    Writes random reviews in Parquet files of `shard_size` rows, like the chunks saved by the extractor.
+    """
+    rs = np.random.RandomState(seed)
+
+    for shard, start in enumerate(range(0, rows, shard_size)):
+        size = min(shard_size, rows - start)
+
+        pd.DataFrame({
+            "overall": rs.choice(np.arange(1, 6), size=size, p=RATING_WEIGHTS).astype(np.float64),
+            "reviewText": make_texts(size, mean_words, rs=rs),
+        }).to_parquet(root / f"Books_5_{shard}.parquet", index=False)
+
+
+def run(config: Dict[str, Any]) -> Dict[str, Any]:
+    trainer = StreamingLinearTrainer(
+        config["task"],
+        batch_size = config["batch_size"],
+        clean = config["clean"]
+    )
+
+    start_time = perf_counter()
+    trainer.fit(config["path"])
+
+    return dict(
+        trainer.history[-1],
+        seconds = perf_counter() - start_time,
+        peak_rss_bytes = peak_rss()
+    )
+
+
+def run_in_subprocess(config: Dict[str, Any]) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-m", "src.benchmarks.streaming_trainer_benchmark", "--run", json.dumps(config)],
+        capture_output = True,
+        text = True
+    )
+
+    if result.returncode != 0:
+        return dict(config, error=result.stderr.strip().splitlines()[-1:])
+
+    return dict(config, **json.loads(result.stdout))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--task", choices=["classification", "regression"], default="classification")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--mean-words", type=int, default=60)
+    parser.add_argument("--no-clean", dest="clean", action="store_false", help="hash the texts without cleaning")
+    parser.add_argument("--run", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(json.loads(args.run))))
+        return
+
+    results = []
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_shards(Path(tmpdir), rows, mean_words=args.mean_words)
+
+            results.append(run_in_subprocess({
+                "rows": rows,
+                "path": tmpdir,
+                "task": args.task,
+                "batch_size": args.batch_size,
+                "clean": args.clean,
+            }))
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
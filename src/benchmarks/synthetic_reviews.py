@@ -0,0 +1,156 @@
+"""
+Generator of synthetic json lines review files in the format of the amazon review dumps, see https://nijianmo.github.io/amazon/index.html.
+
+Run from the repository root, `.gz` paths are gzip compressed:
+    python -m src.benchmarks.synthetic_reviews data/synthetic/Books_5.json.gz --rows 1000000
+    python -m src.benchmarks.synthetic_reviews data/synthetic/Books_5.json --rows 1000000 --rating-weights 0.2 0.2 0.2 0.2 0.2
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.io.common import get_handle
+
+from src.benchmarks.text_normalization_benchmark import VOCABULARY
+
+from typing import List, Optional, Sequence, Union
+
+# Share of each rating from 1 to 5, skewed towards positive ratings like the real dumps
+RATING_WEIGHTS = (0.06, 0.05, 0.09, 0.2, 0.6)
+
+TEXT_LENGTHS = ("exponential", "lognormal", "fixed")
+
+
+def make_texts(
+        rows: int,
+        mean_words: int = 60,
+        text_length: str = "exponential",
+        irregular_whitespace_rate: float = 0.005,
+        rs: Optional[np.random.RandomState] = None
+    ) -> List[str]:
+
+    """
+    Random texts with word counts from the `text_length` distribution with mean `mean_words`,
+    words are mostly separated by single spaces and otherwise by double spaces or line breaks.
+    """
+    rs = rs or np.random.RandomState(0)
+
+    if text_length == "exponential":
+        lengths = rs.exponential(mean_words, size=rows)
+    elif text_length == "lognormal":
+        # sigma of 1 gives the long tail of real reviews, mu is set so that the mean is mean_words
+        lengths = rs.lognormal(np.log(mean_words) - 0.5, 1.0, size=rows)
+    elif text_length == "fixed":
+        lengths = np.full(rows, mean_words)
+    else:
+        raise ValueError(f"text_length must be one of {TEXT_LENGTHS}, got {text_length!r}.")
+
+    lengths = lengths.astype(int)
+    words = VOCABULARY[rs.randint(0, len(VOCABULARY), size=lengths.sum())]
+    separators = np.array([" ", "  ", "\n"])[
+        rs.choice(3, size=lengths.sum(), p=[1 - irregular_whitespace_rate, irregular_whitespace_rate / 2, irregular_whitespace_rate / 2])
+    ]
+
+    tokens = np.char.add(words, separators).tolist()
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    return ["".join(tokens[start:end]).strip() for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def make_review_lines(
+        rows: int,
+        rating_weights: Sequence[float] = RATING_WEIGHTS,
+        mean_words: int = 60,
+        text_length: str = "exponential",
+        seed: Union[int, Sequence[int]] = 0
+    ) -> List[str]:
+
+    """
+    Random json lines of reviews with the fields of the amazon review files,
+    including the nested `style` field, and `vote` and `image` fields on some of the reviews.
+    """
+    rs = np.random.RandomState(seed)
+    texts = make_texts(rows, mean_words, text_length, rs=rs)
+    ratings = rs.choice(5, size=rows, p=np.asarray(rating_weights) / np.sum(rating_weights)) + 1.0
+    times = rs.randint(946_684_800, 1_538_352_000, size=rows)
+    dates = pd.to_datetime(times, unit="s")
+    review_times = [f"{month:02d} {day}, {year}" for month, day, year in zip(dates.month, dates.day, dates.year)]
+    formats = np.array([" Paperback", " Hardcover", " Kindle Edition"])[rs.randint(0, 3, size=rows)]
+    lines = []
+
+    for i, text in enumerate(texts):
+        review = {
+            "overall": ratings[i],
+            "verified": bool(rs.rand() < 0.8),
+            "reviewTime": review_times[i],
+            "reviewerID": f"A{rs.randint(10**12):012d}",
+            "asin": f"{rs.randint(10**9):010d}",
+            "style": {"Format:": formats[i]},
+            "reviewerName": "Reviewer",
+            "reviewText": text,
+            "summary": " ".join(text.split()[:5]),
+            "unixReviewTime": int(times[i]),
+        }
+
+        if rs.rand() < 0.2:
+            review["vote"] = f"{rs.randint(2, 2000):,}"
+
+        if rs.rand() < 0.02:
+            review["image"] = [f"https://images.example.com/{rs.randint(10**9)}.jpg"]
+
+        lines.append(json.dumps(review) + "\n")
+
+    return lines
+
+
+def write_reviews(
+        path: Union[str, os.PathLike],
+        rows: int,
+        rating_weights: Sequence[float] = RATING_WEIGHTS,
+        mean_words: int = 60,
+        text_length: str = "exponential",
+        seed: int = 0,
+        batch_size: int = 100_000
+    ) -> None:
+
+    """
+    Writes `rows` random reviews to `path` in batches of `batch_size`, compressed if the suffix is eg. `.gz`.
+    Each batch is seeded with `seed` and the batch number, so files are reproducible.
+    """
+    with get_handle(path, "w", compression="infer") as handles:
+        for batch, start in enumerate(range(0, rows, batch_size)):
+            handles.handle.writelines(
+                make_review_lines(
+                    min(batch_size, rows - start),
+                    rating_weights = rating_weights,
+                    mean_words = mean_words,
+                    text_length = text_length,
+                    seed = [seed, batch]
+                )
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--rating-weights", type=float, nargs=5, default=RATING_WEIGHTS)
+    parser.add_argument("--mean-words", type=int, default=60)
+    parser.add_argument("--text-length", choices=TEXT_LENGTHS, default="exponential")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_reviews(
+        args.path,
+        args.rows,
+        rating_weights = args.rating_weights,
+        mean_words = args.mean_words,
+        text_length = args.text_length,
+        seed = args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
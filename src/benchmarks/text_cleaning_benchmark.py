@@ -0,0 +1,114 @@
+"""
+Benchmark of the batch text cleaning engine against the per-row cleaning previously used by `CleanData`.
+
+Run from the repository root:
+    python -m src.benchmarks.text_cleaning_benchmark --rows 250000 --workers 4
+
+Requires the nltk stop words, `nltk.download("stopwords")`, unless a file with one stop word per line is given.
+"""
+import argparse
+import json
+import os
+import re
+import warnings
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from src.benchmarks.synthetic_reviews import make_texts
+from src.text_transform.text_cleaning import clean_reviews
+
+from typing import List, Optional, Callable
+
+
+def make_reviews(
+        rows: int,
+        html_rate: float = 0.05,
+        mean_words: int = 60,
+        seed: int = 0
+    ) -> pd.Series:
+
+    """
+    Synthetic reviews with punctuation and numbers, where a share of `html_rate` contain tags and entities.
+    """
+    rs = np.random.RandomState(seed)
+    texts = np.array(make_texts(rows, mean_words=mean_words, rs=rs), dtype=object)
+    texts = texts + np.array([".", "!", " 5 stars.", "?!"], dtype=object)[rs.randint(0, 4, size=rows)]
+
+    has_html = rs.random_sample(rows) < html_rate
+    texts[has_html] = "<p>" + texts[has_html] + "<br /> &quot;Recommended&quot; &amp; <b>worth it</b></p>"
+
+    return pd.Series(texts)
+
+
+def per_row_review_to_words(raw_review: str, load_stop_words: Callable[[], List[str]]) -> str:
+    """
+    The previous implementation, parsing html and building the set of stop words for every text.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        review_text = BeautifulSoup(raw_review).get_text()
+
+    letters_only = re.sub("[^a-zA-Z]", " ", review_text)
+    words_lst = letters_only.lower().split()
+    stops = set(load_stop_words())
+
+    return " ".join([w for w in words_lst if not w in stops])
+
+
+def time_it(function, *args, **kwargs) -> float:
+    start_time = perf_counter()
+    function(*args, **kwargs)
+
+    return perf_counter() - start_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=250_000)
+    parser.add_argument("--html-rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--baseline-rows", type=int, default=20_000, help="rows to time the slow per-row cleaning on")
+    parser.add_argument("--stop-words", default=None, help="file with one stop word per line, default is nltk")
+    args = parser.parse_args()
+
+    stop_words: Optional[List[str]] = None
+
+    if args.stop_words:
+        with open(args.stop_words) as file:
+            stop_words = file.read().split()
+
+        load_stop_words = lambda: stop_words
+    else:
+        from nltk.corpus import stopwords
+
+        load_stop_words = lambda: stopwords.words("english")
+
+    text = make_reviews(args.rows, args.html_rate)
+    baseline_text = text.head(args.baseline_rows)
+
+    baseline = [per_row_review_to_words(review, load_stop_words) for review in baseline_text]
+    assert clean_reviews(baseline_text, stop_words).tolist() == baseline
+
+    per_row_seconds = time_it(lambda: [per_row_review_to_words(review, load_stop_words) for review in baseline_text])
+
+    results = {
+        "rows": args.rows,
+        "html_rate": args.html_rate,
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        # Extrapolated from `baseline_rows`, the per-row cleaning takes too long on the full benchmark
+        "per_row": per_row_seconds * args.rows / len(baseline_text),
+        "clean_reviews": time_it(clean_reviews, text, stop_words),
+        "clean_reviews_workers": time_it(clean_reviews, text, stop_words, workers=args.workers),
+    }
+    results["speedup"] = results["per_row"] / results["clean_reviews"]
+    results["speedup_workers"] = results["per_row"] / results["clean_reviews_workers"]
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark of the shared text normalization kernel against the per-row lambda previously used by the extractors.
+
+Run from the repository root:
+    python -m src.benchmarks.text_normalization_benchmark --rows 1000000 --maximum-words 100
+"""
+import argparse
+import json
+from functools import partial
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.text_transform.text_normalization import normalize_text_arrow, normalize_text_pandas
+
+
+VOCABULARY = np.array(
+    "the a book story read author plot characters great good bad boring loved hated "
+    "recommend pages ending series writing style could not put it down waste of time".split()
+)
+
+
+def make_reviews(
+        rows: int,
+        mean_words: int = 60,
+        irregular_whitespace_rate: float = 0.005,
+        seed: int = 0
+    ) -> pd.Series:
+
+    """
+    Random reviews with exponentially distributed word counts,
+    words are mostly separated by single spaces and otherwise by double spaces or line breaks.
+    """
+    rs = np.random.RandomState(seed)
+    lengths = rs.exponential(mean_words, size=rows).astype(int)
+    words = VOCABULARY[rs.randint(0, len(VOCABULARY), size=lengths.sum())]
+    separators = np.array([" ", "  ", "\n"])[
+        rs.choice(3, size=lengths.sum(), p=[1 - irregular_whitespace_rate, irregular_whitespace_rate / 2, irregular_whitespace_rate / 2])
+    ]
+
+    tokens = np.char.add(words, separators).tolist()
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    return pd.Series(["".join(tokens[start:end]) for start, end in zip(offsets[:-1], offsets[1:])])
+
+
+def per_row_lambda(text: pd.Series, maximum_words: int) -> pd.Series:
+    """
+    The previous implementation, note that it slices characters and not words.
+    """
+    return text.apply(lambda x: " ".join(x.split())[:maximum_words])
+
+
+def per_row_words(text: pd.Series, maximum_words: int) -> pd.Series:
+    """
+    Per-row lambda with the intended word truncation, the fair baseline for the kernel.
+    """
+    return text.apply(lambda x: " ".join(x.split()[:maximum_words]))
+
+
+def time_it(function, *args, repeat: int = 3) -> float:
+    timings = []
+
+    for _ in range(repeat):
+        start_time = perf_counter()
+        function(*args)
+        timings.append(perf_counter() - start_time)
+
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--maximum-words", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = make_reviews(args.rows)
+    arrow_text = pa.array(text, type=pa.string())
+
+    assert per_row_words(text.head(1000), args.maximum_words).equals(
+        normalize_text_pandas(text.head(1000), args.maximum_words)
+    )
+
+    results = {
+        "rows": args.rows,
+        "cpu_count": pa.cpu_count(),
+        "maximum_words": args.maximum_words,
+        "per_row_lambda": time_it(per_row_lambda, text, args.maximum_words, repeat=args.repeat),
+        "per_row_words": time_it(per_row_words, text, args.maximum_words, repeat=args.repeat),
+        "normalize_text_pandas": time_it(normalize_text_pandas, text, args.maximum_words, repeat=args.repeat),
+        "normalize_text_arrow": time_it(normalize_text_arrow, arrow_text, args.maximum_words, repeat=args.repeat),
+        "normalize_text_arrow_1_thread": time_it(
+            partial(normalize_text_arrow, threads=1), arrow_text, args.maximum_words, repeat=args.repeat
+        ),
+    }
+    results["speedup_pandas"] = results["per_row_words"] / results["normalize_text_pandas"]
+    results["speedup_arrow"] = results["per_row_words"] / results["normalize_text_arrow"]
+    results["speedup_arrow_1_thread"] = results["per_row_words"] / results["normalize_text_arrow_1_thread"]
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark of sparse top-k keyword extraction against the dense path previously used by `TfIdf.hottest_word`.
+
+Runs on random TF-IDF-like CSR matrices, and reports seconds and peak memory allocated by each path.
+
+Run from the repository root:
+    python -m src.benchmarks.top_k_benchmark --rows 1000000 --features 1000
+"""
+import argparse
+import json
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from src.models.tf_idf.top_k import top_k_per_row
+
+from typing import Callable, Dict, Any
+
+
+def make_scores(
+        rows: int,
+        features: int = 1000,
+        mean_terms: int = 20,
+        seed: int = 0
+    ) -> sp.csr_matrix:
+
+    """
+    Random L2 normalized scores with a Poisson number of terms per row,
+    rounded so that rows have ties like TF-IDF scores of terms with the same counts.
+    """
+    rs = np.random.RandomState(seed)
+    lengths = np.minimum(rs.poisson(mean_terms, size=rows), features)
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+
+    indices = np.concatenate([np.sort(rs.choice(features, size=length, replace=False)) for length in lengths])
+    data = np.round(rs.exponential(1.0, size=len(indices)), 1) + 0.1
+
+    scores = sp.csr_matrix((data, indices, indptr), shape=(rows, features))
+    norms = np.sqrt(np.asarray(scores.multiply(scores).sum(axis=1)).ravel())
+
+    return sp.csr_matrix(sp.diags(1 / np.maximum(norms, 1e-12)) @ scores)
+
+
+def dense_top_words(scores: sp.csr_matrix, feature_names: np.ndarray) -> pd.DataFrame:
+    """
+    The previous implementation, densifying the scores and taking `nlargest` of each row.
+    """
+    def get_top_words(row, n=5):
+        row = row[row > 0]
+        return row.nlargest(n).index.tolist()
+
+    df_vector = pd.DataFrame(scores.toarray().tolist(), columns=feature_names)
+    top_words = df_vector.apply(get_top_words, axis=1)
+
+    return pd.DataFrame({
+        f"hottest_word_{n + 1}": top_words.apply(lambda x: x[n] if len(x) > n else None) for n in range(5)
+    })
+
+
+def sparse_top_words(scores: sp.csr_matrix, feature_names: np.ndarray) -> pd.DataFrame:
+    top_columns, _ = top_k_per_row(scores, k=5)
+    top_words = np.where(top_columns >= 0, np.asarray(feature_names, dtype=object)[top_columns], None)
+
+    return pd.DataFrame(top_words, columns=[f"hottest_word_{n + 1}" for n in range(5)], dtype=object)
+
+
+def measure(function: Callable, *args) -> Dict[str, Any]:
+    tracemalloc.start()
+    start_time = perf_counter()
+    function(*args)
+    seconds = perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--features", type=int, default=1000)
+    parser.add_argument("--mean-terms", type=int, default=20)
+    parser.add_argument("--dense-rows", type=int, default=10_000, help="rows to measure the slow dense path on")
+    args = parser.parse_args()
+
+    scores = make_scores(args.rows, args.features, args.mean_terms)
+    feature_names = np.array([f"term_{i:05d}" for i in range(args.features)], dtype=object)
+    dense_scores = scores[:args.dense_rows]
+
+    assert dense_top_words(dense_scores, feature_names).equals(sparse_top_words(dense_scores, feature_names))
+
+    dense = measure(dense_top_words, dense_scores, feature_names)
+    sparse = measure(sparse_top_words, scores, feature_names)
+
+    results = {
+        "rows": args.rows,
+        "features": args.features,
+        "nnz": int(scores.nnz),
+        # Extrapolated from `dense_rows`, the dense path does not fit in memory for large matrices
+        "dense_seconds": dense["seconds"] * args.rows / dense_scores.shape[0],
+        "dense_peak_bytes": dense["peak_bytes"] * args.rows / dense_scores.shape[0],
+        "sparse_seconds": sparse["seconds"],
+        "sparse_peak_bytes": sparse["peak_bytes"],
+    }
+    results["speedup"] = results["dense_seconds"] / results["sparse_seconds"]
+    results["memory_ratio"] = results["dense_peak_bytes"] / results["sparse_peak_bytes"]
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
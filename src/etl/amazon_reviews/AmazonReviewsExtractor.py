@@ -2,12 +2,31 @@ import pandas as pd
 import numpy as np
 from numpy.random import RandomState
 import os
+import io
 from pathlib import Path
+from glob import glob, escape
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from itertools import islice
+from threading import Thread, Event, current_thread
+from queue import Queue, Full
+from time import perf_counter
 
 from pandas.io.json._json import JsonReader
 
-from typing import List, Optional, Union, Callable
+from src.text_transform.text_normalization import normalize_text_pandas
+from src.etl.amazon_reviews.GlobalRatingBalancer import GlobalRatingBalancer
+from src.etl.amazon_reviews.ReviewsIndex import ReviewsIndex
+from src.etl.amazon_reviews.ChunkManifest import ChunkManifest
+from src.etl.amazon_reviews.review_parsing import parse_review_lines
+from src.etl.amazon_reviews.ChunksizeTuner import ChunksizeTuner
+from src.etl.amazon_reviews.ReviewDeduplicator import ReviewDeduplicator
+from src.etl.amazon_reviews.DataProfile import DataProfile
 
+from typing import List, Optional, Union, Callable, Deque, Dict, Any, Tuple
+
+# Marks the end of the file in the prefetch queue
+_END_OF_FILE = object()
 
 
 class AmazonReviewsExtractor(JsonReader):
@@ -21,7 +40,7 @@ class AmazonReviewsExtractor(JsonReader):
     def __init__(
             self,
             path_or_buf: Union[str, os.PathLike],
-            chunksize: int = 100_000,
+            chunksize: Union[int, str] = 100_000,
             features: Optional[List[str]] = None,
             maximum_words: Optional[int] = None,
             review_text_columnn: str = "reviewText",
@@ -29,9 +48,21 @@ class AmazonReviewsExtractor(JsonReader):
             ratings_column: str = "overall",
             balance_num_pos_neg_ratings: bool = True,
             balance_neutral_reviews: bool = False,
+            balance_globally: bool = False,
+            seed: int = 0,
             convert_dates: Optional[List[str]] = ["unixReviewTime"],
             outdir: Optional[Union[str, os.PathLike]] = None,
-            save_method: Optional[Callable[[pd.DataFrame, os.PathLike], None]] = None
+            save_method: Optional[Callable[[pd.DataFrame, os.PathLike], Optional[List[str]]]] = None,
+            workers: Optional[int] = None,
+            max_chunks_in_flight: Optional[int] = None,
+            prefetch: Optional[int] = None,
+            resume: bool = False,
+            verify_checksums: bool = False,
+            parser: str = "pandas",
+            compact_dtypes: bool = False,
+            memory_budget: Optional[int] = None,
+            deduplicator: Optional[ReviewDeduplicator] = None,
+            profile: bool = False
         ) -> None:
 
         """
@@ -44,8 +75,11 @@ class AmazonReviewsExtractor(JsonReader):
             path to file to load data from, should be `.json`,
             can be compressed as long as pandas is able to infer compression type.
 
-        chunksize: int,
+        chunksize: int or "auto",
             the size of each chunk to load from data source (`path_or_buf`).
+            `"auto"` tunes the chunksize over the first chunks to maximize rows per second within `memory_budget`,
+            see `ChunksizeTuner`. Can not be combined with `balance_globally`, `resume`, `workers` or `seek_chunk`,
+            which need the same chunks on every run.
 
         features: list of feature names, optional,
             the features to extract from each chunk/DataFrame, 
@@ -72,6 +106,13 @@ class AmazonReviewsExtractor(JsonReader):
         balance_neutral_reviews: bool,
             balance the number of neutral reviews (`rating==3`) to the average of negative and positive reviews.
 
+        balance_globally: bool,
+            balance the ratings over the whole file instead of within each chunk, see `GlobalRatingBalancer`.
+            Costs an extra pass over the file counting ratings, without parsing, before the first chunk is loaded.
+
+        seed: int,
+            seed of the random sampling used to balance reviews.
+
         convert_dates: bool or list[str],
             optimistic if using bool, or specify the names of columns to convert to datetime objects.
 
@@ -82,6 +123,64 @@ class AmazonReviewsExtractor(JsonReader):
         save_method: function or callable, optional,
             if not specified chunks are saved as `.parquet` files. Use this variable to save chunks in other file formats.
             The callable should take two arguments a `DataFrane` and a `PathLike` used to overide saving method.
+            Must be picklable (ie. not a lambda) when `workers` is specified.
+            Use a `ParquetDatasetWriter` to save all chunks into one partitioned dataset.
+
+        workers: int, optional,
+            if specified parses, transforms and saves chunks in a pool of `workers` processes.
+            Chunks are still returned in order, and are numbered and named exactly as in serial mode.
+            Each chunk is balanced with its own random state seeded by `seed` and the chunk number.
+
+        max_chunks_in_flight: int, optional,
+            the maximum number of chunks read but not yet returned when `workers` is specified,
+            bounds memory usage. Default is `2 * workers`.
+
+        prefetch: int, optional,
+            if specified a background thread reads and parses up to `prefetch` chunks ahead,
+            while the current chunk is transformed and saved. Ignored when `workers` is specified.
+
+        resume: bool,
+            keep a `ChunkManifest` in `outdir` of the completed chunks, their source offsets, row counts, output files and checksums.
+            A restarted extractor with the same parameters skips completed chunks by seeking past them with a `ReviewsIndex`,
+            and redoes chunks whose output is missing or partial, or corrupt with `verify_checksums`. Requires `outdir`.
+            Each chunk is balanced with its own random state seeded by `seed` and the chunk number,
+            so the output does not depend on where a run was interrupted.
+
+        verify_checksums: bool,
+            when resuming, verify the sha256 checksums of the output files of completed chunks, which reads all of them again.
+            Otherwise only their sizes and modification times are verified, so a rerun of completed chunks is close to free.
+
+        parser: str,
+            `"pandas"` parses lines with `JsonReader`, which materializes every field before `features` are selected.
+            `"fast"` decodes lines with `orjson`, or `json` if not installed, and only builds the columns in `features`,
+            see `parse_review_lines`.
+
+        compact_dtypes: bool,
+            emit chunks with compact dtypes, `int8` ratings, categorical `asin` and `reviewerID`, bool `verified`,
+            and Arrow backed strings for the review text and `summary`. The dtypes are kept in saved `.parquet` files,
+            strings are read back Arrow backed with `pd.options.mode.string_storage = "pyarrow"`.
+            `chunk_stats` then also holds `memory_before` and `memory_after`, the bytes used by each chunk before and after.
+
+        memory_budget: int, optional,
+            the resident memory in bytes the extraction may use when `chunksize` is `"auto"`, default is half of the available memory.
+            The `chunk_stats` of trial chunks hold the `chunksize`, `rows_per_sec`, `rss` and `bytes_per_row` measured,
+            and the last trial chunk the `chosen_chunksize`.
+
+        deduplicator: ReviewDeduplicator, optional,
+            if specified drops reviews with the same reviewer and normalized text as a review in this or an earlier chunk,
+            after the other transformations. `chunk_stats` then also holds the `num_duplicates` dropped of each chunk.
+            With `workers` chunks are deduplicated and saved in order in this process. Can not be combined with `resume`.
+
+        profile: bool,
+            if True profiles the parsed chunks in the same pass, see `DataProfile`,
+            ie. the rating histogram, distinct reviewers and products and word count percentiles of the file.
+            Only the parsed columns are profiled, with `parser="fast"` those in `features`.
+            Available as `profile` during extraction, and saved to `outdir/_profile.json` once the file is exhausted.
+            With `workers` each chunk is profiled in its worker and the profiles are merged. Can not be combined with `resume`.
+
+        After each chunk `chunk_stats` holds a dict with `wait_time`, the seconds spent waiting for the chunk to be read and parsed, 
+        and `process_time`, the seconds spent transforming and saving it in this process. 
+        Wait times close to zero means the extractor is transform-bound, long wait times means it is bound by reading and parsing.
 
 
         ## Examples
@@ -89,6 +188,16 @@ class AmazonReviewsExtractor(JsonReader):
         Example `save_method` function: 
             >>> lambda df, path: pd.DataFrame.to_json(df, path)
         """
+        self._tuner: Optional[ChunksizeTuner] = None
+        self._last_finished: Optional[float] = None
+
+        if chunksize == "auto":
+            if balance_globally or resume or workers:
+                raise ValueError("chunksize='auto' can not be combined with balance_globally, resume or workers.")
+
+            self._tuner = ChunksizeTuner(memory_budget, chunks_in_memory=(prefetch or 0) + 1)
+            chunksize = self._tuner.chunksize
+
         super().__init__(
             path_or_buf,
             orient = None,
@@ -118,28 +227,292 @@ class AmazonReviewsExtractor(JsonReader):
         self.ratings_column = ratings_column
         self.balance_num_pos_neg_rating = balance_num_pos_neg_ratings
         self.balance_neutral_reviews = balance_neutral_reviews
+        self.balance_globally = balance_globally
+        self.seed = seed
         self.convert_dates = convert_dates
         self.outdir = outdir
         self.save_method = save_method
 
+        self.workers = workers
+        self.max_chunks_in_flight = max_chunks_in_flight if max_chunks_in_flight else 2 * (workers or 1)
+        self.prefetch = prefetch
+        self.resume = resume
+        self.verify_checksums = verify_checksums
+        self.parser = parser
+        self.compact_dtypes = compact_dtypes
+        self.deduplicator = deduplicator
+        self.profile = DataProfile(ratings_column, review_text_columnn) if profile else None
+
+        if resume and not outdir:
+            raise ValueError("outdir must be specified to resume extraction.")
+
+        if resume and deduplicator is not None:
+            raise ValueError("deduplicator can not be combined with resume, reviews of skipped chunks are not in the filter.")
+
+        if resume and profile:
+            raise ValueError("profile can not be combined with resume, skipped chunks would not be profiled.")
+
+        if parser not in ("pandas", "fast"):
+            raise ValueError(f"parser must be 'pandas' or 'fast', got {parser!r}.")
+
+        self.chunk_stats: List[Dict[str, Any]] = []
+        self.skipped_chunks: List[int] = []
+
         self._loaded_chunks = 0
+        self._read_chunks = 0
+        self._lines_read = 0
+
+        self._rs = RandomState(seed)
+        self._balancer: Optional[GlobalRatingBalancer] = None
+        self._index: Optional[ReviewsIndex] = None
+        self._seek_handle: Optional[io.TextIOWrapper] = None
+        self._manifest: Optional[ChunkManifest] = None
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Deque[Future] = deque()
+        self._is_exhausted = False
 
-        self._rs = RandomState(0)
+        self._prefetch_thread: Optional[Thread] = None
+        self._prefetch_queue: Optional[Queue] = None
+        self._stop_prefetch: Optional[Event] = None
 
 
     def __next__(self) -> Union[pd.DataFrame, None]:
         """
         Loads next chunk, or loads and saves the next chunk if `outpath` is specified.
         """
-        self._loaded_chunks += 1
+        try:
+            return self._next_chunk()
+
+        except StopIteration:
+            if self.profile is not None and self.outdir:
+                self.profile.save(f"{self.outdir}/_profile.json")
+
+            raise
+
+
+    def _next_chunk(self) -> Union[pd.DataFrame, None]:
+        if self.balance_globally and self.balance_num_pos_neg_rating and self._balancer is None:
+            self._balancer = GlobalRatingBalancer.from_file(
+                self.path_or_buf,
+                self.chunksize,
+                ratings_column = self.ratings_column,
+                balance_num_pos_neg_ratings = self.balance_num_pos_neg_rating,
+                balance_neutral_reviews = self.balance_neutral_reviews,
+                seed = self.seed
+            )
+
+        if self.resume and self._manifest is None:
+            self._manifest = ChunkManifest(self.outdir, self._fingerprint(), self.verify_checksums)
+
+        if self.workers:
+            return self._next_parallel()
+
+        if self._tuner is not None and self._tuner.is_tuning:
+            self._tuner.start()
+
+        chunk_start_time = perf_counter()
+        df, info = self._next_prefetched() if self.prefetch else self._next_parsed()
+        wait_time = perf_counter() - chunk_start_time
+        rss = self._tuner.rss() if self._tuner is not None and self._tuner.is_tuning else None
+
+        start_time = perf_counter()
+        df, info = self._process_chunk(df, info)
+
+        self._finish_chunk(info, wait_time, perf_counter() - start_time)
+
+        # With prefetch the chunk is read and parsed while earlier chunks are processed,
+        # so the time of a chunk is the time since the previous one finished, not its wait and process time
+        finished = perf_counter()
+        seconds = finished - (self._last_finished if self._last_finished is not None else chunk_start_time)
+        self._last_finished = finished
+
+        if rss is not None:
+            self._tune_chunksize(info, rss, seconds)
+
+        return df
+
+
+    def _tune_chunksize(
+            self,
+            info: Dict[str, Any],
+            rss: int,
+            seconds: float
+        ) -> None:
+
+        """
+        Records the chunk as a trial of the chunksize tuner, and sets the chunksize of the next chunk.
+        `seconds` is the wall-clock time since the previous chunk finished, including reading and parsing in the prefetch thread.
+
+        Chunks prefetched at an earlier chunksize are not trials of the current one, and are skipped.
+        """
+        if info["chunksize"] != self._tuner.chunksize:
+            return
+
+        stats = self.chunk_stats[-1]
+
+        stats.update(self._tuner.record(
+            info["num_records"],
+            seconds,
+            max(rss, self._tuner.rss())
+        ))
+
+        self.chunksize = self._tuner.chunksize
+
+
+    def __getstate__(self) -> dict:
+        """
+        Drops file handles and the process pool, 
+        so that the configuration of the extractor can be sent to worker processes.
+        """
+        state = self.__dict__.copy()
+        state.update(
+            data = None,
+            handles = None,
+            _executor = None,
+            _pending = deque(),
+            _prefetch_thread = None,
+            _prefetch_queue = None,
+            _stop_prefetch = None,
+            _seek_handle = None,
+            _manifest = None,
+            deduplicator = None
+        )
+
+        return state
+
+
+    def close(self) -> None:
+        """
+        Closes the underlying file and stops the process pool or prefetch thread if running.
+        """
+        if self._prefetch_thread is not None and self._prefetch_thread is not current_thread():
+            self._stop_prefetch.set()
+            self._prefetch_thread.join()
+            self._prefetch_thread = None
+
+        if self._executor is not None:
+            for future in self._pending:
+                future.cancel()
+
+            self._pending.clear()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        self._close_file()
+
+
+    def seek_chunk(self, chunk_number: int) -> None:
+        """
+        Positions the extractor so that the next chunk loaded is chunk number `chunk_number`, counting from 1,
+        without parsing the chunks before it. Chunks keep their numbering, and file names when saved.
+
+        Uses a `ReviewsIndex` of the file, which is built and saved next to the file on first use.
+        Must be called before iterating when `workers` or `prefetch` is specified.
+
+        ## Examples
+
+        Extract chunks 10 to 19 only, eg. in one of several processes sharing a file:
+            >>> extractor.seek_chunk(10)
+            >>> for df in islice(extractor, 10): ...
+        """
+        if self._executor is not None or self._prefetch_thread is not None:
+            raise RuntimeError("seek_chunk can not be called after chunks have been read in the background.")
+
+        if self._tuner is not None:
+            raise ValueError("seek_chunk can not be used with chunksize='auto', chunks vary in size.")
+
+        self._seek_record((chunk_number - 1) * self.chunksize, chunk_number)
+        self._loaded_chunks = chunk_number - 1
+        self._is_exhausted = False
+
+
+    def sample(
+            self,
+            num_rows: int,
+            seed: Optional[int] = None
+        ) -> pd.DataFrame:
+
+        """
+        Parses `num_rows` random reviews from the whole file without scanning it, using a `ReviewsIndex` of the file.
+
+        Only `features` are kept, no other transformations are applied.
+        """
+        lines = self._get_index().sample_lines(
+            num_rows,
+            seed = self.seed if seed is None else seed
+        )
+
+        df = self._get_object_parser(self._combine_lines([line.decode() for line in lines]))
+
+        return df.loc[:, self.features] if self.features else df
+
+
+    def _get_index(self) -> ReviewsIndex:
+        if self._index is None:
+            self._index = ReviewsIndex.load_or_build(self.path_or_buf, every=self.chunksize)
+
+        return self._index
+
+
+    def _seek_record(
+            self,
+            record: int,
+            chunk_number: int
+        ) -> None:
+
+        """
+        Reopens the file at line number `record`, counting from 0, as the start of chunk number `chunk_number`.
+
+        Only replaces the file handle, so it is safe to call from the prefetch thread or while chunks are in the process pool.
+        """
+        handle = io.TextIOWrapper(
+            self._get_index().open(record),
+            encoding = self.encoding or "utf-8",
+            errors = self.encoding_errors
+        )
+
+        self._close_file()
+
+        self.data = self._seek_handle = handle
+        self.nrows_seen = self._lines_read = record
+        self._read_chunks = chunk_number - 1
+
+
+    def _close_file(self) -> None:
+        if self._seek_handle is not None:
+            self._seek_handle.close()
+            self._seek_handle = None
+
+        JsonReader.close(self)
+
+
+    def _fingerprint(self) -> str:
+        """
+        Fingerprint of the source file and the parameters that determine the output, for the `ChunkManifest`.
+        """
+        stat = self.path_or_buf.stat()
+
+        return ChunkManifest.fingerprint_of({
+            "path_or_buf": str(self.path_or_buf.resolve()),
+            "source_stat": [stat.st_size, stat.st_mtime_ns],
+            "chunksize": self.chunksize,
+            "features": self.features,
+            "maximum_words": self.maximum_words,
+            "review_text_column": self.review_text_column,
+            "drop_empty_reviews": self.drop_empty_reviews,
+            "ratings_column": self.ratings_column,
+            "balance_num_pos_neg_ratings": self.balance_num_pos_neg_rating,
+            "balance_neutral_reviews": self.balance_neutral_reviews,
+            "balance_globally": self.balance_globally,
+            "seed": self.seed,
+            "convert_dates": self.convert_dates,
+            "parser": self.parser,
+            "compact_dtypes": self.compact_dtypes,
+            "save_method": getattr(self.save_method, "__qualname__", type(self.save_method).__qualname__)
+        })
 
-        df = super().__next__()
-        if not self.outdir:
-            return self._transform_chunk(df)
 
-        elif self.outdir:
-            self._save_chunk(self._transform_chunk(df))
-    
     def transform(self, df:pd.DataFrame) -> Union[pd.DataFrame, None]:
         """
         TODO:
@@ -164,6 +537,278 @@ class AmazonReviewsExtractor(JsonReader):
             ...
 
 
+    def _next_parallel(self) -> Union[pd.DataFrame, None]:
+        """
+        Keeps up to `max_chunks_in_flight` chunks submitted to the process pool 
+        and returns the oldest one, so chunks come out in the same order as in serial mode.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        while not self._is_exhausted and len(self._pending) < self.max_chunks_in_flight:
+            lines, info = self._read_lines()
+
+            if not lines:
+                self._is_exhausted = True
+                break
+
+            self._pending.append(
+                self._executor.submit(self._process_lines, lines, info, self.deduplicator is None)
+            )
+
+        if not self._pending:
+            self.close()
+            raise StopIteration
+
+        start_time = perf_counter()
+        df, info = self._pending.popleft().result()
+        wait_time = perf_counter() - start_time
+
+        start_time = perf_counter()
+        if self.deduplicator is not None:
+            df, info = self._finalize_chunk(df, info)
+
+        self._loaded_chunks = info["chunk"]
+        self._finish_chunk(info, wait_time, perf_counter() - start_time)
+
+        return df
+
+
+    def _next_parsed(self) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Reads and parses the next chunk in this thread.
+        """
+        lines, info = self._read_lines()
+
+        if not lines:
+            self.close()
+            raise StopIteration
+
+        return self._parse_lines(lines, info), info
+
+
+    def _next_prefetched(self) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        Gets the next parsed chunk from the prefetch queue, starts the prefetch thread on first call.
+        """
+        if self._is_exhausted:
+            raise StopIteration
+
+        if self._prefetch_thread is None:
+            self._prefetch_queue = Queue(maxsize=self.prefetch)
+            self._stop_prefetch = Event()
+            self._prefetch_thread = Thread(target=self._prefetch_chunks, daemon=True)
+            self._prefetch_thread.start()
+
+        item = self._prefetch_queue.get()
+
+        if item is _END_OF_FILE:
+            self._is_exhausted = True
+            self.close()
+            raise StopIteration
+
+        elif isinstance(item, Exception):
+            self._is_exhausted = True
+            self.close()
+            raise item
+
+        return item
+
+
+    def _prefetch_chunks(self) -> None:
+        """
+        Target of the prefetch thread, reads and parses chunks until the file is exhausted or the extractor is closed.
+        """
+        try:
+            while not self._stop_prefetch.is_set():
+                self._put_prefetched(self._next_parsed())
+
+        except StopIteration:
+            self._put_prefetched(_END_OF_FILE)
+
+        except Exception as e:
+            self._put_prefetched(e)
+
+
+    def _put_prefetched(self, item: Any) -> None:
+        """
+        Blocks until there is room in the prefetch queue, or until the extractor is closed.
+        """
+        while not self._stop_prefetch.is_set():
+            try:
+                self._prefetch_queue.put(item, timeout=0.1)
+                return
+
+            except Full:
+                continue
+
+
+    def _read_lines(self) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        Reads the raw json lines of the next chunk, along with the chunk number and where the chunk starts in the file.
+
+        When resuming, chunks that are complete in the manifest are skipped first by seeking past them.
+        """
+        if self._manifest is not None:
+            self._skip_completed_chunks()
+
+        # The chunksize may change while the prefetch thread reads, when tuned
+        chunksize = self.chunksize
+        lines = list(islice(self.data, chunksize))
+        info = {
+            "chunk": self._read_chunks + 1,
+            "source_record": self._lines_read,
+            "chunksize": chunksize,
+            "num_records": len(lines),
+            "nrows_seen": self.nrows_seen
+        }
+
+        if lines:
+            self._read_chunks += 1
+            self._lines_read += len(lines)
+            self.nrows_seen += sum(1 for line in lines if line.strip())
+
+        return lines, info
+
+
+    def _skip_completed_chunks(self) -> None:
+        """
+        Seeks past the run of completed chunks starting at the next chunk, if any.
+        """
+        chunk_number = self._read_chunks + 1
+
+        if not self._manifest.is_complete(chunk_number):
+            return
+
+        while self._manifest.is_complete(chunk_number + 1):
+            chunk_number += 1
+
+        self.skipped_chunks.extend(range(self._read_chunks + 1, chunk_number + 1))
+
+        entry = self._manifest.entries[chunk_number]
+        self._seek_record(entry["source_record"] + entry["num_records"], chunk_number + 1)
+
+
+    def _parse_lines(
+            self,
+            lines: List[str],
+            info: Dict[str, Any]
+        ) -> pd.DataFrame:
+
+        if self.parser == "fast":
+            df = parse_review_lines(lines, self.features, self.convert_dates)
+
+        else:
+            df = self._get_object_parser(self._combine_lines(lines))
+
+        df.index = range(info["nrows_seen"], info["nrows_seen"] + len(df))
+
+        return df
+
+
+    def _process_lines(
+            self,
+            lines: List[str],
+            info: Dict[str, Any],
+            finalize: bool = True
+        ) -> Tuple[Union[pd.DataFrame, None], Dict[str, Any]]:
+
+        """
+        Parses, transforms and optionally saves a chunk of raw json lines.
+
+        Runs in a worker process on a copy of the extractor, see `__getstate__`.
+        """
+        return self._process_chunk(self._parse_lines(lines, info), info, finalize)
+
+
+    def _process_chunk(
+            self,
+            df: pd.DataFrame,
+            info: Dict[str, Any],
+            finalize: bool = True
+        ) -> Tuple[Union[pd.DataFrame, None], Dict[str, Any]]:
+
+        """
+        Transforms and optionally saves a parsed chunk.
+        Returns the chunk, or None if saved, and the chunk info with its number of rows and saved files.
+
+        If `finalize` is False the chunk is only transformed, and `_finalize_chunk` must be called on it,
+        for steps that need the state of this process, ie. deduplication.
+        """
+        self._loaded_chunks = info["chunk"]
+
+        if self.workers or self.resume:
+            self._rs = RandomState([self.seed, info["chunk"]])
+
+        if self.profile is not None:
+            info["profile"] = self.profile.empty_copy().update(df)
+
+        df = self._transform_chunk(df)
+        info = dict(info, num_rows=len(df), files=[])
+
+        if not finalize:
+            return df, info
+
+        return self._finalize_chunk(df, info)
+
+
+    def _finalize_chunk(
+            self,
+            df: pd.DataFrame,
+            info: Dict[str, Any]
+        ) -> Tuple[Union[pd.DataFrame, None], Dict[str, Any]]:
+
+        """
+        Deduplicates, compacts and optionally saves a transformed chunk.
+        """
+        self._loaded_chunks = info["chunk"]
+
+        if self.deduplicator is not None:
+            df, info["num_duplicates"] = self.deduplicator.drop_duplicates(df)
+            info["num_rows"] = len(df)
+
+        if self.compact_dtypes:
+            info["memory_before"] = int(df.memory_usage(deep=True).sum())
+            df = self._compact_dtypes(df)
+            info["memory_after"] = int(df.memory_usage(deep=True).sum())
+
+        if self.outdir:
+            info["files"] = self._save_chunk(df)
+            df = None
+
+        return df, info
+
+
+    def _finish_chunk(
+            self,
+            info: Dict[str, Any],
+            wait_time: float,
+            process_time: float
+        ) -> None:
+
+        """
+        Records a processed chunk in `chunk_stats`, and in the manifest when resuming.
+        """
+        if self.profile is not None:
+            self.profile.merge(info.pop("profile"))
+
+        if self._manifest is not None:
+            self._manifest.record(
+                info["chunk"],
+                info["source_record"],
+                info["num_records"],
+                info["num_rows"],
+                info["files"]
+            )
+
+        self.chunk_stats.append({
+            "chunk": info["chunk"],
+            "wait_time": wait_time,
+            "process_time": process_time,
+            **{key: info[key] for key in ("memory_before", "memory_after", "num_duplicates") if key in info}
+        })
+
+
     def _transform_chunk(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         The main transformation pipe of the chunk.
@@ -181,8 +826,11 @@ class AmazonReviewsExtractor(JsonReader):
         )
 
         if self.maximum_words:
-            df[self.review_text_column] = df[self.review_text_column].apply(
-                lambda x: " ".join(x.split())[:self.maximum_words]
+            # One thread in each worker process, the processes already use the cpus
+            df[self.review_text_column] = normalize_text_pandas(
+                df[self.review_text_column],
+                self.maximum_words,
+                threads = 1 if self.workers else None
             )
 
         if self.drop_empty_reviews:
@@ -221,6 +869,11 @@ class AmazonReviewsExtractor(JsonReader):
         ):
             raise ValueError("Ratings column and review text column must be in DataFrame to balance reviews.")
 
+        if self._balancer is not None:
+            return df.loc[
+                self._balancer.sample_mask(df[self.ratings_column].to_numpy(), self._loaded_chunks)
+            ]
+
         value_counts = df[self.ratings_column].value_counts()
         num_positive = value_counts[4] + value_counts[5]
         num_negative = value_counts[1] + value_counts[2]
@@ -272,23 +925,67 @@ class AmazonReviewsExtractor(JsonReader):
 
 
         return df_balanced
-        
+
+
+    def _compact_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converts the columns of the chunk to compact dtypes, columns with missing values get the nullable dtypes.
+        """
+        has_missing = lambda column: df[column].isna().any()
+
+        dtypes = {
+            self.ratings_column: lambda column: "Int8" if has_missing(column) else "int8",
+            "verified": lambda column: "boolean" if has_missing(column) else "bool",
+            "asin": lambda column: "category",
+            "reviewerID": lambda column: "category",
+            self.review_text_column: lambda column: pd.StringDtype("pyarrow"),
+            "summary": lambda column: pd.StringDtype("pyarrow"),
+        }
+
+        return df.astype({
+            column: dtype(column) for column, dtype in dtypes.items() if column in df.columns
+        })
+
+
     def _save_chunk(
             self, 
             df: pd.DataFrame
-        ) -> None:
+        ) -> List[str]:
 
         """
-        Saves the chunk to `self.outdir` if it has been specified.
+        Saves the chunk to `self.outdir` if it has been specified, and returns the paths of the saved files.
 
-        Alternatively uses the callable stored in `self.save_method` to save the chunk.
+        Alternatively uses the callable stored in `self.save_method` to save the chunk,
+        the saved files are then the paths it returns if any,
+        otherwise `save_path` itself, or the files and directories named `save_path.*`.
         """
         old_filename = self.path_or_buf.parts[-1].split(".")[0]
         save_path = f"{self.outdir}/{old_filename}_{self._loaded_chunks}"
 
         if self.save_method:
-            self.save_method(df, save_path)
+            files = self.save_method(df, save_path)
+
+            return list(files) if files is not None else self._saved_files(save_path)
         
         else:
+            # Written to a temporary file first, so an interrupted write never leaves a partial file at save_path
             save_path += ".parquet"
-            df.to_parquet(save_path, index=False)
\ No newline at end of file
+            df.to_parquet(f"{save_path}.tmp", index=False)
+            os.replace(f"{save_path}.tmp", save_path)
+
+            return [save_path]
+
+
+    @staticmethod
+    def _saved_files(save_path: str) -> List[str]:
+        paths = [save_path] if os.path.exists(save_path) else sorted(glob(f"{escape(save_path)}.*"))
+        files = []
+
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(str(file) for file in Path(path).rglob("*") if file.is_file()))
+
+            else:
+                files.append(path)
+
+        return files
\ No newline at end of file
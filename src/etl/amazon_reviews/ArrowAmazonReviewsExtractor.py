@@ -1,11 +1,8 @@
-import pandas as pd
 import numpy as np
 from numpy.random import RandomState
 import os
 from pathlib import Path
 
-from pandas.io.json._json import JsonReader
-
 from typing import List, Optional, Union, Callable
 
 import pyarrow as pa
@@ -13,18 +10,40 @@ import pyarrow.json
 import pyarrow.compute
 import pyarrow.parquet
 
+from src.text_transform.text_normalization import normalize_text_arrow
+from src.etl.amazon_reviews.DataProfile import DataProfile
+
+
+# Arrow types of the fields in the review files, used as explicit schema when parsing.
+# `style` is left out as its keys vary between categories, it is inferred if requested.
+# Inferred fields can be missing from, or have other keys in, some blocks, so blocks are unified before they are joined.
+REVIEW_SCHEMA = pa.schema([
+    ("overall", pa.float64()),
+    ("verified", pa.bool_()),
+    ("reviewTime", pa.string()),
+    ("reviewerID", pa.string()),
+    ("asin", pa.string()),
+    ("reviewerName", pa.string()),
+    ("reviewText", pa.string()),
+    ("summary", pa.string()),
+    ("unixReviewTime", pa.int64()),
+    ("vote", pa.string()),
+    ("image", pa.list_(pa.string())),
+])
+
+
 class ArrowAmazonReviewsExtractor:
     """
-    AmazonReviewsExtractor, extracts and transforms amazon reviews like [these](https://nijianmo.github.io/amazon/index.html).
-
-    Class is based on and inherits from pandas.JsonReader.
+    ArrowAmazonReviewsExtractor, extracts and transforms amazon reviews like [these](https://nijianmo.github.io/amazon/index.html).
 
+    Streams the file in blocks with pyarrow and transforms each chunk with `pyarrow.compute` kernels,
+    chunks are never converted to pandas.
     """
 
     def __init__(
             self,
             path_or_buf: Union[str, os.PathLike],
-            blocksize: int = 100_000,
+            blocksize: int = 1 << 24,
             max_chunksize: int = 500_000,
             features: Optional[List[str]] = None,
             maximum_words: Optional[int] = None,
@@ -35,25 +54,66 @@ class ArrowAmazonReviewsExtractor:
             balance_neutral_reviews: bool = False,
             convert_dates: Optional[List[str]] = ["unixReviewTime"],
             outdir: Optional[Union[str, os.PathLike]] = None,
-            save_method: Optional[Callable[[pd.DataFrame, os.PathLike], None]] = None
+            save_method: Optional[Callable[[pa.Table, os.PathLike], None]] = None,
+            profile: bool = False
         ) -> None:
 
         """
-        If possible convert_dates should never be called on the column `"reviewTime"` as pandas struggles to parse it, use `"unixReviewTime"` instead.    
-        
+        Peak memory is bound by `blocksize` and `max_chunksize`, not by the size of the file.
 
-        Does not support chunking, meaning entire dataset must fit in memory. However, very effective on datasets up tp 3 million rows, about 300 MBs.
-        WARNING: Work in progress.
-        
         ## Params
+        path_or_buf: pathlike,
+            path to file to load data from, should be `.json`,
+            can be compressed as long as pyarrow is able to detect compression type from the file extension.
+
+        blocksize: int,
+            the number of bytes to read and parse at a time.
+
+        max_chunksize: int,
+            the maximum number of rows in each chunk, chunks are transformed and saved as a whole.
+
+        features: list of feature names, optional,
+            the features to extract from each chunk, other fields are skipped while parsing.
+
+        maximum_words: int, optional,
+            if specified sets the maximum number of words a reviewText can have,
+            longer are cut to length of maximum_words.
+
+        review_text_column: str,
+            specifies which column contains the reviews text. Default is "reviewText".
+
+        drop_empty_reviews: bool,
+            drop rows where reviews only contain empty strings.
+
+        ratings_column: str,
+            specifies the name of the column that contains the ratings of the reviews.
+            Default is "overall".
+
+        balance_num_pos_neg_ratings: bool,
+            undersampling so that the total number of positive (`rating>3`) and negative (`rating<3`) reviews are equal.
+            The ratings column and review text column must be in the chunk.
+
+        balance_neutral_reviews: bool,
+            balance the number of neutral reviews (`rating==3`) to the average of negative and positive reviews.
+
+        convert_dates: list[str], optional,
+            names of columns with unix timestamps to convert to `timestamp[s]`.
+
+        outdir: pathlike, optional,
+            if specified overloads iterator functionality,
+            now saves each chunk to `outdir` as `.parquet` instead of returning a `pyarrow.Table`.
+
+        save_method: function or callable, optional,
+            if not specified chunks are saved as `.parquet` files. Use this variable to save chunks in other file formats.
+            The callable should take two arguments a `pyarrow.Table` and a `PathLike` used to overide saving method.
+            Use a `ParquetDatasetWriter` to save all chunks into one partitioned dataset.
+
+        profile: bool,
+            if True profiles the parsed chunks in the same pass, see `DataProfile`.
+            Only the columns in `features` are profiled.
+            Available as `profile` during extraction, and saved to `outdir/_profile.json` once the file is exhausted.
         """
 
-        
-        self.json_read_opts = pa.json.ReadOptions(
-            use_threads = True,
-            block_size = blocksize if blocksize else 100_000
-        )
-        
         self.path_or_buf = Path(path_or_buf)
         self.blocksize = blocksize
         self.max_chunksize = max_chunksize
@@ -67,85 +127,310 @@ class ArrowAmazonReviewsExtractor:
         self.convert_dates = convert_dates
         self.outdir = outdir
         self.save_method = save_method
+        self.profile = DataProfile(ratings_column, review_text_columnn) if profile else None
+
+        self.json_parse_opts = self._parse_options()
 
         self._loaded_chunks = 0
-        self._is_data_loaded = False
+        self._stream: Optional[pa.NativeFile] = None
+        self._remainder = b""
+        self._buffered: List[pa.Table] = []
+        self._num_buffered_rows = 0
+        self._is_exhausted = False
 
         self._rs = RandomState(0)
-        
 
-    
+
+    def __iter__(self) -> "ArrowAmazonReviewsExtractor":
+        return self
+
+
+    def __next__(self) -> Union[pa.Table, None]:
+        """
+        Loads and transforms the next chunk, or loads, transforms and saves the next chunk if `outdir` is specified.
+        """
+        try:
+            table = self._read_chunk()
+
+        except StopIteration:
+            if self.profile is not None and self.outdir:
+                self.profile.save(f"{self.outdir}/_profile.json")
+
+            raise
+
+        self._loaded_chunks += 1
+
+        if self.profile is not None:
+            self.profile.update(table)
+
+        if not self.outdir:
+            return self._transform_chunk(table)
+
+        elif self.outdir:
+            self._save_chunk(self._transform_chunk(table))
+
+
+    def __enter__(self) -> "ArrowAmazonReviewsExtractor":
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
     def load(self) -> Union[pa.Table, None]:
-        if not self._is_data_loaded:
-            self.data = pa.json.read_json(
-                self.path_or_buf,
-                self.json_read_opts
+        """
+        Loads and transforms the remaining chunks.
+
+        Returns all of them as one table, or saves them one by one if `outdir` is specified.
+        """
+        tables = [table for table in self]
+
+        if not self.outdir:
+            return self._concat_tables(tables) if tables else None
+
+
+    def _parse_options(self) -> pa.json.ParseOptions:
+        """
+        Uses the known review types as explicit schema,
+        fields not in `features` are ignored by the parser.
+        """
+        if not self.features:
+            return pa.json.ParseOptions(
+                explicit_schema = REVIEW_SCHEMA,
+                unexpected_field_behavior = "infer"
             )
-            
-            if self.features:
-                columns_to_drop = set(data.column_names).difference(set(self.features))
-                data = data.drop(columns_to_drop)
-
-            if self.outdir():
-                pa.parquet.write_dataset(
-                    table = self.data,
-                    root_path = self.outdir,
-                    partition_columns = [self.ratings_column]
-                )
-            else:
-                return self.data
-            
-        else:
-            print("Data has already been loaded! Check: '.data'")
 
-            self.reader = data.to_reader(max_chunksize = self.max_chunksize)
-        
-        batch = self.reader.read_next_batch()
+        known_fields = [field for field in REVIEW_SCHEMA if field.name in self.features]
+
+        return pa.json.ParseOptions(
+            explicit_schema = pa.schema(known_fields),
+            unexpected_field_behavior = "ignore" if len(known_fields) == len(self.features) else "infer"
+        )
+
+
+    def _read_block(self) -> Union[pa.Table, None]:
+        """
+        Reads and parses about `blocksize` bytes, cut at the last complete line.
+        """
+        if self._stream is None:
+            self._stream = pa.input_stream(self.path_or_buf, compression="detect")
 
-    
-    def transform(self) -> Union[pa.Table, None]:
-        data = pa.json.read_json(self.json_read_opts)
-        
-        if self.outdir:
-            self._save(self._transform(data))
+        block = self._remainder
+
+        while True:
+            data = self._stream.read(self.blocksize)
+            block += data
+
+            if not data:
+                self._remainder = b""
+                break
+
+            end_of_last_line = block.rfind(b"\n") + 1
+
+            if end_of_last_line:
+                block, self._remainder = block[:end_of_last_line], block[end_of_last_line:]
+                break
+
+        if not block.strip():
+            return None
+
+        table = pa.json.read_json(
+            pa.py_buffer(block),
+            parse_options = self.json_parse_opts
+        )
 
-        elif not self.outdir:
-            return self._transform(data)
+        if self.features:
+            # A requested field that is not in the explicit schema is only inferred in the blocks that have it
+            for name in self.features:
+                if name not in table.column_names:
+                    table = table.append_column(name, pa.nulls(table.num_rows))
 
+            table = table.select(self.features)
 
-    def _transform_batch(self, record_batch: pa.RecordBatch) -> pa.Table:
+        return table
+
+
+    def _read_chunk(self) -> pa.Table:
         """
-        The main transformation pipe.
+        Buffers blocks until `max_chunksize` rows are read or the file is exhausted.
         """
+        while not self._is_exhausted and self._num_buffered_rows < self.max_chunksize:
+            table = self._read_block()
 
-        if self.balance_num_pos_neg_rating:
-            record_batch = self._balance_reviews(df)
+            if table is None:
+                self._is_exhausted = True
+                self.close()
+
+            elif table.num_rows:
+                self._buffered.append(table)
+                self._num_buffered_rows += table.num_rows
+
+        if not self._num_buffered_rows:
+            raise StopIteration
+
+        buffered = self._concat_tables(self._buffered)
+        chunk = buffered.slice(0, self.max_chunksize)
+        remainder = buffered.slice(self.max_chunksize)
+
+        self._buffered = [remainder] if remainder.num_rows else []
+        self._num_buffered_rows = remainder.num_rows
+
+        return chunk
 
-        if self.review_text_column:
-            mask = pa.compute.is_null(
-                record_batch[self.review_text_column]).combine_chunks()
-            
-            if self.drop_empty_reviews:
-                record_batch = ...
-            elif not self.drop_empty_reviews:
-                record_batch
 
-            record_batch[self.review_text_column] = pa.compute.replace_with_mask(
-                record_batch[self.review_text_column], mask, "")
-            
+    def _transform_chunk(self, table: pa.Table) -> pa.Table:
+        """
+        The main transformation pipe of the chunk.
+        """
+
+        if self.balance_num_pos_neg_rating:
+            table = self._balance_reviews(table)
+
+        review_text = table[self.review_text_column].fill_null("")
 
         if self.maximum_words:
-            df[self.review_text_column] = df[self.review_text_column].apply(
-                lambda x: " ".join(x.split())[:self.maximum_words]
-            )
+            review_text = normalize_text_arrow(review_text, self.maximum_words)
+
+        table = table.set_column(
+            table.column_names.index(self.review_text_column),
+            self.review_text_column,
+            review_text
+        )
 
         if self.drop_empty_reviews:
-            df = df.loc[df[self.review_text_column] != "",:]
-
-        # Might improve performance in some rare cases, commented out for convenience
-        # Parsing dates directly in JsonReader is a bit faster 
-        # if self.convert_dates:
-        #     for column in self.convert_dates:
-        #         df[column] = pd.to_datetime(df[column])
-        
-        return df
\ No newline at end of file
+            table = table.filter(pa.compute.not_equal(table[self.review_text_column], ""))
+
+        if self.convert_dates:
+            for column in self.convert_dates:
+                if column in table.column_names and pa.types.is_integer(table.schema.field(column).type):
+                    table = table.set_column(
+                        table.column_names.index(column),
+                        column,
+                        table[column].cast(pa.timestamp("s"))
+                    )
+
+        return table
+
+
+    def _balance_reviews(self, table: pa.Table) -> pa.Table:
+        """
+        Balances the number of negative and positive reviews in a chunk
+        if `balance_num_neg_pos_reviews` is `True` by undersampling.
+
+        Balances the number of neutral reviews if `balance_neutral` is `True`,
+        by undersampling.
+        """
+
+        if not (
+            self.ratings_column in table.column_names \
+            and \
+            self.review_text_column in table.column_names
+        ):
+            raise ValueError("Ratings column and review text column must be in table to balance reviews.")
+
+        ratings = table[self.ratings_column]
+        is_positive = self._to_numpy_mask(pa.compute.greater_equal(ratings, 4))
+        is_negative = self._to_numpy_mask(pa.compute.less_equal(ratings, 2))
+
+        keep = np.ones(table.num_rows, dtype=bool)
+        self._undersample(keep, is_positive, is_negative.sum())
+        self._undersample(keep, is_negative, is_positive.sum())
+
+        if self.balance_neutral_reviews:
+            is_neutral = self._to_numpy_mask(pa.compute.equal(ratings, 3))
+            num_non_neutral = (keep & ~is_neutral).sum()
+
+            self._undersample(keep, is_neutral, int(num_non_neutral / 4))
+
+        return table.filter(pa.array(keep))
+
+
+    def _undersample(
+            self,
+            keep: np.ndarray,
+            mask: np.ndarray,
+            size: int
+        ) -> None:
+
+        """
+        Randomly unsets rows of `keep` in `mask` until at most `size` of them are left.
+        """
+        index = np.flatnonzero(keep & mask)
+
+        if len(index) > size:
+            keep[self._rs.choice(index, size=len(index) - size, replace=False)] = False
+
+
+    @classmethod
+    def _concat_tables(cls, tables: List[pa.Table]) -> pa.Table:
+        """
+        Concatenates tables of blocks parsed separately, whose inferred fields may be missing or have other struct keys.
+        Missing columns and struct keys are filled with nulls.
+        """
+        schema = pa.unify_schemas([table.schema for table in tables])
+
+        return pa.concat_tables([
+            table if table.schema == schema else cls._conform_table(table, schema)
+            for table in tables
+        ])
+
+
+    @classmethod
+    def _conform_table(cls, table: pa.Table, schema: pa.Schema) -> pa.Table:
+        columns = [
+            pa.chunked_array([cls._conform_array(chunk, field.type) for chunk in table[field.name].chunks], field.type)
+            if field.name in table.column_names else pa.nulls(table.num_rows, field.type)
+            for field in schema
+        ]
+
+        return pa.Table.from_arrays(columns, schema=schema)
+
+
+    @classmethod
+    def _conform_array(cls, array: pa.Array, type: pa.DataType) -> pa.Array:
+        if array.type == type:
+            return array
+
+        if pa.types.is_null(array.type):
+            return pa.nulls(len(array), type)
+
+        if pa.types.is_struct(array.type) and pa.types.is_struct(type):
+            names = [array.type.field(i).name for i in range(array.type.num_fields)]
+            children = [
+                cls._conform_array(array.field(field.name), field.type)
+                if field.name in names else pa.nulls(len(array), field.type)
+                for field in type
+            ]
+
+            return pa.StructArray.from_arrays(children, fields=list(type), mask=array.is_null())
+
+        return array.cast(type)
+
+
+    @staticmethod
+    def _to_numpy_mask(mask: pa.ChunkedArray) -> np.ndarray:
+        return mask.fill_null(False).to_numpy()
+
+
+    def _save_chunk(self, table: pa.Table) -> None:
+        """
+        Saves the chunk to `self.outdir` if it has been specified.
+
+        Alternatively uses the callable stored in `self.save_method` to save the chunk.
+        """
+        old_filename = self.path_or_buf.parts[-1].split(".")[0]
+        save_path = f"{self.outdir}/{old_filename}_{self._loaded_chunks}"
+
+        if self.save_method:
+            self.save_method(table, save_path)
+
+        else:
+            save_path += ".parquet"
+            pa.parquet.write_table(table, save_path)
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from typing import List, Union, Dict, Any
+
+
+class ChunkManifest:
+    """
+    Append-only manifest of the chunks an extractor has completed, saved as `_manifest.jsonl` in `outdir`.
+
+    Each completed chunk is recorded with its source offset, ie. the line in the source file it starts at,
+    the number of source lines and output rows, and the size, modification time and sha256 checksum of its output files.
+    The first line holds a fingerprint of the extractor parameters, a manifest with another fingerprint is discarded.
+
+    Chunks are only recorded after their output is written,
+    so chunks that were being written when a run died are never complete.
+    """
+
+    FILENAME = "_manifest.jsonl"
+
+    def __init__(
+            self,
+            outdir: Union[str, os.PathLike],
+            fingerprint: str,
+            verify_checksums: bool = False
+        ) -> None:
+
+        """
+        ## Params
+        outdir: pathlike,
+            the output directory of the extractor, where the manifest is saved.
+
+        fingerprint: str,
+            fingerprint of the parameters that determine the output, see `ChunkManifest.fingerprint_of`.
+
+        verify_checksums: bool,
+            verify the checksums of output files of completed chunks, which reads all of them,
+            otherwise only their sizes and modification times are verified.
+        """
+        self.outdir = Path(outdir)
+        self.path = self.outdir / self.FILENAME
+        self.fingerprint = fingerprint
+        self.verify_checksums = verify_checksums
+
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self._verified: Dict[int, bool] = {}
+
+        self._load()
+
+
+    @staticmethod
+    def fingerprint_of(params: Dict[str, Any]) -> str:
+        """
+        Fingerprint of a dict of parameters, values that are not json serializable are converted with `str`.
+        """
+        return hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+
+    @staticmethod
+    def checksum(path: Union[str, os.PathLike]) -> str:
+        digest = hashlib.sha256()
+
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+
+        return digest.hexdigest()
+
+
+    def is_complete(self, chunk_number: int) -> bool:
+        """
+        True if the chunk is recorded, and all of its output files exist unchanged.
+        """
+        if chunk_number not in self._verified:
+            entry = self.entries.get(chunk_number)
+
+            self._verified[chunk_number] = entry is not None and all(
+                self._verify_file(file) for file in entry["files"]
+            )
+
+        return self._verified[chunk_number]
+
+
+    def record(
+            self,
+            chunk_number: int,
+            source_record: int,
+            num_records: int,
+            num_rows: int,
+            files: List[Union[str, os.PathLike]]
+        ) -> None:
+
+        """
+        Records a completed chunk, its output files must be written already.
+        """
+        entry = {
+            "chunk": chunk_number,
+            "source_record": source_record,
+            "num_records": num_records,
+            "num_rows": num_rows,
+            "files": [
+                {
+                    "path": os.path.relpath(file, self.outdir),
+                    "size": os.path.getsize(file),
+                    "mtime_ns": os.stat(file).st_mtime_ns,
+                    "sha256": self.checksum(file)
+                }
+                for file in files
+            ]
+        }
+
+        self._append(entry)
+        self.entries[chunk_number] = entry
+        self._verified[chunk_number] = True
+
+
+    def _verify_file(self, file: Dict[str, Any]) -> bool:
+        path = self.outdir / file["path"]
+
+        if not path.is_file():
+            return False
+
+        stat = path.stat()
+
+        if stat.st_size != file["size"] or stat.st_mtime_ns != file.get("mtime_ns", stat.st_mtime_ns):
+            return False
+
+        return not self.verify_checksums or self.checksum(path) == file["sha256"]
+
+
+    def _load(self) -> None:
+        """
+        Loads the entries of an existing manifest with the same fingerprint, otherwise starts a new manifest.
+
+        The last line is cut short if a run died while appending,
+        the manifest is then truncated after the last complete line so new entries are appended on a line of their own.
+        """
+        entries = []
+        complete_size = 0
+
+        if self.path.exists():
+            with open(self.path, "rb") as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+
+                    try:
+                        entries.append(json.loads(line))
+
+                    except json.JSONDecodeError:
+                        break
+
+                    complete_size += len(line)
+
+        if entries and entries[0].get("fingerprint") == self.fingerprint:
+            self.entries = {entry["chunk"]: entry for entry in entries[1:]}
+
+            if complete_size != self.path.stat().st_size:
+                os.truncate(self.path, complete_size)
+
+        else:
+            os.makedirs(self.outdir, exist_ok=True)
+
+            with open(self.path, "w") as file:
+                file.write(json.dumps({"fingerprint": self.fingerprint}) + "\n")
+
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with open(self.path, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
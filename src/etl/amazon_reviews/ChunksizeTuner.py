@@ -0,0 +1,164 @@
+import os
+import sys
+
+from typing import List, Optional, Dict, Any
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class ChunksizeTuner:
+    """
+    Tunes the chunksize of an extractor over its first chunks, to maximize throughput within a memory budget.
+
+    Starts at `initial_chunksize` and multiplies the chunksize by `growth` after each trial chunk,
+    measuring rows per second and resident memory above the memory before the first chunk.
+    Stops when throughput drops, the next chunksize would exceed the memory budget, or after `max_trials`,
+    and settles on the fastest chunksize that fits the budget.
+
+    Resident memory is measured with `psutil` if installed,
+    otherwise the peak resident memory from `resource` is used, which overestimates later chunks.
+    """
+
+    def __init__(
+            self,
+            memory_budget: Optional[int] = None,
+            initial_chunksize: int = 10_000,
+            max_chunksize: int = 2_000_000,
+            max_trials: int = 6,
+            growth: int = 2,
+            tolerance: float = 0.05,
+            chunks_in_memory: int = 1
+        ) -> None:
+
+        """
+        ## Params
+        memory_budget: int, optional,
+            the maximum resident memory in bytes of the extraction, on top of the memory used before the first chunk.
+            Default is half of the available memory.
+
+        initial_chunksize: int,
+            the chunksize of the first trial chunk.
+
+        max_chunksize: int,
+            the largest chunksize to try.
+
+        max_trials: int,
+            the maximum number of trial chunks.
+
+        growth: int,
+            the factor to grow the chunksize by between trial chunks.
+
+        tolerance: float,
+            the relative drop in throughput from the best trial that ends tuning, ignores noise between similar chunksizes.
+
+        chunks_in_memory: int,
+            the number of chunks in memory at once, eg. `prefetch + 1`.
+        """
+        self.memory_budget = memory_budget if memory_budget else self.available_memory() // 2
+        self.initial_chunksize = initial_chunksize
+        self.max_chunksize = max_chunksize
+        self.max_trials = max_trials
+        self.growth = growth
+        self.tolerance = tolerance
+        self.chunks_in_memory = chunks_in_memory
+
+        self.chunksize = initial_chunksize
+        self.is_tuning = True
+        self.trials: List[Dict[str, Any]] = []
+
+        self._baseline_rss: Optional[int] = None
+
+
+    @staticmethod
+    def rss() -> int:
+        """
+        Resident memory of this process in bytes, or its peak if `psutil` is not installed.
+        """
+        if psutil is not None:
+            return psutil.Process().memory_info().rss
+
+        # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+    @staticmethod
+    def available_memory() -> int:
+        if psutil is not None:
+            return psutil.virtual_memory().available
+
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+
+
+    def start(self) -> None:
+        """
+        Measures the baseline memory, call before reading the first chunk.
+        """
+        if self._baseline_rss is None:
+            self._baseline_rss = self.rss()
+
+
+    def record(
+            self,
+            num_records: int,
+            seconds: float,
+            rss: int
+        ) -> Dict[str, Any]:
+
+        """
+        Records a trial chunk of `num_records` lines, loaded in `seconds` with a resident memory of `rss` bytes,
+        and picks the chunksize of the next chunk. Returns the measurements, and the chosen chunksize when tuning ends.
+        """
+        trial = {
+            "chunksize": self.chunksize,
+            "rows_per_sec": num_records / max(seconds, 1e-9),
+            "rss": rss,
+            "bytes_per_row": max(rss - self._baseline_rss, 0) / max(num_records, 1)
+        }
+        self.trials.append(trial)
+
+        best = max(self.trials, key=lambda trial: trial["rows_per_sec"])
+        next_chunksize = self.chunksize * self.growth
+
+        if (
+            # The last chunk of the file is not a full trial
+            num_records < self.chunksize
+            or trial["rows_per_sec"] < best["rows_per_sec"] * (1 - self.tolerance)
+            or next_chunksize > self.max_chunksize
+            or self.projected_memory(next_chunksize) > self.memory_budget
+            or len(self.trials) >= self.max_trials
+        ):
+            self.chunksize = min(best["chunksize"], self.max_fitting_chunksize())
+            self.is_tuning = False
+
+            return dict(trial, chosen_chunksize=self.chunksize)
+
+        self.chunksize = next_chunksize
+
+        return trial
+
+
+    def projected_memory(self, chunksize: int) -> float:
+        """
+        Projected resident memory in bytes above the baseline with chunks of `chunksize` rows,
+        from the largest memory per row of the trials.
+        """
+        bytes_per_row = max(trial["bytes_per_row"] for trial in self.trials)
+
+        return bytes_per_row * chunksize * self.chunks_in_memory
+
+
+    def max_fitting_chunksize(self) -> int:
+        bytes_per_row = max(trial["bytes_per_row"] for trial in self.trials)
+
+        if bytes_per_row == 0:
+            return self.max_chunksize
+
+        return max(int(self.memory_budget / (bytes_per_row * self.chunks_in_memory)), 1)
@@ -0,0 +1,179 @@
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute
+import os
+
+from src.etl.sketches.HyperLogLog import HyperLogLog
+from src.etl.sketches.KllSketch import KllSketch
+from src.text_transform.text_normalization import WORD_PATTERN
+
+from typing import List, Optional, Union, Dict, Any, Sequence
+
+
+class DataProfile:
+    """
+    Profile of a review dump built from mergeable sketches, updated chunk by chunk in the same pass as the extraction.
+
+    Holds the exact rating histogram, HyperLogLog sketches of the number of distinct reviewers and products,
+    and a KLL sketch of the number of words of the reviews for percentiles.
+    Profiles of different chunks merge, so workers can profile their chunks and the results are merged in any order.
+
+    Columns that are not in the chunks, eg. because they are not in `features`, are left out of the profile.
+
+    ## Examples
+        >>> profile = DataProfile()
+        >>> for df in chunks: profile.update(df)
+        >>> profile.to_dict()["word_count_percentiles"]["0.5"]
+    """
+
+    def __init__(
+            self,
+            ratings_column: str = "overall",
+            text_column: str = "reviewText",
+            distinct_columns: Sequence[str] = ("reviewerID", "asin"),
+            precision: int = 14,
+            k: int = 200,
+            percentiles: Sequence[float] = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+        ) -> None:
+
+        """
+        ## Params
+        ratings_column: str,
+            the column of the ratings to count.
+
+        text_column: str,
+            the column of the texts to count words of.
+
+        distinct_columns: list of column names,
+            the columns to count distinct values of.
+
+        precision: int,
+            precision of the HyperLogLog sketches, see `HyperLogLog`.
+
+        k: int,
+            accuracy of the KLL sketch of word counts, see `KllSketch`.
+
+        percentiles: list of floats,
+            the percentiles of word counts to report, between 0 and 1.
+        """
+        self.ratings_column = ratings_column
+        self.text_column = text_column
+        self.distinct_columns = list(distinct_columns)
+        self.precision = precision
+        self.k = k
+        self.percentiles = list(percentiles)
+
+        self.num_rows = 0
+        self.ratings: Dict[Optional[float], int] = {}
+        self.distinct = {column: HyperLogLog(precision) for column in self.distinct_columns}
+        self.word_counts = KllSketch(k)
+
+        self._columns_seen = set()
+
+
+    def empty_copy(self) -> "DataProfile":
+        """
+        An empty profile with the same configuration, eg. to profile one chunk in a worker.
+        """
+        return DataProfile(
+            self.ratings_column,
+            self.text_column,
+            self.distinct_columns,
+            self.precision,
+            self.k,
+            self.percentiles
+        )
+
+
+    def update(self, chunk: Union[pd.DataFrame, pa.Table]) -> "DataProfile":
+        """
+        Adds a chunk of reviews, a DataFrame or Table, to the profile.
+        """
+        self.num_rows += len(chunk)
+
+        ratings = self._column(chunk, self.ratings_column)
+        if ratings is not None:
+            for rating, count in zip(*self._value_counts(ratings)):
+                self.ratings[rating] = self.ratings.get(rating, 0) + count
+
+        for column, sketch in self.distinct.items():
+            values = self._column(chunk, column)
+
+            if values is not None:
+                sketch.add(pa.compute.drop_null(values).to_numpy(zero_copy_only=False))
+
+        text = self._column(chunk, self.text_column)
+        if text is not None:
+            num_words = pa.compute.count_substring_regex(pa.compute.drop_null(text), WORD_PATTERN)
+            self.word_counts.update(num_words.to_numpy(zero_copy_only=False))
+
+        return self
+
+
+    def merge(self, other: "DataProfile") -> "DataProfile":
+        self.num_rows += other.num_rows
+
+        for rating, count in other.ratings.items():
+            self.ratings[rating] = self.ratings.get(rating, 0) + count
+
+        for column, sketch in self.distinct.items():
+            sketch.merge(other.distinct[column])
+
+        self.word_counts.merge(other.word_counts)
+        self._columns_seen |= other._columns_seen
+
+        return self
+
+
+    def to_dict(self) -> Dict[str, Any]:
+        profile = {"num_rows": self.num_rows}
+
+        if self.ratings_column in self._columns_seen:
+            profile["ratings"] = {
+                "null" if rating is None else str(rating): count
+                for rating, count in sorted(self.ratings.items(), key=lambda item: (item[0] is None, item[0] or 0))
+            }
+
+        profile["distinct"] = {
+            column: sketch.count() for column, sketch in self.distinct.items() if column in self._columns_seen
+        }
+
+        if self.text_column in self._columns_seen:
+            profile["word_count_percentiles"] = dict(zip(
+                map(str, self.percentiles),
+                self.word_counts.quantiles(self.percentiles)
+            ))
+
+        return profile
+
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=4)
+
+
+    def _column(
+            self,
+            chunk: Union[pd.DataFrame, pa.Table],
+            column: str
+        ) -> Optional[Union[pa.Array, pa.ChunkedArray]]:
+
+        columns = chunk.columns if isinstance(chunk, pd.DataFrame) else chunk.column_names
+
+        if column not in columns:
+            return None
+
+        self._columns_seen.add(column)
+
+        if isinstance(chunk, pd.DataFrame):
+            return pa.array(chunk[column], from_pandas=True)
+
+        return chunk[column]
+
+
+    @staticmethod
+    def _value_counts(values: Union[pa.Array, pa.ChunkedArray]) -> List[List[Any]]:
+        counts = pa.compute.value_counts(values)
+
+        return [counts.field("values").to_pylist(), counts.field("counts").to_pylist()]
@@ -0,0 +1,167 @@
+import numpy as np
+import re
+import os
+from itertools import islice
+
+from pandas.io.common import get_handle
+
+from typing import List, Union
+
+
+class GlobalRatingBalancer:
+    """
+    Balances ratings over a whole file instead of within each chunk, by undersampling.
+
+    A cheap first pass counts the ratings of each chunk, without parsing the json.
+    From these counts the number of reviews to keep of each chunk are drawn up front,
+    as if the reviews to keep were sampled uniformly without replacement from the whole file.
+    Each chunk is then sampled independently with its own seeded generator,
+    so chunks can be balanced in any order or in parallel with the same result.
+
+    Memory usage is a few integers per chunk.
+    """
+
+    # Ratings in each group, negative, neutral and positive
+    GROUPS = ((1, 2), (3,), (4, 5))
+
+    def __init__(
+            self,
+            chunk_counts: np.ndarray,
+            balance_num_pos_neg_ratings: bool = True,
+            balance_neutral_reviews: bool = False,
+            seed: int = 0
+        ) -> None:
+
+        """
+        ## Params
+        chunk_counts: array of shape (num_chunks, 3),
+            the number of negative, neutral and positive reviews in each chunk.
+
+        balance_num_pos_neg_ratings: bool,
+            keep equally many positive (`rating>3`) and negative (`rating<3`) reviews.
+
+        balance_neutral_reviews: bool,
+            balance the number of neutral reviews (`rating==3`) to the average of the negative and positive ratings.
+
+        seed: int,
+            seeds the draws of the number of reviews to keep of each chunk, and the sampling within each chunk.
+        """
+        self.chunk_counts = np.asarray(chunk_counts, dtype=np.int64).reshape(-1, len(self.GROUPS))
+        self.balance_num_pos_neg_ratings = balance_num_pos_neg_ratings
+        self.balance_neutral_reviews = balance_neutral_reviews
+        self.seed = seed
+
+        self.targets = self._targets()
+        self.chunk_quotas = self._chunk_quotas()
+
+
+    @classmethod
+    def from_file(
+            cls,
+            path_or_buf: Union[str, os.PathLike],
+            chunksize: int,
+            ratings_column: str = "overall",
+            balance_num_pos_neg_ratings: bool = True,
+            balance_neutral_reviews: bool = False,
+            seed: int = 0
+        ) -> "GlobalRatingBalancer":
+
+        """
+        Counts the ratings of each chunk of `chunksize` lines in a json lines file, compressed or not.
+
+        Ratings are found with a regular expression on the raw lines,
+        which is much faster than parsing the json.
+        """
+        pattern = re.compile(rf'"{re.escape(ratings_column)}"\s*:\s*(-?[0-9.]+)'.encode())
+        chunk_counts: List[np.ndarray] = []
+
+        with get_handle(path_or_buf, "rb", compression="infer", is_text=False) as handles:
+            while True:
+                lines = list(islice(handles.handle, chunksize))
+
+                if not lines:
+                    break
+
+                ratings = [
+                    float(match.group(1)) for match in map(pattern.search, lines) if match
+                ]
+                chunk_counts.append(cls.count_groups(np.array(ratings)))
+
+        return cls(
+            np.array(chunk_counts).reshape(-1, len(cls.GROUPS)),
+            balance_num_pos_neg_ratings = balance_num_pos_neg_ratings,
+            balance_neutral_reviews = balance_neutral_reviews,
+            seed = seed
+        )
+
+
+    @classmethod
+    def count_groups(cls, ratings: np.ndarray) -> np.ndarray:
+        """
+        Counts the number of negative, neutral and positive ratings.
+        """
+        return np.array([np.isin(ratings, group).sum() for group in cls.GROUPS])
+
+
+    def sample_mask(
+            self,
+            ratings: np.ndarray,
+            chunk_number: int
+        ) -> np.ndarray:
+
+        """
+        Returns a boolean mask of the rows to keep of chunk number `chunk_number`, counting from 1.
+
+        Ratings outside the groups, eg. missing ratings, are always kept.
+        """
+        counts = self.chunk_counts[chunk_number - 1]
+        quotas = self.chunk_quotas[chunk_number - 1]
+        rng = np.random.default_rng([self.seed, chunk_number])
+
+        keep = np.ones(len(ratings), dtype=bool)
+
+        for group, count, quota in zip(self.GROUPS, counts, quotas):
+            index = np.flatnonzero(np.isin(ratings, group))
+
+            if len(index) != count:
+                raise ValueError(
+                    f"Chunk {chunk_number} has {len(index)} ratings in {group}, expected {count} from counting pass."
+                )
+
+            keep[index] = False
+            keep[rng.choice(index, size=quota, replace=False)] = True
+
+        return keep
+
+
+    def _targets(self) -> np.ndarray:
+        """
+        The total number of negative, neutral and positive reviews to keep.
+        """
+        num_negative, num_neutral, num_positive = self.chunk_counts.sum(axis=0)
+
+        if self.balance_num_pos_neg_ratings:
+            num_negative = num_positive = min(num_negative, num_positive)
+
+        if self.balance_neutral_reviews:
+            num_neutral = min(num_neutral, (num_negative + num_positive) // 4)
+
+        return np.array([num_negative, num_neutral, num_positive])
+
+
+    def _chunk_quotas(self) -> np.ndarray:
+        """
+        Draws the number of reviews to keep of each group in each chunk,
+        from the multivariate hypergeometric distribution over the chunks.
+        """
+        rng = np.random.default_rng(self.seed)
+        quotas = np.zeros_like(self.chunk_counts)
+
+        for group in range(len(self.GROUPS)):
+            if len(self.chunk_counts):
+                quotas[:, group] = rng.multivariate_hypergeometric(
+                    self.chunk_counts[:, group],
+                    self.targets[group]
+                )
+
+        return quotas
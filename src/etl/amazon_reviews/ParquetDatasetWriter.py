@@ -0,0 +1,274 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import os
+from pathlib import Path
+
+from typing import List, Optional, Union
+
+
+class ParquetDatasetWriter:
+    """
+    Writes extracted chunks into one hive partitioned Parquet dataset, ie. `overall=5/year=2014/Books_5_3-0.parquet`,
+    instead of one flat file per chunk. Use an instance as `save_method` of `AmazonReviewsExtractor`
+    or `ArrowAmazonReviewsExtractor`, and call `write_metadata` when all chunks are saved.
+
+    Partition columns are stored in the directory names and not in the files,
+    so readers filtering on ratings or years only open the matching directories,
+    and filters on other columns are pushed down to the row group statistics in the file footers.
+
+    Each chunk writes a file in every partition it has rows of, so a dataset of many chunks has many small files.
+    Call `compact` when all chunks are saved to merge the files of each partition,
+    chunks are not buffered across calls as they may be saved by worker processes, or recorded as complete when resuming.
+
+    ## Examples
+
+    Extract to a dataset partitioned by rating and year:
+        >>> writer = ParquetDatasetWriter("data/Books", partition_by_year=True)
+        >>> extractor = AmazonReviewsExtractor("Books_5.json.gz", outdir="data/Books", save_method=writer)
+        >>> for _ in extractor: ...
+        >>> writer.compact()
+        >>> writer.write_metadata()
+
+    Read only negative reviews from 2014 and onwards:
+        >>> writer.dataset().to_table(
+        ...     columns = ["reviewText", "overall"],
+        ...     filter = (ds.field("overall") < 3) & (ds.field("year") >= 2014)
+        ... )
+    """
+
+    def __init__(
+            self,
+            root: Union[str, os.PathLike],
+            ratings_column: str = "overall",
+            ratings_type: Optional[pa.DataType] = None,
+            partition_by_year: bool = False,
+            time_column: str = "unixReviewTime",
+            row_group_size: int = 128 * 1024,
+            use_dictionary: Union[bool, List[str]] = True,
+            compression: str = "zstd",
+            compression_level: Optional[int] = None
+        ) -> None:
+
+        """
+        ## Params
+        root: pathlike,
+            root directory of the dataset, normally the `outdir` of the extractor.
+
+        ratings_column: str,
+            the column to partition by.
+
+        ratings_type: pyarrow.DataType, optional,
+            type to cast the ratings to, default keeps the type of the chunks, eg. `int8` with `compact_dtypes`.
+            Partition types are not stored in the files, see `partitioning`.
+
+        partition_by_year: bool,
+            also partition by the year of `time_column`, added as a `year` column.
+
+        time_column: str,
+            column of unix timestamps in seconds, or timestamps, to take years from.
+
+        row_group_size: int,
+            the maximum number of rows in each row group.
+            Larger row groups compress better, smaller ones give finer predicate pushdown.
+
+        use_dictionary: bool or list[str],
+            dictionary encode all columns, or only the listed columns.
+            Dictionary encoding pays off for repetitive columns like `asin` and `reviewerID`, not free text.
+
+        compression: str,
+            compression codec, eg. `"zstd"`, `"snappy"`, `"gzip"` or `"none"`.
+
+        compression_level: int, optional,
+            level of the compression codec, uses the codec default if not specified.
+        """
+        self.root = Path(root)
+        self.ratings_column = ratings_column
+        self.ratings_type = ratings_type
+        self.partition_by_year = partition_by_year
+        self.time_column = time_column
+        self.row_group_size = row_group_size
+        self.use_dictionary = use_dictionary
+        self.compression = compression
+        self.compression_level = compression_level
+
+        self._chunk_ratings_type: Optional[pa.DataType] = None
+
+
+    @property
+    def partitioning(self) -> Union[ds.Partitioning, ds.PartitioningFactory]:
+        """
+        The partitioning of the dataset, with the ratings typed as `ratings_type` or as the written chunks.
+        If neither is known, eg. when opening a dataset written by another writer, partition types are inferred.
+        """
+        ratings_type = self.ratings_type or self._chunk_ratings_type
+
+        if ratings_type is None:
+            return ds.HivePartitioning.discover()
+
+        return self._partitioning(ratings_type)
+
+
+    def _partitioning(self, ratings_type: pa.DataType) -> ds.Partitioning:
+        fields = [pa.field(self.ratings_column, ratings_type)]
+
+        if self.partition_by_year:
+            fields.append(pa.field("year", pa.int32()))
+
+        return ds.partitioning(pa.schema(fields), flavor="hive")
+
+
+    def __call__(
+            self,
+            chunk: Union[pd.DataFrame, pa.Table],
+            save_path: Union[str, os.PathLike]
+        ) -> List[str]:
+
+        """
+        Writes one chunk into the dataset, the file names start with the name of `save_path`.
+        Returns the paths of the written files.
+        """
+        table = self._to_table(chunk)
+        written_files: List[str] = []
+
+        ds.write_dataset(
+            table,
+            self.root,
+            basename_template = f"{Path(save_path).name}-{{i}}.parquet",
+            format = "parquet",
+            partitioning = self._partitioning(table.schema.field(self.ratings_column).type),
+            file_options = self._file_options(),
+            min_rows_per_group = min(self.row_group_size, len(table)) or None,
+            max_rows_per_group = self.row_group_size,
+            existing_data_behavior = "overwrite_or_ignore",
+            file_visitor = lambda written_file: written_files.append(written_file.path)
+        )
+
+        return sorted(written_files)
+
+
+    def compact(self) -> List[str]:
+        """
+        Merges the files of each partition into one file, of row groups of `row_group_size` rows.
+        Streams the rows of one partition at a time, so memory is bound by the row groups and not the partitions.
+
+        Call when all chunks are saved, and before `write_metadata`. The files recorded by a `ChunkManifest` are replaced,
+        so a resumed extraction into the same dataset redoes its chunks. Returns the paths of the compacted files.
+        """
+        compacted_files: List[str] = []
+
+        for directory in sorted({path.parent for path in self._files()}):
+            files = [path for path in self._files(directory) if path.parent == directory]
+
+            if len(files) < 2:
+                compacted_files.extend(str(path) for path in files)
+                continue
+
+            # Written next to the files first, hidden from readers, and moved in place before the merged files are removed
+            tmp_dir = directory / ".compact"
+            written_files: List[str] = []
+
+            ds.write_dataset(
+                ds.dataset([str(path) for path in files], format="parquet"),
+                tmp_dir,
+                basename_template = "part-{i}.parquet",
+                format = "parquet",
+                file_options = self._file_options(),
+                min_rows_per_group = self.row_group_size,
+                max_rows_per_group = self.row_group_size,
+                existing_data_behavior = "delete_matching",
+                file_visitor = lambda written_file: written_files.append(written_file.path)
+            )
+
+            for written_file in written_files:
+                path = directory / Path(written_file).name
+                os.replace(written_file, path)
+                compacted_files.append(str(path))
+
+            for path in files:
+                if str(path) not in compacted_files:
+                    path.unlink()
+
+            tmp_dir.rmdir()
+
+        return compacted_files
+
+
+    def write_metadata(self) -> pq.FileMetaData:
+        """
+        Writes the `_common_metadata` schema and `_metadata` summary of all row groups in the dataset,
+        collected from the file footers, so it also covers chunks written by worker processes or earlier runs.
+
+        Readers can then plan which row groups to read from one file, without opening every file in the dataset.
+        """
+        files = self._files()
+
+        if not files:
+            raise ValueError(f"No parquet files in {self.root}.")
+
+        schema = pq.read_schema(files[0])
+        metadata_collector = []
+
+        for path in files:
+            metadata = pq.read_metadata(path)
+
+            if not metadata.schema.to_arrow_schema().equals(schema):
+                raise ValueError(f"Schema of {path} differs from {files[0]}, can not summarize the dataset.")
+
+            metadata.set_file_path(path.relative_to(self.root).as_posix())
+            metadata_collector.append(metadata)
+
+        pq.write_metadata(schema, self.root / "_common_metadata")
+        pq.write_metadata(schema, self.root / "_metadata", metadata_collector=metadata_collector)
+
+        return pq.read_metadata(self.root / "_metadata")
+
+
+    def dataset(self) -> ds.Dataset:
+        """
+        Opens the written dataset, with the partition columns typed as when written.
+        """
+        return ds.dataset(self.root, format="parquet", partitioning=self.partitioning)
+
+
+    def _files(self, directory: Optional[Path] = None) -> List[Path]:
+        """
+        The data files of the dataset, or of a partition directory, skipping hidden and metadata files.
+        """
+        return sorted(
+            path for path in (directory or self.root).rglob("*.parquet")
+            if not any(part.startswith(("_", ".")) for part in path.relative_to(self.root).parts)
+        )
+
+
+    def _file_options(self) -> ds.FileWriteOptions:
+        return ds.ParquetFileFormat().make_write_options(
+            compression = self.compression,
+            compression_level = self.compression_level,
+            use_dictionary = self.use_dictionary
+        )
+
+
+    def _to_table(self, chunk: Union[pd.DataFrame, pa.Table]) -> pa.Table:
+        table = pa.Table.from_pandas(chunk, preserve_index=False) if isinstance(chunk, pd.DataFrame) else chunk
+
+        if self.ratings_type is not None:
+            table = table.set_column(
+                table.schema.get_field_index(self.ratings_column),
+                self.ratings_column,
+                table[self.ratings_column].cast(self.ratings_type)
+            )
+
+        self._chunk_ratings_type = table.schema.field(self.ratings_column).type
+
+        if self.partition_by_year:
+            time = table[self.time_column]
+
+            if not pa.types.is_timestamp(time.type):
+                time = time.cast(pa.int64()).cast(pa.timestamp("s"))
+
+            table = table.append_column("year", pa.compute.year(time).cast(pa.int32()))
+
+        return table
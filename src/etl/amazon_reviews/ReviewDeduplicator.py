@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from math import ceil, exp, log
+
+from src.text_transform.text_normalization import normalize_text_pandas
+
+from typing import Optional, Tuple
+
+# Keys of the two independent hashes of each review, must be 16 bytes
+_HASH_KEYS = ("reviewdedupkey01", "reviewdedupkey02")
+
+
+class ReviewDeduplicator:
+    """
+    Drops duplicate reviews across chunks, with a Bloom filter of the reviews seen so far.
+
+    Reviews are duplicates when they have the same `reviewerID` and the same normalized text,
+    ie. lowercased, without punctuation and with collapsed whitespace,
+    which catches the same review posted on several variants of one product.
+
+    The filter has a fixed size, so memory does not grow with the number of reviews.
+    Unique reviews are dropped with a probability of about `false_positive_rate`,
+    as long as no more than `capacity` unique reviews are added. Duplicates are always dropped.
+
+    ## Examples
+
+    Deduplicate up to 50 million reviews in at most 64 MB:
+        >>> deduplicator = ReviewDeduplicator(capacity=50_000_000, max_memory=64 * 2**20)
+        >>> extractor = AmazonReviewsExtractor("Books_5.json.gz", deduplicator=deduplicator)
+    """
+
+    def __init__(
+            self,
+            capacity: int = 10_000_000,
+            false_positive_rate: float = 0.001,
+            max_memory: Optional[int] = None,
+            text_column: str = "reviewText",
+            reviewer_column: Optional[str] = "reviewerID"
+        ) -> None:
+
+        """
+        ## Params
+        capacity: int,
+            the expected number of unique reviews.
+
+        false_positive_rate: float,
+            the probability of dropping a unique review once `capacity` reviews are added.
+
+        max_memory: int, optional,
+            the maximum size of the filter in bytes. If the filter for `capacity` and `false_positive_rate` is larger,
+            it is capped and the false positive rate is higher, see `expected_false_positive_rate`.
+
+        text_column: str,
+            the column with the review text.
+
+        reviewer_column: str, optional,
+            the column with the reviewer id, reviews are compared by text only if not specified or not in the chunk.
+        """
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.text_column = text_column
+        self.reviewer_column = reviewer_column
+
+        num_bits = ceil(-capacity * log(false_positive_rate) / log(2) ** 2)
+
+        if max_memory is not None:
+            num_bits = min(num_bits, 8 * max_memory)
+
+        self.num_bits = max(64 * (num_bits // 64), 64)
+        self.num_hashes = max(round(self.num_bits / capacity * log(2)), 1)
+        self.num_added = 0
+
+        self._bits = np.zeros(self.num_bits // 64, dtype=np.uint64)
+
+
+    @property
+    def memory(self) -> int:
+        """
+        Size of the filter in bytes.
+        """
+        return self._bits.nbytes
+
+
+    def expected_false_positive_rate(self, num_items: Optional[int] = None) -> float:
+        """
+        The probability of dropping a unique review after `num_items` unique reviews are added, default is `capacity`.
+        """
+        num_items = self.capacity if num_items is None else num_items
+
+        return (1 - exp(-self.num_hashes * num_items / self.num_bits)) ** self.num_hashes
+
+
+    def drop_duplicates(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """
+        Drops the reviews seen before, in this chunk or an earlier one, and adds the rest to the filter.
+        Returns the remaining reviews and the number of dropped reviews.
+        """
+        if df.empty:
+            return df, 0
+
+        first_hash, second_hash = self._hash(df)
+
+        # Duplicates within the chunk are found exactly, only the first occurrence is looked up in the filter
+        is_duplicate = pd.DataFrame({"first": first_hash, "second": second_hash}).duplicated().to_numpy()
+
+        words, masks = self._positions(first_hash, second_hash)
+        is_duplicate |= ((self._bits[words] & masks) != 0).all(axis=1)
+
+        np.bitwise_or.at(self._bits, words[~is_duplicate].ravel(), masks[~is_duplicate].ravel())
+        self.num_added += int((~is_duplicate).sum())
+
+        return df.loc[~is_duplicate], int(is_duplicate.sum())
+
+
+    def _hash(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        text = normalize_text_pandas(
+            df[self.text_column].fillna("").astype(str).str.lower().str.replace(r"[^\w\s]", "", regex=True)
+        )
+        keys = pd.DataFrame({"text": text.to_numpy()})
+
+        if self.reviewer_column in df.columns:
+            keys["reviewer"] = df[self.reviewer_column].astype(str).to_numpy()
+
+        return tuple(
+            pd.util.hash_pandas_object(keys, index=False, hash_key=hash_key).to_numpy()
+            for hash_key in _HASH_KEYS
+        )
+
+
+    def _positions(
+            self,
+            first_hash: np.ndarray,
+            second_hash: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray]:
+
+        """
+        The words and bit masks of the `num_hashes` bits of each review, by double hashing.
+        """
+        hashes = np.arange(self.num_hashes, dtype=np.uint64)
+        positions = (first_hash[:, None] + hashes[None, :] * (second_hash[:, None] | np.uint64(1))) % np.uint64(self.num_bits)
+
+        return positions >> np.uint64(6), np.uint64(1) << (positions & np.uint64(63))
@@ -0,0 +1,238 @@
+import numpy as np
+import os
+from pathlib import Path
+from itertools import islice
+
+from pandas.io.common import get_handle
+
+from typing import List, Optional, Union, Tuple, IO
+
+try:
+    import indexed_gzip
+except ImportError:
+    indexed_gzip = None
+
+
+class ReviewsIndex:
+    """
+    Sidecar index of line offsets in a json lines file of reviews, for random access without parsing the lines before.
+
+    Records the uncompressed byte offset of every `every` lines, saved next to the file as `<file>.idx.npz`.
+    For `.gz` files a zran index of decompressor checkpoints is also saved as `<file>.gzidx` if `indexed_gzip` is installed,
+    which makes seeking in the compressed file about as cheap as in an uncompressed one.
+    Without it seeking in compressed files decompresses everything before the offset, but still skips parsing.
+
+    ## Examples
+
+    Split one file across workers, each starting at a chunk boundary:
+        >>> index = ReviewsIndex.load_or_build("Books_5.json.gz", every=100_000)
+        >>> for start, stop in index.split(num_parts=8): ...
+
+    Load 10 random reviews:
+        >>> index.sample_lines(10)
+    """
+
+    def __init__(
+            self,
+            path_or_buf: Union[str, os.PathLike],
+            every: int = 100_000,
+            index_path: Optional[Union[str, os.PathLike]] = None,
+            gzip_spacing: int = 1 << 22
+        ) -> None:
+
+        """
+        ## Params
+        path_or_buf: pathlike,
+            path to the json lines file to index, can be compressed.
+
+        every: int,
+            the number of lines between recorded offsets.
+
+        index_path: pathlike, optional,
+            where to save the index, default is `<path_or_buf>.idx.npz`.
+
+        gzip_spacing: int,
+            the number of uncompressed bytes between decompressor checkpoints in `.gz` files.
+        """
+        self.path_or_buf = Path(path_or_buf)
+        self.every = every
+        self.index_path = Path(index_path) if index_path else Path(f"{self.path_or_buf}.idx.npz")
+        self.gzip_index_path = Path(f"{self.path_or_buf}.gzidx")
+        self.gzip_spacing = gzip_spacing
+
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.num_records = 0
+
+
+    @property
+    def is_gzip(self) -> bool:
+        return self.path_or_buf.suffix == ".gz"
+
+
+    @property
+    def uses_gzip_checkpoints(self) -> bool:
+        return self.is_gzip and indexed_gzip is not None
+
+
+    @classmethod
+    def load(
+            cls,
+            path_or_buf: Union[str, os.PathLike],
+            index_path: Optional[Union[str, os.PathLike]] = None
+        ) -> "ReviewsIndex":
+
+        """
+        Loads a saved index, raises `ValueError` if the file has changed since the index was built.
+        """
+        index = cls(path_or_buf, index_path=index_path)
+
+        with np.load(index.index_path) as saved:
+            if tuple(saved["source_stat"]) != index._source_stat():
+                raise ValueError(f"Index {index.index_path} is stale, {index.path_or_buf} has changed since it was built.")
+
+            index.every = int(saved["every"])
+            index.num_records = int(saved["num_records"])
+            index.offsets = saved["offsets"]
+
+        return index
+
+
+    @classmethod
+    def load_or_build(
+            cls,
+            path_or_buf: Union[str, os.PathLike],
+            every: int = 100_000,
+            index_path: Optional[Union[str, os.PathLike]] = None
+        ) -> "ReviewsIndex":
+
+        """
+        Loads the saved index if it is up to date and at least as fine as `every`, otherwise builds and saves a new one.
+        """
+        try:
+            index = cls.load(path_or_buf, index_path=index_path)
+
+            if every % index.every == 0 and (not index.is_gzip or index.gzip_index_path.exists() or not index.uses_gzip_checkpoints):
+                return index
+
+        except (FileNotFoundError, ValueError):
+            pass
+
+        return cls(path_or_buf, every=every, index_path=index_path).build().save()
+
+
+    def build(self) -> "ReviewsIndex":
+        """
+        Scans the file once, recording the offset of every `every` lines.
+        """
+        offsets = []
+        offset = 0
+        num_records = 0
+
+        with self._open() as handle:
+            for line in handle:
+                if num_records % self.every == 0:
+                    offsets.append(offset)
+
+                offset += len(line)
+                num_records += 1
+
+            if self.uses_gzip_checkpoints:
+                handle.build_full_index()
+                handle.export_index(str(self.gzip_index_path))
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.num_records = num_records
+
+        return self
+
+
+    def save(self) -> "ReviewsIndex":
+        np.savez(
+            self.index_path,
+            every = self.every,
+            num_records = self.num_records,
+            offsets = self.offsets,
+            source_stat = np.array(self._source_stat(), dtype=np.int64)
+        )
+
+        return self
+
+
+    def open(self, record: int = 0) -> IO[bytes]:
+        """
+        Opens the file in binary mode positioned at the start of line number `record`, counting from 0.
+        """
+        checkpoint = min(record // self.every, len(self.offsets) - 1) if len(self.offsets) else 0
+
+        handle = self._open(use_gzip_index=True)
+        handle.seek(int(self.offsets[checkpoint]) if len(self.offsets) else 0)
+
+        for _ in islice(handle, record - checkpoint * self.every):
+            pass
+
+        return handle
+
+
+    def chunk_ranges(self, chunksize: int) -> List[Tuple[int, int]]:
+        """
+        The start and stop line of each chunk of `chunksize` lines.
+        """
+        return [
+            (start, min(start + chunksize, self.num_records)) for start in range(0, self.num_records, chunksize)
+        ]
+
+
+    def split(self, num_parts: int) -> List[Tuple[int, int]]:
+        """
+        Splits the file in up to `num_parts` ranges of lines of about equal size, starting at recorded offsets.
+        """
+        starts = np.unique(np.linspace(0, len(self.offsets), num_parts, endpoint=False).astype(int)) * self.every
+        stops = np.append(starts[1:], self.num_records)
+
+        return [(int(start), int(stop)) for start, stop in zip(starts, stops)]
+
+
+    def sample_lines(self, num_lines: int, seed: Optional[int] = None) -> List[bytes]:
+        """
+        Reads `num_lines` random lines, without replacement.
+
+        At most `every` lines are skipped for each sampled line, the rest of the file is not read.
+        """
+        rng = np.random.default_rng(seed)
+        records = np.sort(rng.choice(self.num_records, size=min(num_lines, self.num_records), replace=False))
+        lines = []
+
+        with self._open(use_gzip_index=True) as handle:
+            position = None
+
+            for record in records:
+                checkpoint = record // self.every
+
+                if position is None or position < checkpoint * self.every:
+                    handle.seek(int(self.offsets[checkpoint]))
+                    position = checkpoint * self.every
+
+                for _ in islice(handle, record - position):
+                    pass
+
+                lines.append(handle.readline())
+                position = record + 1
+
+        return lines
+
+
+    def _open(self, use_gzip_index: bool = False) -> IO[bytes]:
+        if self.uses_gzip_checkpoints:
+            return indexed_gzip.IndexedGzipFile(
+                str(self.path_or_buf),
+                spacing = self.gzip_spacing,
+                index_file = str(self.gzip_index_path) if use_gzip_index and self.gzip_index_path.exists() else None
+            )
+
+        return get_handle(self.path_or_buf, "rb", compression="infer", is_text=False).handle
+
+
+    def _source_stat(self) -> Tuple[int, int]:
+        stat = self.path_or_buf.stat()
+
+        return stat.st_size, stat.st_mtime_ns
@@ -1,30 +1,58 @@
-import pandas as pd
-import numpy as np
-from numpy.random import RandomState
 import os
-from pathlib import Path
 
 from pyspark.sql import SparkSession, DataFrame
+from pyspark.sql import functions as F
 from pyspark.sql.types import (
-    StructType, 
+    StructType,
     StructField,
-    IntegerType, 
+    LongType,
     StringType,
-    ByteType,
-    DateType,
     BooleanType,
-    FloatType,
+    DoubleType,
+    ArrayType,
+    MapType,
 )
 
-from typing import List, Optional, Union, Callable
+from typing import List, Optional, Union, Dict
+
+from src.text_transform.text_normalization import normalize_text_spark
+
+
+# Schema of the review files, fields that are missing in a review are null
+REVIEW_SCHEMA = StructType([
+    StructField("overall", DoubleType()),
+    StructField("verified", BooleanType()),
+    StructField("reviewTime", StringType()),
+    StructField("reviewerID", StringType()),
+    StructField("asin", StringType()),
+    StructField("style", MapType(StringType(), StringType())),
+    StructField("reviewerName", StringType()),
+    StructField("reviewText", StringType()),
+    StructField("summary", StringType()),
+    StructField("unixReviewTime", LongType()),
+    StructField("vote", StringType()),
+    StructField("image", ArrayType(StringType()))
+])
 
 
 class SparkAmazonReviewsExtractor:
     """
     AmazonReviewsExtractor, extracts and transforms amazon reviews like [these](https://nijianmo.github.io/amazon/index.html).
 
-    Class is based on and inherits from pandas.JsonReader.
+    Spark version of `AmazonReviewsExtractor` for review dumps too large for one machine's memory,
+    the whole file is extracted as one lazy Spark DataFrame instead of in chunks.
+    All transformations are built from Spark SQL functions, so no rows are sent through Python.
+
+    ## Examples
 
+    Extract to a Parquet dataset partitioned by rating, on all cores of this machine:
+        >>> extractor = SparkAmazonReviewsExtractor(
+        ...     "data/raw/Sports_and_Outdoors_5.json.gz",
+        ...     features = ["overall", "reviewText"],
+        ...     maximum_words = 100,
+        ...     outdir = "data/processed/Sports_and_Outdoors"
+        ... )
+        >>> extractor.load()
     """
 
     def __init__(
@@ -37,14 +65,74 @@ class SparkAmazonReviewsExtractor:
             ratings_column: str = "overall",
             balance_num_pos_neg_ratings: bool = True,
             balance_neutral_reviews: bool = False,
+            seed: int = 0,
             convert_dates: Optional[List[str]] = ["unixReviewTime"],
             outdir: Optional[Union[str, os.PathLike]] = None,
+            partition_by_year: bool = False,
+            time_column: str = "unixReviewTime",
+            compression: str = "snappy",
+            spark_session: Optional[SparkSession] = None,
+            master: str = "local[*]"
         ) -> None:
 
         """
-        WIP
-        """        
-        self.path_or_buf = Path(path_or_buf)
+        ## Params
+        path_or_buf: pathlike,
+            path, glob or URI of the json lines files to load, eg. `s3a://bucket/Books_5.json.gz`, can be compressed.
+            Note that `.gz` files can not be split, so one large `.gz` file is read by a single task.
+
+        features: list of feature names, optional,
+            the features to extract. Only these fields are parsed, the others are skipped by the json reader.
+
+        maximum_words: int, optional,
+            if specified sets the maximum number of words a reviewText can have,
+            longer are cut to length of maximum_words.
+
+        review_text_column: str,
+            specifies which column contains the reviews text. Default is "reviewText".
+
+        drop_empty_reviews: bool,
+            drop rows where reviews are missing or only contain whitespace.
+
+        ratings_column: str,
+            specifies the name of the column that contains the ratings of the reviews.
+            Default is "overall".
+
+        balance_num_pos_neg_ratings: bool,
+            undersampling so that the number of positive (`rating>3`) and negative (`rating<3`) reviews are about equal,
+            with `DataFrame.sampleBy`. Costs an extra pass over the file counting ratings.
+            Rows with ratings outside 1 to 5, eg. missing ratings, are dropped.
+
+        balance_neutral_reviews: bool,
+            balance the number of neutral reviews (`rating==3`) to the average of negative and positive reviews.
+
+        seed: int,
+            seed of the random sampling used to balance reviews.
+
+        convert_dates: list[str], optional,
+            names of columns with unix timestamps to convert to timestamps.
+
+        outdir: pathlike, optional,
+            if specified `load` saves the reviews to `outdir`, a path or URI, as a Parquet dataset partitioned by rating,
+            instead of returning the DataFrame.
+
+        partition_by_year: bool,
+            also partition the saved dataset by the year of `time_column`, added as a `year` column.
+
+        time_column: str,
+            column of unix timestamps in seconds, or timestamps, to take years from.
+
+        compression: str,
+            compression codec of the saved Parquet files, eg. `"snappy"`, `"zstd"` or `"gzip"`.
+
+        spark_session: SparkSession, optional,
+            the session to use, by default a session is created or reused with `master`.
+
+        master: str,
+            the Spark master of a created session. Default is `"local[*]"`, all cores of this machine.
+        """
+        # Kept as strings, as `Path` would normalize the double slash of URIs like `s3a://bucket`
+        self.path_or_buf = os.fspath(path_or_buf)
         self.features = features
         self.maximum_words = maximum_words
         self.review_text_column = review_text_columnn
@@ -52,62 +140,131 @@ class SparkAmazonReviewsExtractor:
         self.ratings_column = ratings_column
         self.balance_num_pos_neg_rating = balance_num_pos_neg_ratings
         self.balance_neutral_reviews = balance_neutral_reviews
+        self.seed = seed
         self.convert_dates = convert_dates
-        self.outdir = outdir
+        self.outdir = os.fspath(outdir) if outdir else None
+        self.partition_by_year = partition_by_year
+        self.time_column = time_column
+        self.compression = compression
+
+        if self.features:
+            self.schema = StructType([field for field in REVIEW_SCHEMA.fields if field.name in self.features])
+        else:
+            self.schema = REVIEW_SCHEMA
 
-        self._loaded_chunks = 0
+        self.spark_session = spark_session or SparkSession.builder.master(master).getOrCreate()
 
-        self._rs = RandomState(0)
 
-        self.schema = StructType([
-            StructField("overall", IntegerType()),
-            StructField("verified", BooleanType()),
-            StructField("reviewTime", StringType()),
-            StructField("reviewerID", StringType()),
-            StructField("asin", IntegerType()),
-            StructField("reviewerName", StringType()),
-            StructField("reviewText", StringType()),
-            StructField("summary", StringType()),
-            StructField("unixreviewTime", DateType()),
-            StructField("style", ByteType()),
-            StructField("vote", FloatType()),
-            StructField("image", StringType())
-        ])
+    def load(self) -> Union[DataFrame, None]:
+        """
+        Loads and transforms the reviews as a lazy DataFrame,
+        or loads, transforms and saves the reviews if `outdir` is specified.
+        """
+        df = self._transform(self._load())
 
-        self.spark_session = SparkSession.builder.getOrCreate()
+        if not self.outdir:
+            return df
+
+        elif self.outdir:
+            self._save(df)
 
 
     def _transform(self, df: DataFrame) -> DataFrame:
-        if self.features:
-            cur_columns = set(df.columns)
-            features_to_keep = set(self.features)
-            columns_to_drop = cur_columns.difference(features_to_keep)
-        
-            df = df.drop(*columns_to_drop)
+        """
+        The transformation pipe, in the order of `AmazonReviewsExtractor`: reviews are balanced before empty reviews are dropped.
+        """
+        if self.balance_num_pos_neg_rating:
+            df = self._balance_reviews(df)
 
-        if self.drop_empty_reviews:
-            df = (
-                df.where(f"{self.review_text_column} != ''")
-                .where(f"{self.review_text_column} is not null")
-            )
+        text = F.coalesce(F.col(self.review_text_column), F.lit(""))
 
         if self.maximum_words:
-            df.foreach(
-                lambda x: " ".join(
-                    x.reviewText.split()
-                )[:self.maximum_words]
-            )
+            text = normalize_text_spark(text, self.maximum_words)
+
+        df = df.withColumn(self.review_text_column, text)
+
+        if self.drop_empty_reviews:
+            df = df.where(F.trim(F.col(self.review_text_column)) != "")
+
+        for column in self.convert_dates or []:
+            if column in df.columns:
+                df = df.withColumn(column, F.col(column).cast("timestamp"))
 
         return df
 
+
+    def _balance_reviews(self, df: DataFrame) -> DataFrame:
+        """
+        Balances the number of negative and positive reviews, and optionally neutral reviews, by undersampling.
+
+        The rating counts are computed in one aggregation,
+        from which the fraction of each rating to keep is passed to `sampleBy`.
+        Each row is kept independently with its fraction, so the counts are balanced in expectation.
+        """
+        if not (self.ratings_column in df.columns and self.review_text_column in df.columns):
+            raise ValueError("Ratings column and review text column must be in DataFrame to balance reviews.")
+
+        counts = {
+            row[self.ratings_column]: row["count"]
+            for row in df.groupBy(self.ratings_column).count().collect()
+        }
+
+        return df.sampleBy(
+            self.ratings_column,
+            fractions = self._sample_fractions(counts),
+            seed = self.seed
+        )
+
+
+    def _sample_fractions(self, counts: Dict[float, int]) -> Dict[float, float]:
+        """
+        The fraction to keep of each rating, from the number of reviews of each rating.
+        """
+        num_negative = counts.get(1.0, 0) + counts.get(2.0, 0)
+        num_positive = counts.get(4.0, 0) + counts.get(5.0, 0)
+        num_neutral = counts.get(3.0, 0)
+
+        target = min(num_negative, num_positive)
+        fraction_negative = target / num_negative if num_negative else 1.0
+        fraction_positive = target / num_positive if num_positive else 1.0
+        fraction_neutral = 1.0
+
+        if self.balance_neutral_reviews and num_neutral:
+            fraction_neutral = min(1.0, (2 * target / 4) / num_neutral)
+
+        return {
+            1.0: fraction_negative,
+            2.0: fraction_negative,
+            3.0: fraction_neutral,
+            4.0: fraction_positive,
+            5.0: fraction_positive
+        }
+
+
     def _load(self) -> DataFrame:
         df = self.spark_session.read.json(
-            path = "./data/raw/Sports_and_Outdoors_5.json.gz",
+            path = self.path_or_buf,
             schema = self.schema,
-            multiLine=False
+            multiLine = False
         )
-        
+
         return df
-    
-    def _save(self) -> None:
-        ...
\ No newline at end of file
+
+
+    def _save(self, df: DataFrame) -> None:
+        """
+        Saves the reviews to `self.outdir` as a Parquet dataset partitioned by rating, and optionally by year.
+        """
+        partition_by = [self.ratings_column]
+
+        if self.partition_by_year:
+            df = df.withColumn("year", F.year(F.col(self.time_column).cast("timestamp")))
+            partition_by.append("year")
+
+        (
+            df.write
+            .partitionBy(*partition_by)
+            .option("compression", self.compression)
+            .mode("overwrite")
+            .parquet(self.outdir)
+        )
@@ -0,0 +1,119 @@
+import json
+import numpy as np
+import pandas as pd
+
+from typing import List, Optional, Union, Iterable, Dict, Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Projection-aware parser of json lines of reviews, an alternative to pandas `JsonReader`.
+# Only the requested features are taken from each decoded line and built into typed columns,
+# instead of materializing every field, eg. the `style` dicts and `image` lists, in a DataFrame first.
+
+loads = orjson.loads if orjson is not None else json.loads
+
+# Types of the numeric and boolean fields of the reviews, and the python types of their values.
+# Floats may have missing values, the other fields are only typed when all values have the python type.
+REVIEW_DTYPES = {
+    "overall": (np.float64, (float, int)),
+    "verified": (np.bool_, (bool,)),
+    "unixReviewTime": (np.int64, (int,)),
+}
+
+
+def parse_review_lines(
+        lines: Iterable[Union[str, bytes]],
+        features: Optional[List[str]] = None,
+        convert_dates: Union[bool, List[str], None] = None
+    ) -> pd.DataFrame:
+
+    """
+    Parses json lines of reviews into a DataFrame with only the columns in `features`.
+
+    Uses `orjson` if it is installed, otherwise the standard library `json`.
+    Missing fields are NaN, as with `JsonReader`. Blank lines are skipped.
+
+    ## Params
+    lines: iterable of str or bytes,
+        json lines, one review in each.
+
+    features: list of feature names, optional,
+        the fields to keep, in order. All fields are kept if not specified, in order of first appearance.
+
+    convert_dates: bool or list[str], optional,
+        names of columns to convert to datetimes, numbers are taken as unix timestamps in seconds.
+        If `True` the columns pandas would convert by default are converted, see `_is_default_date_column`.
+
+    ## Examples
+        >>> parse_review_lines(lines, features=["overall", "reviewText"])
+    """
+    records = [loads(line) for line in lines if line.strip()]
+
+    if features is None:
+        features = list(dict.fromkeys(key for record in records for key in record))
+
+    df = pd.DataFrame(
+        {feature: _build_column(records, feature) for feature in features},
+        columns = features
+    )
+
+    if convert_dates is True:
+        convert_dates = [column for column in features if _is_default_date_column(column)]
+
+    for column in convert_dates or []:
+        if column in df.columns:
+            df[column] = _convert_date_column(df[column])
+
+    return df
+
+
+def _build_column(
+        records: List[Dict[str, Any]],
+        feature: str
+    ) -> Union[np.ndarray, List[Any]]:
+
+    """
+    Collects one field of all records into a typed array if possible, otherwise into a list to let pandas infer its type.
+    """
+    values = [record.get(feature, np.nan) for record in records]
+
+    if feature not in REVIEW_DTYPES:
+        return values
+
+    dtype, python_types = REVIEW_DTYPES[feature]
+
+    if dtype is np.float64:
+        values = [np.nan if value is None else value for value in values]
+
+    # Exact types, since bool is a subclass of int
+    if all(type(value) in python_types for value in values):
+        return np.array(values, dtype=dtype)
+
+    return values
+
+
+def _convert_date_column(column: pd.Series) -> pd.Series:
+    try:
+        if pd.api.types.is_numeric_dtype(column):
+            return pd.to_datetime(column, unit="s")
+
+        return pd.to_datetime(column)
+
+    except (ValueError, TypeError, OverflowError):
+        return column
+
+
+def _is_default_date_column(column: str) -> bool:
+    """
+    Same names as pandas `keep_default_dates`.
+    """
+    column = column.lower()
+
+    return (
+        column.endswith(("_at", "_time"))
+        or column in ("modified", "date", "datetime")
+        or column.startswith("timestamp")
+    )
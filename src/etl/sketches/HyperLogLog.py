@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from typing import Iterable
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch of the number of distinct values, in `2 ** precision` bytes.
+
+    The relative standard error of the estimate is about `1.04 / sqrt(2 ** precision)`, 0.8% with the default precision.
+    Sketches with the same precision merge to the sketch of the union of their values,
+    so chunks can be sketched in parallel and merged in any order.
+
+    ## Examples
+        >>> sketch = HyperLogLog()
+        >>> sketch.add(df["reviewerID"])
+        >>> sketch.merge(other_sketch).count()
+    """
+
+    def __init__(self, precision: int = 14) -> None:
+        """
+        ## Params
+        precision: int,
+            number of bits of the hash used to pick a register, between 4 and 18.
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError(f"precision must be between 4 and 18, got {precision}.")
+
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+
+    def add(self, values: Iterable) -> "HyperLogLog":
+        """
+        Adds values, eg. a Series or array of strings. Missing values are ignored.
+        """
+        values = pd.Series(values, dtype=object).dropna().to_numpy()
+
+        if not len(values):
+            return self
+
+        hashes = pd.util.hash_array(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+
+        # The rank is the position of the first set bit in the remaining bits, counting from 1
+        remaining = hashes << np.uint64(self.precision)
+        rank = np.minimum(64 - self._bit_length(remaining) + 1, 64 - self.precision + 1)
+
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+        return self
+
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError(f"Can not merge sketches of precision {self.precision} and {other.precision}.")
+
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+        return self
+
+
+    def count(self) -> int:
+        """
+        The estimated number of distinct values added.
+        """
+        num_registers = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / num_registers)
+        estimate = alpha * num_registers ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+
+        # Linear counting is more accurate for small counts
+        num_zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * num_registers and num_zeros:
+            estimate = num_registers * np.log(num_registers / num_zeros)
+
+        return int(round(estimate))
+
+
+    @staticmethod
+    def _bit_length(values: np.ndarray) -> np.ndarray:
+        """
+        Exact bit length of uint64 values, from the bit lengths of their 32 bit halves,
+        which are exact in float64 unlike 64 bit values.
+        """
+        high = (values >> np.uint64(32)).astype(np.float64)
+        low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+
+        with np.errstate(divide="ignore"):
+            high_length = np.where(high > 0, np.floor(np.log2(high)) + 33, 0)
+            low_length = np.where(low > 0, np.floor(np.log2(low)) + 1, 0)
+
+        return np.where(high > 0, high_length, low_length).astype(np.int64)
@@ -0,0 +1,113 @@
+import numpy as np
+from math import ceil
+
+from typing import List, Iterable, Sequence, Union
+
+
+class KllSketch:
+    """
+    KLL sketch of the distribution of numbers, for approximate quantiles in bounded memory.
+
+    Items are kept in levels of compactors, an item at level `h` stands for `2 ** h` of the added items.
+    When a level is full it is sorted and every other item is promoted to the next level.
+    The rank error is about `1.7 / k`, 1% with the default `k`, using `O(k)` memory regardless of the number of items.
+    Sketches merge to the sketch of all their items, so chunks can be sketched in parallel and merged in any order.
+
+    ## Examples
+        >>> sketch = KllSketch()
+        >>> sketch.update(word_counts)
+        >>> sketch.merge(other_sketch).quantiles([0.5, 0.95, 0.99])
+    """
+
+    def __init__(
+            self,
+            k: int = 200,
+            seed: int = 0
+        ) -> None:
+
+        """
+        ## Params
+        k: int,
+            capacity of the top level, sets the accuracy and memory of the sketch.
+
+        seed: int,
+            seed of the random choice of which items to promote.
+        """
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+
+        self._rng = np.random.default_rng(seed)
+
+
+    def update(self, values: Iterable[Union[int, float]]) -> "KllSketch":
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+
+        return self
+
+
+    def merge(self, other: "KllSketch") -> "KllSketch":
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            self.levels[level] = np.concatenate([self.levels[level], items])
+
+        self.count += other.count
+        self._compress()
+
+        return self
+
+
+    def quantiles(self, quantiles: Sequence[float]) -> List[float]:
+        """
+        The approximate values at the `quantiles`, between 0 and 1. NaN if the sketch is empty.
+        """
+        if not self.count:
+            return [np.nan for _ in quantiles]
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2 ** level) for level, level_items in enumerate(self.levels)])
+
+        order = np.argsort(items, kind="stable")
+        items = items[order]
+        cumulative_weights = np.cumsum(weights[order])
+
+        ranks = np.asarray(quantiles) * cumulative_weights[-1]
+        index = np.minimum(np.searchsorted(cumulative_weights, ranks, side="left"), len(items) - 1)
+
+        return items[index].tolist()
+
+
+    def _capacity(self, level: int) -> int:
+        """
+        Capacities shrink by a factor 2/3 for each level below the top level.
+        """
+        depth = len(self.levels) - level - 1
+
+        return max(int(ceil(self.k * (2 / 3) ** depth)), 2)
+
+
+    def _compress(self) -> None:
+        level = 0
+
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+
+                items = np.sort(self.levels[level])
+
+                # An odd item out stays at this level, so the promoted items keep the total weight
+                kept = items[len(items) - len(items) % 2:]
+                promoted = items[self._rng.integers(2):len(items) - len(items) % 2:2]
+
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+            level += 1
@@ -1,11 +1,8 @@
 import pandas as pd
 import numpy as np
-from bs4 import BeautifulSoup
-from nltk.corpus import stopwords
-import re
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.model_selection import train_test_split
-from models.tf_idf.tfidf_functions import clean_data, review_to_words
+from src.models.tf_idf.tfidf_functions import CleanData
+from src.models.tf_idf.TfIdfFeatureStore import TfIdfFeatureStore
 from sklearn.svm import LinearSVC
 from sklearn.metrics import accuracy_score, classification_report
 
@@ -24,7 +21,7 @@ df_orig['overall'].shape
 df = df_orig.copy()
 
 #preprocessing
-df['preprocessed'] = clean_data(fp)
+df['preprocessed'] = CleanData(df['reviewText']).clean_data()
 
 
 #removing number 3 rating, as it is considered neutral, main focus now is positiv and negativ
@@ -40,9 +37,11 @@ X_train, X_test, y_train, y_test = train_test_split(df['preprocessed'], df['labe
 print(f"Train: ,{X_train.shape,y_train.shape},Test: ,{X_test.shape,y_test.shape}")
 
 
-vectorizer = TfidfVectorizer()
-tf_x_train = vectorizer.fit_transform(X_train)
-tf_x_test = vectorizer.transform(X_test)
+# features are fitted on the training rows once and reused by later runs, see TfIdfFeatureStore
+feature_store = TfIdfFeatureStore("tfidf_features")
+tf_x = feature_store.fit_transform(df['preprocessed'], fit_index=X_train.index)
+tf_x_train = tf_x[df.index.get_indexer(X_train.index)]
+tf_x_test = tf_x[df.index.get_indexer(X_test.index)]
 
 print(tf_x_train.shape)
 print(tf_x_test.shape)
@@ -0,0 +1,353 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from time import perf_counter
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+
+from src.text_transform.text_cleaning import clean_reviews
+
+from typing import List, Optional, Union, Iterator, Tuple, Dict, Any, Literal, Sequence
+
+TASKS = ("classification", "regression")
+
+Paths = Union[str, os.PathLike, Sequence[Union[str, os.PathLike]]]
+
+
+class StreamingLinearTrainer:
+    """
+    Trains a linear sentiment model on Parquet review shards out of core, one batch at a time with `partial_fit`.
+
+    Texts are hashed into a fixed number of features with `HashingVectorizer`, which is stateless,
+    so no pass over the data is needed to build a vocabulary, and memory stays the same however many shards there are.
+    `classification` trains a linear SVM on positive (4 and 5) against negative (1 and 2) reviews,
+    leaving out neutral reviews like `SVM_LinearSVC_model.py`, and `regression` predicts the rating.
+
+    Rows are held out for evaluation by a hash of their text, so the same rows are held out in every epoch and run,
+    and duplicated reviews are never both trained and evaluated on. Files are read in a shuffled order each epoch,
+    interleaving batches of `interleave` files, so that shards of a single rating are not trained on in a row.
+
+    ## Examples
+    Train on the chunks saved by the extractor, or a `ParquetDatasetWriter` dataset:
+        >>> trainer = StreamingLinearTrainer("classification", epochs=2)
+        >>> trainer.fit("data/Books")
+        >>> trainer.stats()
+        >>> trainer.save("models/sentiment_svm.joblib")
+
+    Predict new texts:
+        >>> StreamingLinearTrainer.load("models/sentiment_svm.joblib").predict(["a great book"])
+    """
+
+    def __init__(
+            self,
+            task: Literal["classification", "regression"] = "classification",
+            text_column: str = "reviewText",
+            ratings_column: str = "overall",
+            n_features: int = 2 ** 20,
+            ngram_range: Tuple[int, int] = (1, 2),
+            batch_size: int = 10_000,
+            epochs: int = 1,
+            test_size: float = 0.2,
+            interleave: int = 8,
+            clean: bool = True,
+            workers: Optional[int] = None,
+            random_state: int = 0,
+            **model_params
+        ) -> None:
+
+        """
+        ## Params
+        task: str,
+            `"classification"` of positive and negative reviews with a linear SVM, or `"regression"` of the rating.
+
+        text_column: str,
+            column of the review texts.
+
+        ratings_column: str,
+            column of the ratings, may be a hive partition column.
+
+        n_features: int,
+            the number of hashed features, more features give fewer collisions but a larger model.
+
+        ngram_range: tuple of ints,
+            the lower and upper number of words of the n-grams.
+
+        batch_size: int,
+            the maximum number of rows read and trained on at a time, memory grows with this and not the data.
+
+        epochs: int,
+            the number of passes over the training rows.
+
+        test_size: float,
+            the share of rows held out for evaluation, when no evaluation paths are given to `fit`.
+
+        interleave: int,
+            the number of files read from at a time, batches are taken from each in turn.
+
+        clean: bool,
+            clean the texts with `clean_reviews` before hashing.
+
+        workers: int, optional,
+            the number of processes to clean texts in, see `clean_reviews`.
+
+        random_state: int,
+            seed of the file order, row order and model.
+
+        model_params:
+            parameters of `SGDClassifier` or `SGDRegressor`, eg. `alpha`.
+        """
+        if task not in TASKS:
+            raise ValueError(f"task must be one of {TASKS}, got {task!r}.")
+
+        self.task = task
+        self.text_column = text_column
+        self.ratings_column = ratings_column
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.test_size = test_size
+        self.interleave = interleave
+        self.clean = clean
+        self.workers = workers
+        self.random_state = random_state
+
+        self.vectorizer = HashingVectorizer(
+            n_features = n_features,
+            ngram_range = ngram_range,
+            alternate_sign = False,
+            dtype = np.float32
+        )
+
+        if task == "classification":
+            # hinge loss is the loss of a linear SVM
+            self.model = SGDClassifier(**dict({"loss": "hinge", "random_state": random_state}, **model_params))
+        else:
+            self.model = SGDRegressor(**dict({"random_state": random_state}, **model_params))
+
+        self.history: List[Dict[str, Any]] = []
+        self.train_time = 0.0
+
+
+    def fit(
+            self,
+            paths: Paths,
+            eval_paths: Optional[Paths] = None
+        ) -> "StreamingLinearTrainer":
+
+        """
+        Trains on the Parquet files or dataset directories in `paths` for `epochs` passes,
+        and evaluates after each epoch, see `history`.
+
+        ## Params
+        paths: pathlike or list of pathlikes,
+            Parquet files, or directories of them such as the `outdir` of the extractor.
+
+        eval_paths: pathlike or list of pathlikes, optional,
+            held-out files to evaluate on, default is the `test_size` share of rows of `paths` held out by hash.
+        """
+        rs = np.random.RandomState(self.random_state)
+
+        for epoch in range(len(self.history), len(self.history) + self.epochs):
+            rows = 0
+            start_time = perf_counter()
+
+            for texts, targets in self._iter_batches(paths, train=True if eval_paths is None else None, rs=rs):
+                order = rs.permutation(len(targets))
+                features = self.vectorizer.transform(texts[order])
+
+                if self.task == "classification":
+                    self.model.partial_fit(features, targets[order], classes=np.array([0, 1]))
+                else:
+                    self.model.partial_fit(features, targets[order])
+
+                rows += len(targets)
+
+            seconds = perf_counter() - start_time
+            self.train_time += seconds
+
+            if rows == 0:
+                raise ValueError(f"No rows to train on in {paths}.")
+
+            self.history.append(dict(
+                {"epoch": epoch, "train_rows": rows, "train_seconds": seconds, "rows_per_second": rows / seconds},
+                **self.evaluate(paths if eval_paths is None else eval_paths, held_out=eval_paths is None)
+            ))
+
+        return self
+
+
+    def evaluate(
+            self,
+            paths: Paths,
+            held_out: bool = False
+        ) -> Dict[str, Any]:
+
+        """
+        Metrics of the model on the rows of `paths`, accumulated batch by batch.
+        Accuracy for classification, and mean absolute and squared error for regression.
+
+        ## Params
+        held_out: bool,
+            only evaluate on the rows held out from training by `fit`.
+        """
+        rows = 0
+        errors = {"correct": 0.0, "absolute": 0.0, "squared": 0.0}
+        start_time = perf_counter()
+
+        for texts, targets in self._iter_batches(paths, train=False if held_out else None):
+            predictions = self.model.predict(self.vectorizer.transform(texts))
+
+            errors["correct"] += np.sum(predictions == targets)
+            errors["absolute"] += np.sum(np.abs(predictions - targets))
+            errors["squared"] += np.sum((predictions - targets) ** 2)
+            rows += len(targets)
+
+        metrics = {"eval_rows": rows, "eval_seconds": perf_counter() - start_time}
+
+        if self.task == "classification":
+            metrics["accuracy"] = errors["correct"] / rows if rows else None
+        else:
+            metrics["mae"] = errors["absolute"] / rows if rows else None
+            metrics["mse"] = errors["squared"] / rows if rows else None
+
+        return metrics
+
+
+    def predict(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Predicted labels, 1 for positive and 0 for negative, or ratings, of raw review texts.
+        """
+        texts = pd.Series(texts, dtype=object)
+
+        if self.clean:
+            texts = clean_reviews(texts, workers=self.workers)
+
+        return self.model.predict(self.vectorizer.transform(texts.fillna("")))
+
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "task": self.task,
+            "model": type(self.model).__name__,
+            "n_features": self.vectorizer.n_features,
+            "epochs": len(self.history),
+            "train_time": self.train_time,
+            "history": self.history,
+        }
+
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        """
+        Saves the trainer with its model, written to a temporary file first so a failed save keeps the previous model.
+        """
+        tmp_path = f"{path}.tmp"
+        joblib.dump(self, tmp_path)
+        os.replace(tmp_path, path)
+
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike]) -> "StreamingLinearTrainer":
+        trainer = joblib.load(path)
+
+        if not isinstance(trainer, cls):
+            raise TypeError(f"{path} is not a saved {cls.__name__}.")
+
+        return trainer
+
+
+    def _iter_batches(
+            self,
+            paths: Paths,
+            train: Optional[bool] = None,
+            rs: Optional[np.random.RandomState] = None
+        ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+
+        """
+        Cleaned texts and targets of batches of at most `batch_size` rows.
+
+        ## Params
+        train: bool, optional,
+            only the training rows if True, only the held-out rows if False, or all rows.
+
+        rs: RandomState, optional,
+            shuffles the order of the files if specified.
+        """
+        dataset = ds.dataset(
+            [os.fspath(path) for path in paths] if isinstance(paths, (list, tuple)) else os.fspath(paths),
+            format = "parquet",
+            partitioning = "hive",
+            exclude_invalid_files = True
+        )
+        fragments = list(dataset.get_fragments())
+
+        if rs is not None:
+            fragments = [fragments[i] for i in rs.permutation(len(fragments))]
+
+        for batch in self._interleave(fragments, dataset.schema):
+            df = batch.to_pandas().dropna(subset=[self.text_column, self.ratings_column])
+
+            if train is not None:
+                df = df[self._held_out(df[self.text_column], self.test_size) != train]
+
+            targets = df[self.ratings_column].to_numpy(dtype=np.float64)
+
+            if self.task == "classification":
+                df = df[targets != 3]
+                targets = (targets[targets != 3] >= 4).astype(np.int64)
+
+            if len(df) == 0:
+                continue
+
+            texts = df[self.text_column].astype(object)
+
+            yield (clean_reviews(texts, workers=self.workers) if self.clean else texts).to_numpy(dtype=object), targets
+
+
+    def _interleave(
+            self,
+            fragments: List[ds.Fragment],
+            schema: pa.Schema
+        ) -> Iterator[pa.RecordBatch]:
+
+        """
+        Batches of the fragments, taken in turn from `interleave` open fragments at a time.
+        """
+        columns = [self.text_column, self.ratings_column]
+        pending = iter(fragments)
+        open_batches: List[Iterator[pa.RecordBatch]] = []
+
+        while True:
+            while len(open_batches) < self.interleave:
+                fragment = next(pending, None)
+
+                if fragment is None:
+                    break
+
+                # The dataset schema includes the partition columns, which are not in the files
+                open_batches.append(iter(ds.Scanner.from_fragment(
+                    fragment,
+                    schema = schema,
+                    columns = columns,
+                    batch_size = self.batch_size
+                ).to_batches()))
+
+            if not open_batches:
+                return
+
+            for batches in list(open_batches):
+                batch = next(batches, None)
+
+                if batch is None:
+                    open_batches.remove(batches)
+                elif batch.num_rows:
+                    yield batch
+
+
+    @staticmethod
+    def _held_out(texts: pd.Series, test_size: float) -> np.ndarray:
+        """
+        Whether each row is held out for evaluation, by a hash of its text with a fixed key.
+        """
+        return pd.util.hash_pandas_object(texts, index=False).to_numpy() % 10_000 < test_size * 10_000
@@ -0,0 +1,236 @@
+import os
+import json
+import math
+import pickle
+import joblib
+import numpy as np
+import pandas as pd
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.base import BaseEstimator, clone
+from sklearn.model_selection import ParameterGrid
+from sklearn.metrics import accuracy_score, mean_absolute_error, mean_squared_error
+
+from typing import List, Optional, Union, Tuple, Dict, Any
+
+SCORINGS = ("mae", "mse", "accuracy")
+
+# The features and labels of each worker process, memory mapped once by the pool initializer instead of sent with every trial
+_worker_data: Optional[Dict[str, Any]] = None
+
+
+class SuccessiveHalvingSearch:
+    """
+    Hyperparameter search over several models with successive halving, on features computed once.
+
+    The features are saved once to `results_dir` and memory mapped by each worker process,
+    so trials do not clean, vectorize or copy the data again. All candidates are first trained on `min_budget` rows,
+    only the best `1 / factor` of them are trained again on `factor` times as many rows, and so on
+    until one candidate is left or all training rows are used. Losers are dropped after training on few rows.
+
+    Every trial is a row of the results table, with its rung, budget, score, `mae` and `mse` like `model_stats.json`,
+    training time and the size of the pickled model, saved to `results_dir/results.csv` after each rung.
+
+    ## Examples
+        >>> store = TfIdfFeatureStore("tfidf_features", max_features=1000, min_df=5, ngram_range=(1, 3))
+        >>> X = store.fit_transform(df["preprocessed"], fit_index=train_index)
+        >>> search = SuccessiveHalvingSearch({
+        ...     "svm_svr": (LinearSVR(), {"C": [0.1, 1, 10]}),
+        ...     "xgboost_regressor": (XGBRegressor(tree_method="hist", n_jobs=1), {"max_depth": [4, 8], "n_estimators": [100, 300]}),
+        ... }, results_dir="search")
+        >>> results = search.fit(X_train, y_train, X_test, y_test)
+        >>> search.best_params_
+    """
+
+    def __init__(
+            self,
+            candidates: Dict[str, Tuple[BaseEstimator, Dict[str, List[Any]]]],
+            results_dir: Union[str, os.PathLike] = "search",
+            scoring: str = "mae",
+            min_budget: int = 10_000,
+            factor: int = 3,
+            workers: Optional[int] = None,
+            random_state: int = 0
+        ) -> None:
+
+        """
+        ## Params
+        candidates: dict,
+            model names and their estimator and grid of parameters, every combination is a candidate.
+            Estimators follow the scikit-learn api, eg. `LinearSVR` or `xgboost.XGBRegressor`.
+
+        results_dir: pathlike,
+            the directory of the cached features and the results table.
+
+        scoring: str,
+            the metric to select candidates by, `"mae"` or `"mse"` are minimized and `"accuracy"` is maximized.
+
+        min_budget: int,
+            the number of training rows of the first rung.
+
+        factor: int,
+            the budget grows, and the number of candidates shrinks, by this factor each rung.
+
+        workers: int, optional,
+            the number of processes to train candidates in, default is the number of cpus.
+            Give multithreaded estimators a single thread, eg. `n_jobs=1`.
+
+        random_state: int,
+            seed of the order of the training rows, the budget of a rung is the first rows in this order.
+        """
+        if scoring not in SCORINGS:
+            raise ValueError(f"scoring must be one of {SCORINGS}, got {scoring!r}.")
+
+        if factor < 2:
+            raise ValueError("factor must be at least 2.")
+
+        self.candidates = candidates
+        self.results_dir = results_dir
+        self.scoring = scoring
+        self.min_budget = min_budget
+        self.factor = factor
+        self.workers = workers or os.cpu_count()
+        self.random_state = random_state
+
+        self.results_: Optional[pd.DataFrame] = None
+        self.best_model_: Optional[str] = None
+        self.best_params_: Optional[Dict[str, Any]] = None
+
+
+    def fit(
+            self,
+            X_train: Any,
+            y_train: Any,
+            X_eval: Any,
+            y_eval: Any
+        ) -> pd.DataFrame:
+
+        """
+        Runs the search, and returns the results table of all trials.
+
+        ## Params
+        X_train, y_train:
+            the features and labels to train on, eg. a CSR matrix of a `TfIdfFeatureStore`.
+
+        X_eval, y_eval:
+            the held-out features and labels to score on.
+        """
+        num_rows = X_train.shape[0]
+        order = np.random.RandomState(self.random_state).permutation(num_rows)
+        data_path = self._save_data(X_train, np.asarray(y_train), X_eval, np.asarray(y_eval), order)
+
+        trials = [
+            (name, estimator, params)
+            for name, (estimator, grid) in self.candidates.items()
+            for params in ParameterGrid(grid)
+        ]
+        budget = min(self.min_budget, num_rows)
+        rung = 0
+        results = []
+
+        with ProcessPoolExecutor(
+            max_workers = self.workers,
+            initializer = _load_worker_data,
+            initargs = (data_path,)
+        ) as pool:
+            while True:
+                futures = [pool.submit(_run_trial, name, estimator, params, budget) for name, estimator, params in trials]
+                scores = [future.result() for future in futures]
+                results.extend(dict(rung=rung, **score) for score in scores)
+
+                self._save_results(results)
+
+                if len(trials) == 1 or budget == num_rows:
+                    break
+
+                # Keeps the best 1 / factor of the candidates of this rung
+                ranking = np.argsort([self._sign() * score["score"] for score in scores], kind="stable")
+                trials = [trials[i] for i in ranking[:max(1, math.ceil(len(trials) / self.factor))]]
+                budget = min(budget * self.factor, num_rows)
+                rung += 1
+
+        self.results_ = pd.DataFrame(results)
+        best = self.results_[self.results_["rung"] == self.results_["rung"].max()]
+        best = best.loc[(self._sign() * best["score"]).idxmin()]
+
+        self.best_model_ = best["model"]
+        self.best_params_ = json.loads(best["params"])
+
+        return self.results_
+
+
+    def _sign(self) -> int:
+        # Scores are ranked ascending, so accuracy is negated to rank the highest first
+        return -1 if self.scoring == "accuracy" else 1
+
+
+    def _save_data(
+            self,
+            X_train: Any,
+            y_train: np.ndarray,
+            X_eval: Any,
+            y_eval: np.ndarray,
+            order: np.ndarray
+        ) -> str:
+
+        """
+        Saves the features once for the workers to memory map, the training rows in the order of the budgets.
+        """
+        os.makedirs(self.results_dir, exist_ok=True)
+        data_path = os.path.join(self.results_dir, "data.joblib")
+
+        joblib.dump({
+            "X_train": X_train[order],
+            "y_train": y_train[order],
+            "X_eval": X_eval,
+            "y_eval": y_eval,
+            "scoring": self.scoring,
+        }, data_path)
+
+        return data_path
+
+
+    def _save_results(self, results: List[Dict[str, Any]]) -> None:
+        tmp_path = os.path.join(self.results_dir, "results.csv.tmp")
+        pd.DataFrame(results).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(self.results_dir, "results.csv"))
+
+
+def _load_worker_data(data_path: str) -> None:
+    global _worker_data
+    _worker_data = joblib.load(data_path, mmap_mode="r")
+
+
+def _run_trial(
+        name: str,
+        estimator: BaseEstimator,
+        params: Dict[str, Any],
+        budget: int
+    ) -> Dict[str, Any]:
+
+    """
+    Trains a candidate on the first `budget` training rows and scores it on the held-out rows.
+    """
+    model = clone(estimator).set_params(**params)
+
+    start_time = perf_counter()
+    model.fit(_worker_data["X_train"][:budget], _worker_data["y_train"][:budget])
+    train_time = perf_counter() - start_time
+
+    y_eval = _worker_data["y_eval"]
+    y_pred = model.predict(_worker_data["X_eval"])
+
+    metrics = {"mae": mean_absolute_error(y_eval, y_pred), "mse": mean_squared_error(y_eval, y_pred)}
+
+    if _worker_data["scoring"] == "accuracy":
+        metrics["accuracy"] = accuracy_score(y_eval, y_pred)
+
+    return dict(
+        model = name,
+        params = json.dumps(params, sort_keys=True, default=str),
+        budget = budget,
+        score = metrics[_worker_data["scoring"]],
+        **metrics,
+        train_time = train_time,
+        model_size = len(pickle.dumps(model))
+    )
@@ -0,0 +1,265 @@
+import os
+import json
+import numpy as np
+import scipy.sparse as sp
+import xgboost as xgb
+from functools import partial
+from time import perf_counter
+
+from typing import List, Optional, Union, Iterable, Iterator, Tuple, Dict, Any, Callable
+
+# A shard of features and the labels of its rows
+Shard = Tuple[sp.csr_matrix, np.ndarray]
+Shards = Union[Iterable[Shard], Callable[[], Iterable[Shard]]]
+
+
+class ShardIter(xgb.DataIter):
+    """
+    XGBoost external memory iterator over shards of sparse features, eg. the shards of a `TfIdfFeatureStore`.
+
+    XGBoost reads the shards once into a cache of pages at `cache_prefix` on disk,
+    and trains from the cache, so only a shard and a page are in memory at a time.
+    """
+
+    def __init__(
+            self,
+            shards: Callable[[], Iterable[Shard]],
+            cache_prefix: str
+        ) -> None:
+
+        self.shards = shards
+        self._shard_iterator: Optional[Iterator[Shard]] = None
+        super().__init__(cache_prefix=cache_prefix)
+
+
+    def next(self, input_data: Callable) -> int:
+        if self._shard_iterator is None:
+            self._shard_iterator = iter(self.shards())
+
+        shard = next(self._shard_iterator, None)
+
+        if shard is None:
+            return 0
+
+        features, labels = shard
+        input_data(data=sp.csr_matrix(features), label=np.asarray(labels))
+
+        return 1
+
+
+    def reset(self) -> None:
+        self._shard_iterator = None
+
+
+class XGBoostTrainer:
+    """
+    Trains XGBoost on sparse TF-IDF features with the `hist` tree method on all cores,
+    without converting the features to a dense array.
+
+    In memory CSR matrices are fed as a `QuantileDMatrix`, which keeps only the binned features.
+    Corpora that do not fit in memory are trained from shards with XGBoost's external memory, see `fit_shards`.
+    `stats` gives the `mae` and `mse` of the evaluation data like `model_stats.json`, and the training time.
+
+    ## Examples
+    Train on the features of a `TfIdfFeatureStore`:
+        >>> trainer = XGBoostTrainer("xgboost_regressor")
+        >>> trainer.fit(X_train, y_train, X_test, y_test)
+        >>> trainer.save_stats("model_stats.json")
+
+    Train from the shards of the store, fitted on all reviews:
+        >>> shards = lambda: XGBoostTrainer.with_labels(store.iter_shards(df["preprocessed"]), df["overall"])
+        >>> trainer.fit_shards(shards, cache_dir="xgb_cache")
+    """
+
+    def __init__(
+            self,
+            name: str = "xgboost_regressor",
+            num_boost_round: int = 100,
+            early_stopping_rounds: Optional[int] = None,
+            nthread: Optional[int] = None,
+            **params
+        ) -> None:
+
+        """
+        ## Params
+        name: str,
+            the name of the model in the stats.
+
+        num_boost_round: int,
+            the maximum number of trees.
+
+        early_stopping_rounds: int, optional,
+            stop when the evaluation error has not improved in this many rounds, requires evaluation data.
+
+        nthread: int, optional,
+            the number of threads, default is the number of cpus.
+
+        params:
+            booster parameters, eg. `max_depth` or `objective`. Default objective is `reg:squarederror`.
+        """
+        self.name = name
+        self.num_boost_round = num_boost_round
+        self.early_stopping_rounds = early_stopping_rounds
+        self.nthread = nthread or os.cpu_count()
+        self.params = dict({"objective": "reg:squarederror", "tree_method": "hist"}, **params, nthread=self.nthread)
+
+        self.booster: Optional[xgb.Booster] = None
+        self.evals_result: Dict[str, Dict[str, List[float]]] = {}
+        self.train_time = 0.0
+        self.metrics: Dict[str, float] = {}
+
+
+    def fit(
+            self,
+            X_train: sp.spmatrix,
+            y_train: Iterable[float],
+            X_eval: Optional[sp.spmatrix] = None,
+            y_eval: Optional[Iterable[float]] = None
+        ) -> "XGBoostTrainer":
+
+        """
+        Trains on in memory sparse features, evaluated on `X_eval` if specified.
+        """
+        dtrain = xgb.QuantileDMatrix(
+            sp.csr_matrix(X_train),
+            label = np.asarray(y_train),
+            nthread = self.nthread,
+            max_bin = self.params.get("max_bin", 256)
+        )
+        deval = None
+
+        if X_eval is not None:
+            deval = xgb.QuantileDMatrix(sp.csr_matrix(X_eval), label=np.asarray(y_eval), nthread=self.nthread, ref=dtrain)
+
+        return self._train(dtrain, deval)
+
+
+    def fit_shards(
+            self,
+            shards: Shards,
+            eval_shards: Optional[Shards] = None,
+            cache_dir: Union[str, os.PathLike] = "xgb_cache"
+        ) -> "XGBoostTrainer":
+
+        """
+        Trains from shards of sparse features and labels with external memory, cached in `cache_dir`.
+
+        Shards are read more than once, so they must be a function returning a new iterator of shards,
+        or an iterable that can be iterated again, eg. a list.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+
+        dtrain = xgb.DMatrix(ShardIter(self._reiterable(shards), os.path.join(cache_dir, "train")), nthread=self.nthread)
+        deval = None
+
+        if eval_shards is not None:
+            deval = xgb.DMatrix(ShardIter(self._reiterable(eval_shards), os.path.join(cache_dir, "eval")), nthread=self.nthread)
+
+        return self._train(dtrain, deval)
+
+
+    def predict(self, X: Union[sp.spmatrix, xgb.DMatrix]) -> np.ndarray:
+        if not isinstance(X, xgb.DMatrix):
+            X = xgb.DMatrix(sp.csr_matrix(X), nthread=self.nthread)
+
+        return self.booster.predict(X, iteration_range=self._iteration_range())
+
+
+    def evaluate(self, dmatrix: xgb.DMatrix) -> Dict[str, float]:
+        """
+        Mean absolute and squared error of the predictions of `dmatrix` against its labels.
+        """
+        errors = self.predict(dmatrix) - dmatrix.get_label()
+
+        return {"mae": float(np.mean(np.abs(errors))), "mse": float(np.mean(errors ** 2))}
+
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The stats of the model by name, in the format of `model_stats.json`.
+        """
+        return {self.name: dict(self.metrics, train_time=self.train_time)}
+
+
+    def save_stats(self, path: Union[str, os.PathLike] = "model_stats.json") -> None:
+        """
+        Adds or replaces the stats of the model in the stats file of all models.
+        """
+        all_stats = {}
+
+        if os.path.exists(path):
+            with open(path) as file:
+                all_stats = json.load(file)
+
+        all_stats.update(self.stats())
+
+        with open(path, "w") as file:
+            json.dump(all_stats, file, indent=4)
+
+
+    def save_model(self, path: Union[str, os.PathLike]) -> None:
+        self.booster.save_model(path)
+
+
+    @staticmethod
+    def with_labels(
+            shards: Iterable[sp.spmatrix],
+            labels: Iterable[float]
+        ) -> Iterator[Shard]:
+
+        """
+        Pairs shards of features with the labels of their rows, the shards in order of `labels`.
+        """
+        labels = np.asarray(labels)
+        start = 0
+
+        for features in shards:
+            yield features, labels[start:start + features.shape[0]]
+            start += features.shape[0]
+
+        if start != len(labels):
+            raise ValueError(f"The shards have {start} rows, but there are {len(labels)} labels.")
+
+
+    def _train(
+            self,
+            dtrain: xgb.DMatrix,
+            deval: Optional[xgb.DMatrix]
+        ) -> "XGBoostTrainer":
+
+        evals = [(dtrain, "train")] + ([(deval, "eval")] if deval is not None else [])
+        self.evals_result = {}
+
+        start_time = perf_counter()
+        self.booster = xgb.train(
+            self.params,
+            dtrain,
+            num_boost_round = self.num_boost_round,
+            evals = evals,
+            evals_result = self.evals_result,
+            early_stopping_rounds = self.early_stopping_rounds if deval is not None else None,
+            verbose_eval = False
+        )
+        self.train_time = perf_counter() - start_time
+
+        self.metrics = self.evaluate(deval if deval is not None else dtrain)
+
+        return self
+
+
+    def _iteration_range(self) -> Tuple[int, int]:
+        # Predict with the best trees when training stopped early
+        best_iteration = getattr(self.booster, "best_iteration", None) if self.early_stopping_rounds else None
+
+        return (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+
+
+    @staticmethod
+    def _reiterable(shards: Shards) -> Callable[[], Iterable[Shard]]:
+        if callable(shards):
+            return shards
+
+        if iter(shards) is shards:
+            raise ValueError("shards are read more than once, pass a function that returns a new iterator of shards.")
+
+        return partial(iter, shards)
@@ -1,24 +1,20 @@
 import pandas as pd
 import numpy as np
-from bs4 import BeautifulSoup
-from nltk.corpus import stopwords
-import re
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.model_selection import train_test_split
-from tfidf_functions import clean_data, review_to_words
+from src.models.tf_idf.tfidf_functions import CleanData
+from src.models.tf_idf.TfIdfFeatureStore import TfIdfFeatureStore
+from src.models.machine_learning.XGBoostTrainer import XGBoostTrainer
 from sklearn.svm import LinearSVC
 from sklearn.metrics import accuracy_score, classification_report, mean_absolute_error, mean_squared_error
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
-import xgboost as xgb
-from xgboost import XGBClassifier
 import matplotlib.pyplot as plt
 from nltk.sentiment import SentimentIntensityAnalyzer
 
 fp = "Books_5_partition_1.csv"
 
 #getting data and preprocessing it
-df = clean_data(fp) # returns a dataframe with a colum were textReview is cleaned
-df = df[:50000]
+df = pd.read_csv(fp).dropna().reset_index(drop=True)
+df['preprocessed'] = CleanData(df['reviewText']).clean_data() # colum were textReview is cleaned
 df['overall'].value_counts()
 
 #applying minmax on stars 
@@ -34,16 +30,17 @@ plt.show()
 df['sentiment'] = df['overall'].apply(lambda x: 2 if x > 3 else 0 if x < 3 else 1)
 
 
-vectorizer = TfidfVectorizer(
+# features are fitted once and reused by later runs, XGBoost trains on the sparse matrix directly
+feature_store = TfIdfFeatureStore(
+    "tfidf_features",
     max_features= 1000, 
     min_df = 5,
     ngram_range= (1,3)
 )
-vectors = vectorizer.fit_transform(df['preprocessed'])
-dense = vectors.toarray()
+vectors = feature_store.fit_transform(df['preprocessed'])
 
 
-X = dense
+X = vectors
 Y = df['sentiment']
 
 X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size=0.2, random_state=420)
@@ -51,22 +48,25 @@ print(f"Train: ,{X_train.shape,y_train.shape},Test: ,{X_test.shape,y_test.shape}
 
 
 
-model = XGBClassifier(
+# trains on the sparse matrix with the hist tree method on all cores, see XGBoostTrainer
+model = XGBoostTrainer(
+    "xgboost_classifier",
     # max_depth=8, 
     # early_stopping_rounds = 15,
     # learning_rate=0.3, 
-    # objective='reg:squarederror'
+    objective='multi:softmax', # predicts the sentiment class, use 'reg:squarederror' to predict the rating
+    num_class=3
     )
     
-model.fit(X_train, y_train, eval_set = [(X_test, y_test)])
+model.fit(X_train, y_train, X_test, y_test)
 
 y_train_pred = model.predict(X_train)
 y_test_pred = model.predict(X_test)
 
 
 
-r2_train_score = model.score(X_train, y_train)
-print(f'Train R2 XG : {r2_train_score}')
+accuracy_train = accuracy_score(y_train, y_train_pred)
+print(f'Train accuracy XG : {accuracy_train}')
 print()
 mse_train_xg = mean_squared_error(y_train, y_train_pred)
 print(f'Train MSE XG : {np.sqrt(mse_train_xg)}') 
@@ -76,14 +76,15 @@ print(f'Train MAE XG : {mae_train_xg}\n')
 
 
 
-r2_test_score = model.score(X_test, y_test)
-print(f'Test R2 XG : {r2_test_score}')
+accuracy_test = accuracy_score(y_test, y_test_pred)
+print(f'Test accuracy XG : {accuracy_test}')
 print()
 mse_test_xg = mean_squared_error(y_test, y_test_pred)
 print(f'Test MSE XG : {np.sqrt(mse_test_xg)}') 
 print()
 mae_test_xg = mean_absolute_error(y_test, y_test_pred)
 print(f'Test MAE XG : {mae_test_xg}') 
+model.save_stats() # adds mae, mse and train_time of the test set to model_stats.json
 #test
 
 
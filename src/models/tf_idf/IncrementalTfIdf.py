@@ -0,0 +1,265 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from src.text_transform.text_cleaning import clean_reviews
+from src.models.tf_idf.term_counts import count_terms, select_vocabulary, inverse_document_frequency
+from src.models.tf_idf.top_k import top_k_per_row
+
+from typing import List, Optional, Union, Iterable, Dict
+
+
+class IncrementalTfIdf:
+    """
+    TF-IDF model with a growing vocabulary, updated batch by batch instead of refitted,
+    so the keywords of new texts are computed against all texts seen so far, eg. all news articles loaded.
+
+    Keeps the term and document frequency of every n-gram seen, and the number of texts.
+    Idf, `min_df` and `max_features` are applied to the accumulated counts like `TfIdf.tf_idf_model` does,
+    so a model updated with all texts gives the same scores as `TfidfVectorizer` fitted on all of them.
+    The counts grow with every new n-gram, `max_vocabulary` bounds them at the cost of approximate scores.
+    State is saved to a `.npz` file with the vocabulary as one string, see `save` and `load`.
+
+    ## Examples
+        >>> model = IncrementalTfIdf.load("news_tfidf.npz") if os.path.exists("news_tfidf.npz") else IncrementalTfIdf()
+        >>> articles = NewsApiLoader(api_key).get_top_headlines()
+        >>> model.hottest_word(articles["content"])
+        >>> model.save("news_tfidf.npz")
+    """
+
+    def __init__(
+            self,
+            n_range: int = 3,
+            min_df: int = 5,
+            max_features: Optional[int] = 1000,
+            clean: bool = True,
+            max_vocabulary: Optional[int] = None
+        ) -> None:
+
+        """
+        ## Params
+        n_range: int,
+            the maximum number of words of the n-grams.
+
+        min_df: int,
+            n-grams in less texts are left out of the scores, they are kept in the counts as they may become frequent.
+
+        max_features: int, optional,
+            if specified only the n-grams with the highest term frequency are scored.
+
+        clean: bool,
+            clean the texts with `clean_reviews` before counting, like `TfIdf`.
+
+        max_vocabulary: int, optional,
+            if specified the n-grams in the fewest texts are pruned from the counts after a batch,
+            keeping at most this many. Pruned n-grams start counting from zero if seen again.
+        """
+        self.n_range = n_range
+        self.min_df = min_df
+        self.max_features = max_features
+        self.clean = clean
+        self.max_vocabulary = max_vocabulary
+
+        self.num_docs = 0
+        self.vocabulary_: Dict[str, int] = {}
+        self.term_frequency = np.zeros(0, dtype=np.int64)
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+
+        self._idf: Optional[np.ndarray] = None
+        self._order: Optional[np.ndarray] = None
+
+
+    @property
+    def terms(self) -> List[str]:
+        """
+        The n-grams in the order of their columns.
+        """
+        return list(self.vocabulary_)
+
+
+    def partial_fit(self, texts: Iterable[str]) -> "IncrementalTfIdf":
+        """
+        Adds the counts of a batch of texts, new n-grams are appended to the vocabulary. Missing texts are skipped.
+        """
+        return self._partial_fit_clean(self._clean(texts).dropna())
+
+
+    def _partial_fit_clean(self, texts: pd.Series) -> "IncrementalTfIdf":
+        counts = count_terms(texts, (1, self.n_range))
+
+        new_terms = [term for term in counts.index if term not in self.vocabulary_]
+        self.vocabulary_.update(zip(new_terms, range(len(self.vocabulary_), len(self.vocabulary_) + len(new_terms))))
+
+        self.term_frequency = np.concatenate([self.term_frequency, np.zeros(len(new_terms), dtype=np.int64)])
+        self.document_frequency = np.concatenate([self.document_frequency, np.zeros(len(new_terms), dtype=np.int64)])
+
+        columns = np.fromiter((self.vocabulary_[term] for term in counts.index), dtype=np.int64, count=len(counts))
+        self.term_frequency[columns] += counts["tf"].to_numpy()
+        self.document_frequency[columns] += counts["df"].to_numpy()
+
+        self.num_docs += len(texts)
+        self._idf = None
+        self._order = None
+
+        if self.max_vocabulary is not None and len(self.vocabulary_) > self.max_vocabulary:
+            self._prune()
+
+        return self
+
+
+    def _prune(self) -> None:
+        """
+        Keeps the `max_vocabulary` n-grams in the most texts, then with the highest term frequency, in their order.
+        """
+        kept = np.sort(np.lexsort((-self.term_frequency, -self.document_frequency))[:self.max_vocabulary])
+        terms = self.terms
+
+        self.vocabulary_ = {terms[column]: i for i, column in enumerate(kept)}
+        self.term_frequency = self.term_frequency[kept]
+        self.document_frequency = self.document_frequency[kept]
+
+
+    def transform(self, texts: Iterable[str]) -> sp.csr_matrix:
+        """
+        L2 normalized tf-idf scores of `texts` against the texts seen so far, with a column for each n-gram in `terms`.
+        Columns of n-grams left out by `min_df` or `max_features` are zero, missing texts have no scores.
+        """
+        return self._transform_clean(self._clean(texts).fillna(""))
+
+
+    def _transform_clean(self, texts: pd.Series) -> sp.csr_matrix:
+        if not self.vocabulary_:
+            return sp.csr_matrix((len(texts), 0))
+
+        counts = CountVectorizer(vocabulary=self.vocabulary_, ngram_range=(1, self.n_range)).transform(texts)
+        scores = counts.multiply(self.idf()).tocsr()
+        scores.eliminate_zeros()
+
+        return normalize(scores, norm="l2", copy=False)
+
+
+    def idf(self) -> np.ndarray:
+        """
+        Idf of each n-gram, zero for n-grams left out by `min_df` or `max_features`.
+        All zero while no n-gram is in `min_df` texts, eg. after a first small batch.
+        """
+        if self._idf is None:
+            # Selected in alphabetical order like `TfidfVectorizer`, so ties in term frequency are broken the same way
+            counts = pd.DataFrame({"tf": self.term_frequency, "df": self.document_frequency}).iloc[self._alphabetical_order()]
+            self._idf = np.zeros(len(counts))
+
+            try:
+                selected = select_vocabulary(counts, self.num_docs, min_df=self.min_df, max_features=self.max_features)
+
+            # Less than `min_df` texts so far, or no n-gram in `min_df` of them, texts have no hottest words yet
+            except ValueError:
+                return self._idf
+
+            self._idf[selected.index] = inverse_document_frequency(selected["df"].to_numpy(), self.num_docs)
+
+        return self._idf
+
+
+    def _alphabetical_order(self) -> np.ndarray:
+        """
+        The columns in alphabetical order of their n-grams, the column order of `TfidfVectorizer`.
+        """
+        if self._order is None:
+            self._order = np.argsort(np.asarray(self.terms, dtype=object), kind="stable")
+
+        return self._order
+
+
+    def hottest_word(
+            self,
+            texts: pd.Series,
+            n: int = 5,
+            update: bool = True
+        ) -> pd.DataFrame:
+
+        """
+        The `n` hottest words of each text, in columns `hottest_word_1` to `hottest_word_n` like `TfIdf.hottest_word`,
+        with the index of `texts`. Missing texts have no hottest words.
+
+        ## Params
+        texts: pd.Series,
+            the texts, eg. the content of a batch of news articles.
+
+        n: int,
+            the number of words of each text.
+
+        update: bool,
+            add the texts to the counts before scoring them.
+        """
+        not_null = texts.notna().to_numpy()
+        clean_texts = self._clean(texts[not_null])
+
+        if update:
+            self._partial_fit_clean(clean_texts)
+
+        # Columns are in the order n-grams were first seen, ranked in alphabetical order so ties are broken like `TfIdf`
+        order = self._alphabetical_order()
+        top_columns, _ = top_k_per_row(self._transform_clean(clean_texts)[:, order], k=n)
+        # Column -1 of rows with less than n words picks the None at the end
+        terms = np.asarray(self.terms + [None], dtype=object)[np.append(order, -1)]
+
+        hottest_words = np.full((len(texts), n), None, dtype=object)
+        hottest_words[not_null] = terms[top_columns]
+
+        return pd.DataFrame(hottest_words, index=texts.index, columns=[f"hottest_word_{i}" for i in range(1, n + 1)])
+
+
+    def save(self, path: Union[str, os.PathLike]) -> None:
+        """
+        Saves the counts and configuration, written to a temporary file first so a failed save keeps the previous state.
+        """
+        config = {
+            "n_range": self.n_range,
+            "min_df": self.min_df,
+            "max_features": self.max_features,
+            "clean": self.clean,
+            "max_vocabulary": self.max_vocabulary,
+            "num_docs": self.num_docs,
+        }
+        tmp_path = f"{path}.tmp.npz"
+
+        # n-grams are words joined by spaces, so the vocabulary is stored as one string of lines
+        np.savez_compressed(
+            tmp_path,
+            config = np.frombuffer(json.dumps(config).encode(), dtype=np.uint8),
+            terms = np.frombuffer("\n".join(self.vocabulary_).encode(), dtype=np.uint8),
+            term_frequency = self.term_frequency,
+            document_frequency = self.document_frequency
+        )
+        os.replace(tmp_path, path)
+
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike]) -> "IncrementalTfIdf":
+        with np.load(path) as state:
+            config = json.loads(state["config"].tobytes())
+            terms = state["terms"].tobytes().decode()
+
+            model = cls(
+                n_range = config["n_range"],
+                min_df = config["min_df"],
+                max_features = config["max_features"],
+                clean = config["clean"],
+                max_vocabulary = config.get("max_vocabulary")
+            )
+            model.num_docs = config["num_docs"]
+            model.vocabulary_ = dict(zip(terms.split("\n"), range(len(state["term_frequency"])))) if terms else {}
+            model.term_frequency = state["term_frequency"]
+            model.document_frequency = state["document_frequency"]
+
+        return model
+
+
+    def _clean(self, texts: Iterable[str]) -> pd.Series:
+        texts = pd.Series(texts, dtype=object) if not isinstance(texts, pd.Series) else texts
+
+        return clean_reviews(texts) if self.clean else texts
@@ -0,0 +1,181 @@
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.models.tf_idf.term_counts import count_terms, merge_term_counts, select_vocabulary, build_vectorizer
+
+from typing import List, Optional, Iterable, Iterator, Tuple, Deque, Callable, Any
+
+# Parameters of `TfidfVectorizer` that select the vocabulary from the merged counts, the rest analyze or weight texts
+SELECTION_PARAMS = ("min_df", "max_df", "max_features")
+WEIGHTING_PARAMS = ("norm", "use_idf", "smooth_idf", "sublinear_tf", "dtype")
+
+# The fitted vectorizer of each worker process, set once by the pool initializer instead of sent with every shard
+_worker_vectorizer: Optional[TfidfVectorizer] = None
+
+
+class ParallelTfIdfVectorizer:
+    """
+    Fits and applies a `TfidfVectorizer` map-reduce style on shards of texts in a process pool.
+
+    Each worker counts the n-gram term and document frequencies of a shard, the counts are merged in this process
+    and the vocabulary and idf are selected from them like `TfidfVectorizer.fit` does, see `term_counts`.
+    Shards are then transformed in parallel. The fitted `vectorizer_` is a plain `TfidfVectorizer`
+    which gives the same vocabulary and scores as fitting one on all texts, so it can replace one directly.
+
+    Shards are submitted as they are read, at most `2 * workers` at a time,
+    so shards can come from an iterator, eg. chunks of `AmazonReviewsExtractor`.
+
+    ## Examples
+        >>> vectorizer = ParallelTfIdfVectorizer(workers=8, max_features=1000, min_df=5, ngram_range=(1, 3))
+        >>> vectors = vectorizer.fit_transform(clean_text)
+        >>> vectorizer.get_feature_names_out()
+    """
+
+    def __init__(
+            self,
+            workers: Optional[int] = None,
+            shard_size: int = 50_000,
+            **vectorizer_params
+        ) -> None:
+
+        """
+        ## Params
+        workers: int, optional,
+            the number of processes, default is the number of cpus.
+
+        shard_size: int,
+            the number of texts in each shard when fitting or transforming a sequence of texts.
+
+        vectorizer_params:
+            parameters of the `TfidfVectorizer`, eg. `ngram_range`, `max_features` and `min_df`.
+            A fixed `vocabulary` and `use_idf=False` are not supported.
+            Parameters can be copied from a vectorizer, `ParallelTfIdfVectorizer(**vectorizer.get_params())`.
+        """
+        if vectorizer_params.pop("vocabulary", None) is not None or not vectorizer_params.get("use_idf", True):
+            raise ValueError("vocabulary and use_idf=False are not supported, use TfidfVectorizer.")
+
+        self.workers = workers or os.cpu_count()
+        self.shard_size = shard_size
+        self.vectorizer_params = vectorizer_params
+
+        self.vectorizer_: Optional[TfidfVectorizer] = None
+        self.num_docs_ = 0
+
+
+    def fit(self, texts: Iterable[str]) -> "ParallelTfIdfVectorizer":
+        return self.fit_shards(self._split(texts))
+
+
+    def transform(self, texts: Iterable[str]) -> sp.csr_matrix:
+        shards = list(self.transform_shards(self._split(texts)))
+
+        if not shards:
+            return sp.csr_matrix((0, len(self.vectorizer_.vocabulary_)), dtype=self.vectorizer_.dtype)
+
+        return sp.vstack(shards, format="csr")
+
+
+    def fit_transform(self, texts: Iterable[str]) -> sp.csr_matrix:
+        return self.fit(texts).transform(texts)
+
+
+    def get_feature_names_out(self) -> np.ndarray:
+        return self.vectorizer_.get_feature_names_out()
+
+
+    def fit_shards(self, shards: Iterable[Iterable[str]]) -> "ParallelTfIdfVectorizer":
+        """
+        Fits the vectorizer on shards of texts, counted in parallel.
+        """
+        analyzer_params = {
+            key: value for key, value in self.vectorizer_params.items()
+            if key not in SELECTION_PARAMS + WEIGHTING_PARAMS
+        }
+        counts = None
+        num_docs = 0
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for shard_counts, shard_num_docs in self._map(pool, _count_shard, shards, analyzer_params):
+                counts = shard_counts if counts is None else merge_term_counts([counts, shard_counts])
+                num_docs += shard_num_docs
+
+        if counts is None:
+            raise ValueError("No shards to fit.")
+
+        vocabulary = select_vocabulary(
+            counts,
+            num_docs,
+            **{key: self.vectorizer_params[key] for key in SELECTION_PARAMS if key in self.vectorizer_params}
+        )
+
+        self.vectorizer_ = build_vectorizer(
+            vocabulary,
+            num_docs,
+            **{key: value for key, value in self.vectorizer_params.items() if key not in SELECTION_PARAMS}
+        )
+        self.num_docs_ = num_docs
+
+        return self
+
+
+    def transform_shards(self, shards: Iterable[Iterable[str]]) -> Iterator[sp.csr_matrix]:
+        """
+        Transforms shards of texts in parallel, yielding the scores of each shard in order.
+        """
+        if self.vectorizer_ is None:
+            raise ValueError("The vectorizer is not fitted, call fit or fit_shards first.")
+
+        with ProcessPoolExecutor(
+            max_workers = self.workers,
+            initializer = _set_worker_vectorizer,
+            initargs = (self.vectorizer_,)
+        ) as pool:
+            yield from self._map(pool, _transform_shard, shards)
+
+
+    def _map(
+            self,
+            pool: ProcessPoolExecutor,
+            function: Callable,
+            shards: Iterable[Iterable[str]],
+            *args
+        ) -> Iterator[Any]:
+
+        """
+        Like `pool.map`, but reads at most `2 * workers` shards ahead instead of all of them.
+        """
+        pending: Deque[Future] = deque()
+
+        for shard in shards:
+            pending.append(pool.submit(function, list(shard), *args))
+
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+    def _split(self, texts: Iterable[str]) -> Iterator[List[str]]:
+        texts = texts.tolist() if isinstance(texts, (pd.Series, np.ndarray)) else list(texts)
+
+        for start in range(0, len(texts), self.shard_size):
+            yield texts[start:start + self.shard_size]
+
+
+def _count_shard(texts: List[str], analyzer_params: dict) -> Tuple[pd.DataFrame, int]:
+    return count_terms(texts, **analyzer_params), len(texts)
+
+
+def _set_worker_vectorizer(vectorizer: TfidfVectorizer) -> None:
+    global _worker_vectorizer
+    _worker_vectorizer = vectorizer
+
+
+def _transform_shard(texts: List[str]) -> sp.csr_matrix:
+    return _worker_vectorizer.transform(texts)
@@ -0,0 +1,249 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from pathlib import Path
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from typing import List, Optional, Union, Iterator, Tuple, Dict, Any, Sequence
+
+# Version of the artifact layout, part of the fingerprint so old artifacts are rebuilt when it changes
+ARTIFACT_VERSION = 1
+
+
+class TfIdfFeatureStore:
+    """
+    Store of TF-IDF features, fitted and transformed once per corpus and configuration and shared between trainers.
+
+    Each artifact is a directory named by a fingerprint of the texts, the rows the vectorizer is fitted on,
+    and the vectorizer configuration. It holds the vocabulary and idf, and the transformed CSR matrix
+    in shards of `shard_size` rows, each saved as `data.npy`, `indices.npy` and `indptr.npy`.
+    Shards are loaded memory mapped, so features are not copied into memory until used.
+    When the texts or configuration change the fingerprint changes, and a new artifact is built.
+
+    ## Examples
+        >>> store = TfIdfFeatureStore("features", ngram_range=(1, 3), max_features=1000, min_df=5)
+        >>> X = store.fit_transform(df["preprocessed"], fit_index=X_train.index)
+        >>> store.feature_names(df["preprocessed"], fit_index=X_train.index)
+    """
+
+    def __init__(
+            self,
+            root: Union[str, os.PathLike],
+            shard_size: int = 100_000,
+            dtype: type = np.float64,
+            **vectorizer_params
+        ) -> None:
+
+        """
+        ## Params
+        root: pathlike,
+            the directory of the artifacts.
+
+        shard_size: int,
+            the number of rows of each shard of the features.
+
+        dtype: numpy dtype,
+            the dtype of the features, eg. `np.float32` to halve their size.
+
+        vectorizer_params:
+            parameters of the `TfidfVectorizer`, eg. `ngram_range`, `max_features` and `min_df`.
+        """
+        self.root = Path(root)
+        self.shard_size = shard_size
+        self.dtype = np.dtype(dtype)
+        self.vectorizer_params = vectorizer_params
+
+
+    def fingerprint(
+            self,
+            texts: pd.Series,
+            fit_index: Optional[Sequence] = None
+        ) -> str:
+
+        """
+        Hash of the texts, the rows to fit on and the configuration.
+        """
+        fingerprint = hashlib.sha256()
+        fingerprint.update(json.dumps({
+            "version": ARTIFACT_VERSION,
+            "shard_size": self.shard_size,
+            "dtype": self.dtype.str,
+            "vectorizer_params": self.vectorizer_params,
+        }, sort_keys=True, default=str).encode())
+        fingerprint.update(pd.util.hash_pandas_object(texts, index=False).to_numpy().tobytes())
+
+        if fit_index is not None:
+            fingerprint.update(self._fit_positions(texts, fit_index).tobytes())
+
+        return fingerprint.hexdigest()
+
+
+    def artifact_dir(
+            self,
+            texts: pd.Series,
+            fit_index: Optional[Sequence] = None
+        ) -> Path:
+
+        """
+        The directory of the artifact of `texts`, built if it does not exist.
+        """
+        path = self.root / self.fingerprint(texts, fit_index)[:32]
+
+        if not (path / "meta.json").exists():
+            self._build(texts, fit_index, path)
+
+        return path
+
+
+    def fit_transform(
+            self,
+            texts: pd.Series,
+            fit_index: Optional[Sequence] = None
+        ) -> sp.csr_matrix:
+
+        """
+        The TF-IDF features of `texts`, one row per text, from the artifact which is built if needed.
+
+        A matrix of a single shard is memory mapped without copying, several shards are stacked into memory.
+
+        ## Params
+        texts: pd.Series,
+            cleaned texts without missing values.
+
+        fit_index: list of index labels, optional,
+            the labels of the texts to fit the vectorizer on, eg. the training rows. Default is all texts.
+        """
+        shards = list(self.iter_shards(texts, fit_index))
+
+        return shards[0] if len(shards) == 1 else sp.vstack(shards, format="csr")
+
+
+    def iter_shards(
+            self,
+            texts: pd.Series,
+            fit_index: Optional[Sequence] = None
+        ) -> Iterator[sp.csr_matrix]:
+
+        """
+        The shards of the features of `texts` in order, memory mapped.
+        """
+        path = self.artifact_dir(texts, fit_index)
+        meta = self._meta(path)
+
+        for shard in range(len(meta["shards"])):
+            yield self._load_shard(path / f"shard_{shard:05d}", meta["num_features"])
+
+
+    def feature_names(
+            self,
+            texts: pd.Series,
+            fit_index: Optional[Sequence] = None
+        ) -> np.ndarray:
+
+        terms, _ = self._load_vocabulary(self.artifact_dir(texts, fit_index))
+
+        return np.asarray(terms, dtype=object)
+
+
+    def vectorizer(
+            self,
+            texts: pd.Series,
+            fit_index: Optional[Sequence] = None
+        ) -> TfidfVectorizer:
+
+        """
+        The fitted vectorizer of the artifact, eg. to transform new texts for predictions.
+        """
+        terms, idf = self._load_vocabulary(self.artifact_dir(texts, fit_index))
+
+        vectorizer = TfidfVectorizer(**dict(self.vectorizer_params, vocabulary=terms, dtype=self.dtype))
+        vectorizer.idf_ = idf
+
+        return vectorizer
+
+
+    def _build(
+            self,
+            texts: pd.Series,
+            fit_index: Optional[Sequence],
+            path: Path
+        ) -> None:
+
+        """
+        Fits the vectorizer and writes the artifact to a temporary directory, renamed to `path` when complete.
+        """
+        if texts.isna().any():
+            raise ValueError("texts must not have missing values.")
+
+        fit_texts = texts if fit_index is None else texts.iloc[self._fit_positions(texts, fit_index)]
+
+        vectorizer = TfidfVectorizer(**dict(self.vectorizer_params, dtype=self.dtype))
+        vectorizer.fit(fit_texts)
+
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        # The vocabulary has no line breaks, n-grams are words joined by spaces
+        np.savez(
+            tmp_path / "vocabulary.npz",
+            terms = np.frombuffer("\n".join(vectorizer.get_feature_names_out()).encode(), dtype=np.uint8),
+            idf = vectorizer.idf_
+        )
+
+        shards = []
+        for shard, start in enumerate(range(0, max(len(texts), 1), self.shard_size)):
+            features = vectorizer.transform(texts.iloc[start:start + self.shard_size])
+            shard_path = tmp_path / f"shard_{shard:05d}"
+            shard_path.mkdir()
+
+            for name in ("data", "indices", "indptr"):
+                np.save(shard_path / f"{name}.npy", getattr(features, name))
+
+            shards.append({"num_rows": features.shape[0], "nnz": int(features.nnz)})
+
+        with open(tmp_path / "meta.json", "w") as file:
+            json.dump({
+                "num_rows": len(texts),
+                "num_features": len(vectorizer.vocabulary_),
+                "shards": shards,
+                "vectorizer_params": self.vectorizer_params,
+            }, file, indent=4, default=str)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+
+    @staticmethod
+    def _meta(path: Path) -> Dict[str, Any]:
+        with open(path / "meta.json") as file:
+            return json.load(file)
+
+
+    @staticmethod
+    def _load_shard(path: Path, num_features: int) -> sp.csr_matrix:
+        data, indices, indptr = (np.load(path / f"{name}.npy", mmap_mode="r") for name in ("data", "indices", "indptr"))
+
+        return sp.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, num_features), copy=False)
+
+
+    @staticmethod
+    def _load_vocabulary(path: Path) -> Tuple[List[str], np.ndarray]:
+        with np.load(path / "vocabulary.npz") as vocabulary:
+            terms = vocabulary["terms"].tobytes().decode()
+
+            return terms.split("\n") if terms else [], vocabulary["idf"]
+
+
+    @staticmethod
+    def _fit_positions(texts: pd.Series, fit_index: Sequence) -> np.ndarray:
+        positions = texts.index.get_indexer(fit_index)
+
+        if (positions < 0).any():
+            raise ValueError("fit_index has labels that are not in the index of texts.")
+
+        return np.sort(positions).astype(np.int64)
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from numbers import Integral
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from typing import Iterable, Tuple, Union, Optional
+
+# Out-of-core fitting of TF-IDF vocabularies.
+# Term and document frequencies are counted per chunk of texts and merged,
+# then the vocabulary and idf are selected from the merged counts exactly like `TfidfVectorizer.fit` does,
+# so the fitted vectorizer gives the same vectors as fitting on all texts at once.
+# Memory grows with the number of distinct terms, not with the number of texts.
+
+
+def count_terms(
+        texts: Iterable[str],
+        ngram_range: Tuple[int, int] = (1, 1),
+        **kwargs
+    ) -> pd.DataFrame:
+
+    """
+    The term frequency `tf` and document frequency `df` of each n-gram in `texts`, indexed by n-gram in sorted order.
+
+    ## Params
+    texts: list of str,
+        the texts to count, analyzed like the default `TfidfVectorizer`.
+
+    ngram_range: tuple of ints,
+        the lower and upper number of words of the n-grams.
+
+    kwargs:
+        other analyzer parameters of `CountVectorizer`, eg. `lowercase` or `token_pattern`.
+    """
+    vectorizer = CountVectorizer(ngram_range=ngram_range, **kwargs)
+
+    try:
+        counts = vectorizer.fit_transform(texts).tocsr()
+
+    except ValueError:
+        # No terms, eg. all texts are empty
+        return pd.DataFrame({"tf": [], "df": []}, index=pd.Index([], dtype=object, name="term"), dtype=np.int64)
+
+    return pd.DataFrame(
+        {
+            "tf": np.asarray(counts.sum(axis=0)).ravel().astype(np.int64),
+            "df": np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.int64),
+        },
+        index = pd.Index(vectorizer.get_feature_names_out(), dtype=object, name="term")
+    )
+
+
+def merge_term_counts(counts: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Sums the counts of `count_terms` of several chunks of texts, indexed by n-gram in sorted order.
+    """
+    return pd.concat(list(counts)).groupby(level=0, sort=True).sum()
+
+
+def select_vocabulary(
+        counts: pd.DataFrame,
+        num_docs: int,
+        min_df: Union[int, float] = 1,
+        max_df: Union[int, float] = 1.0,
+        max_features: Optional[int] = None
+    ) -> pd.DataFrame:
+
+    """
+    The counts of the n-grams kept in the vocabulary, as `CountVectorizer` selects them.
+
+    ## Params
+    counts: DataFrame,
+        merged counts of all texts, see `merge_term_counts`.
+
+    num_docs: int,
+        the number of texts counted.
+
+    min_df, max_df, max_features:
+        as for `CountVectorizer`.
+    """
+    max_doc_count = max_df if isinstance(max_df, Integral) else max_df * num_docs
+    min_doc_count = min_df if isinstance(min_df, Integral) else min_df * num_docs
+
+    if max_doc_count < min_doc_count:
+        raise ValueError("max_df corresponds to < documents than min_df")
+
+    dfs = counts["df"].to_numpy()
+    mask = (dfs <= max_doc_count) & (dfs >= min_doc_count)
+
+    if max_features is not None and mask.sum() > max_features:
+        # Same sort as `CountVectorizer._limit_features`, so ties in term frequency are broken the same way
+        kept = (-counts["tf"].to_numpy()[mask]).argsort()[:max_features]
+        new_mask = np.zeros(len(dfs), dtype=bool)
+        new_mask[np.where(mask)[0][kept]] = True
+        mask = new_mask
+
+    if not mask.any():
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+
+    return counts[mask]
+
+
+def inverse_document_frequency(
+        document_frequency: np.ndarray,
+        num_docs: int,
+        smooth_idf: bool = True
+    ) -> np.ndarray:
+
+    """
+    Idf as computed by `TfidfTransformer`.
+    """
+    document_frequency = np.asarray(document_frequency, dtype=np.float64) + int(smooth_idf)
+
+    return np.log((num_docs + int(smooth_idf)) / document_frequency) + 1
+
+
+def build_vectorizer(
+        vocabulary: pd.DataFrame,
+        num_docs: int,
+        **kwargs
+    ) -> TfidfVectorizer:
+
+    """
+    A `TfidfVectorizer` fitted with the selected `vocabulary` of `select_vocabulary`,
+    `kwargs` are passed to the vectorizer, eg. `ngram_range`.
+    """
+    vectorizer = TfidfVectorizer(vocabulary=list(vocabulary.index), **kwargs)
+    vectorizer.idf_ = inverse_document_frequency(vocabulary["df"].to_numpy(), num_docs, vectorizer.smooth_idf)
+
+    return vectorizer
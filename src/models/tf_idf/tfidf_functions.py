@@ -1,16 +1,29 @@
 import pandas as pd
 import numpy as np
-from bs4 import BeautifulSoup
-from nltk.corpus import stopwords
-import re
+import pyarrow as pa
+import scipy.sparse as sp
+from functools import partial
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from src.text_transform.text_cleaning import clean_reviews, review_to_words
+from src.text_transform.CleanTextCache import CleanTextCache
+from src.models.tf_idf.term_counts import count_terms, merge_term_counts, select_vocabulary, build_vectorizer
+from src.models.tf_idf.top_k import top_k_per_row
+from src.models.tf_idf.ParallelTfIdfVectorizer import ParallelTfIdfVectorizer
+
+from typing import Optional, Union, Iterable, Iterator, Callable
+
+# A chunk of texts, or of rows with a text column, eg. from `AmazonReviewsExtractor` or `pyarrow.parquet.ParquetFile.iter_batches`
+Chunk = Union[pd.Series, pd.DataFrame, pa.Table, pa.RecordBatch]
+
 # this module makes it possible to extract 5 hottest words.
 
 class CleanData:
     
-    def __init__(self, df:pd.Series) -> None:
+    def __init__(self, df:Optional[pd.Series], workers: Optional[int] = None, cache: Optional[CleanTextCache] = None) -> None:
         self.df = df
+        self.workers = workers
+        self.cache = cache
 
     def __review_to_words(self, raw_review):
         """Removes html tags, everything except letters, 
@@ -25,29 +38,15 @@ class CleanData:
         Returns:
             _str_: _a string that is transformed_
         """
-        #1 if any html tags, removed 
-        review_text = BeautifulSoup(raw_review).get_text()
-
-        #2 remove puctions and numbers
-        letters_only = re.sub("[^a-zA-Z]", " ", review_text)
-
-        #3 convert to lowercase and split
-        words_lst = letters_only.lower().split()
-
-        #4 convert stop words to set for increased speed processing
-        stops = set(stopwords.words("english"))
-
-        #5 remove stop words from the text
-        meaningful_words = [w for w in words_lst if not w in stops] #if w in stops remove it
-
-        #6 transform the list to text string
-        meaningful_words_str = " ".join(meaningful_words)
-
-        return meaningful_words_str
+        return review_to_words(raw_review)
     
     def clean_data(self):
         """ reads a pd.Series and cleans the text
 
+        The whole Series is cleaned at once, see `clean_reviews`, in `workers` processes if specified.
+        With a `cache` only texts that are not in the cache are cleaned,
+        its fingerprint should be `cleaning_fingerprint()`.
+
         Args:
             filepath (_pd.Series_): Series with 
             text that needs to be cleaned_
@@ -59,44 +58,92 @@ class CleanData:
       
         self.df = self.df.dropna()
         self.df = self.df.reset_index(drop=True)
-        clean_text = [self.__review_to_words(self.df[row]) for row in range(0, len(self.df))]
+        clean_text = self._clean(self.df).tolist()
         return clean_text
 
+    def iter_clean_data(self, chunks: Iterable[Chunk], text_column: str = "reviewText") -> Iterator[pd.Series]:
+        """Cleans chunks of text one at a time, so memory is bound by the size of a chunk
+        and not of the corpus. `df` is not used and can be None.
+
+        Args:
+            chunks (_Iterable_): _Series of texts, or DataFrames or Arrow tables or record batches with a `text_column`_
+            text_column (_str_): _the column with the texts of DataFrames and Arrow chunks_
+
+        Yields:
+            _pd.Series_: _the clean texts of each chunk without missing texts, with the index of the chunk_
+        """
+        for chunk in chunks:
+            if isinstance(chunk, pd.DataFrame):
+                text = chunk[text_column]
+            elif isinstance(chunk, (pa.Table, pa.RecordBatch)):
+                text = chunk[text_column].to_pandas()
+            else:
+                text = chunk
+
+            yield self._clean(text.dropna())
+
+    def _clean(self, text: pd.Series) -> pd.Series:
+        clean_function = partial(clean_reviews, workers=self.workers)
+
+        if self.cache is not None:
+            return self.cache.clean(text, clean_function)
+
+        return clean_function(text)
+
 
 
 class TfIdf(CleanData):
     """This Class takes a column with text
     and if you call the object with hottest_word method
     you get top 5 hottest words
+
+    For corpora that do not fit in memory, `iter_hottest_word` takes chunks of text instead.
     """
 
-    def __init__(self, df:pd.Series, n_range:int) -> None:
-        super().__init__(df)
+    max_features = 1000
+    min_df = 5
+
+    def __init__(
+            self,
+            df:Optional[pd.Series],
+            n_range:int,
+            workers: Optional[int] = None,
+            cache: Optional[CleanTextCache] = None
+        ) -> None:
+        super().__init__(df, workers, cache)
         self.df = df
         self.n_range = n_range
 
 
-    def tf_idf_model(self):
+    def tf_idf_model(self, sparse: bool = False):
         """Takes cleaned text and returns a sparse matrix
         with the feature names
 
         Args:
             cleaned_text (_list_): _takes the list from function 2 above_
+            sparse (_bool_): _return the CSR matrix of scores instead of a dense array_
 
         Returns:
             _np.array_ and _list_: _returns a array with tf-idf scores and a list with feature names(vocabulary)_
         """
         #tf-idf-model
         vectorizer = TfidfVectorizer(
-        max_features= 1000, # Selects most frequent words in the corpus when computing the TF-IDF. useful for performance if you have large datasets
+        max_features= self.max_features, # Selects most frequent words in the corpus when computing the TF-IDF. useful for performance if you have large datasets
         # max_df=  0.8, # removes words that appears 80% in the text.
-        min_df = 5, # removes word that appears less than 5 times
+        min_df = self.min_df, # removes word that appears less than 5 times
         ngram_range= (1,self.n_range), #is range to capture the conext and meaning of words. means it checks 3 words at a time.
         )
 
+        if self.workers:
+            # same vocabulary and scores, counted and transformed in shards in parallel
+            vectorizer = ParallelTfIdfVectorizer(self.workers, **vectorizer.get_params())
+
         vectors = vectorizer.fit_transform(self.clean_data())
         feature_names = vectorizer.get_feature_names_out() #feature names that are most frequent. you can changes this in the max_feature parameter when using TfidfVectorizer
         # print(feature_names)
+        if sparse:
+            return vectors, feature_names
+
         dense = vectors.toarray() # returns a sparse matrix with shape (rows * feature_names)
 
         return dense, feature_names
@@ -124,22 +171,76 @@ class TfIdf(CleanData):
 
         # cleaned_text = self.clean_data()
         
-        hottest_word_vector, feature_names = self.tf_idf_model()
-        
+        hottest_word_vector, feature_names = self.tf_idf_model(sparse=True)
 
-        hottest_word_vector = hottest_word_vector.tolist()
-        # # print(hottest_word_vector)
+        return self._hottest_word_frame(hottest_word_vector, feature_names)
 
-        df_vector = pd.DataFrame(hottest_word_vector, columns=feature_names)
+    def fit_chunks(self, chunks: Iterable[Chunk], text_column: str = "reviewText") -> TfidfVectorizer:
+        """Fits the same vectorizer as `tf_idf_model` in one pass over chunks of text,
+        counting the n-grams of each chunk and merging the counts, see `term_counts`.
+        Memory grows with the number of distinct n-grams, not with the number of texts.
 
-        top_words = df_vector.apply(self.get_top_words, axis=1)
-        
-        df_hottest_word = pd.DataFrame()
-        df_hottest_word['hottest_word_1'] = top_words.apply(lambda x: x[0] if len(x) > 0 else None)
-        df_hottest_word['hottest_word_2'] = top_words.apply(lambda x: x[1] if len(x) > 1 else None)
-        df_hottest_word['hottest_word_3'] = top_words.apply(lambda x: x[2] if len(x) > 2 else None)
-        df_hottest_word['hottest_word_4'] = top_words.apply(lambda x: x[3] if len(x) > 3 else None)
-        df_hottest_word['hottest_word_5'] = top_words.apply(lambda x: x[4] if len(x) > 4 else None)
+        Returns:
+            _TfidfVectorizer_: _the fitted vectorizer, also set as `vectorizer`_
+        """
+        counts = None
+        num_docs = 0
+
+        for clean_text in self.iter_clean_data(chunks, text_column):
+            chunk_counts = count_terms(clean_text, (1, self.n_range))
+            counts = chunk_counts if counts is None else merge_term_counts([counts, chunk_counts])
+            num_docs += len(clean_text)
+
+        if counts is None:
+            raise ValueError("No chunks to fit.")
+
+        vocabulary = select_vocabulary(counts, num_docs, min_df=self.min_df, max_features=self.max_features)
+        self.vectorizer = build_vectorizer(vocabulary, num_docs, ngram_range=(1, self.n_range))
+
+        return self.vectorizer
+
+    def iter_hottest_word(
+            self,
+            chunks: Union[Iterable[Chunk], Callable[[], Iterable[Chunk]]],
+            text_column: str = "reviewText"
+        ) -> Iterator[pd.DataFrame]:
+        """Yields the 5 hottest words of the texts of each chunk, like `hottest_word` on all texts at once,
+        with memory bound by the size of a chunk. `df` is not used and can be None.
+
+        The chunks are read twice, to fit the vectorizer and then to transform them,
+        so `chunks` must be a function returning a new iterator, eg. `lambda: AmazonReviewsExtractor(path)`,
+        or an iterable that can be iterated twice, eg. a list of Parquet files read lazily.
+        Texts are cleaned in both passes, use a `cache` to only clean them once.
+
+        Yields:
+            _DataFrame_: _DataFrame with 5 hottest_word of each text of the chunk, with the index of the chunk_
+        """
+        if not callable(chunks):
+            if iter(chunks) is chunks:
+                raise ValueError("chunks are read twice, pass a function that returns a new iterator of chunks.")
+
+            chunks = partial(iter, chunks)
+
+        vectorizer = self.fit_chunks(chunks(), text_column)
+        feature_names = vectorizer.get_feature_names_out()
+
+        for clean_text in self.iter_clean_data(chunks(), text_column):
+            hottest_word_vector = vectorizer.transform(clean_text)
+            df_hottest_word = self._hottest_word_frame(hottest_word_vector, feature_names)
+            df_hottest_word.index = clean_text.index
+
+            yield df_hottest_word
+
+    def _hottest_word_frame(self, hottest_word_vector: sp.spmatrix, feature_names: np.ndarray) -> pd.DataFrame:
+        """The 5 hottest words of each row of the sparse tf-idf scores,
+        the same words as `get_top_words` on each dense row, see `top_k_per_row`.
+        """
+        top_columns, _ = top_k_per_row(hottest_word_vector, k=5)
+        top_words = np.where(top_columns >= 0, np.asarray(feature_names, dtype=object)[top_columns], None)
+
+        df_hottest_word = pd.DataFrame(
+            top_words, columns=[f'hottest_word_{n}' for n in range(1, 6)], dtype=object
+        )
 
         return df_hottest_word
 
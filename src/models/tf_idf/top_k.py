@@ -0,0 +1,57 @@
+import numpy as np
+import scipy.sparse as sp
+
+from typing import Tuple
+
+# Top-k extraction from sparse score matrices, eg. the n-grams with the highest TF-IDF score of each document.
+# Works on the non-zeros of the CSR matrix only, memory is proportional to the number of non-zeros.
+
+
+def top_k_per_row(
+        matrix: sp.spmatrix,
+        k: int = 5
+    ) -> Tuple[np.ndarray, np.ndarray]:
+
+    """
+    The columns and scores of the `k` largest positive scores of each row, in descending order of score.
+    Ties are broken by the lower column, like `pd.Series.nlargest` on the dense row.
+    Rows with less than `k` positive scores are padded with column `-1` and score `0`.
+
+    The non-zeros of all rows are sorted at once by row and score, with a stable sort of the columns in each row,
+    and the first `k` of each row segment are kept.
+
+    ## Params
+    matrix: scipy sparse matrix,
+        the scores, converted to CSR if needed.
+
+    k: int,
+        the number of columns to return for each row.
+
+    ## Examples
+        >>> columns, scores = top_k_per_row(vectorizer.transform(texts), k=5)
+        >>> np.where(columns >= 0, vectorizer.get_feature_names_out()[columns], None)
+    """
+    matrix = sp.csr_matrix(matrix)
+    num_rows = matrix.shape[0]
+
+    if not matrix.has_sorted_indices:
+        matrix = matrix.sorted_indices()
+
+    rows = np.repeat(np.arange(num_rows), np.diff(matrix.indptr))
+    is_positive = matrix.data > 0
+    rows, columns, scores = rows[is_positive], matrix.indices[is_positive], matrix.data[is_positive]
+
+    # lexsort sorts by the last key first and is stable, so equal scores stay in the order of their columns
+    order = np.lexsort((-scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+
+    counts = np.bincount(rows, minlength=num_rows)
+    rank = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    is_top = rank < k
+
+    top_columns = np.full((num_rows, k), -1, dtype=np.int64)
+    top_scores = np.zeros((num_rows, k), dtype=matrix.dtype)
+    top_columns[rows[is_top], rank[is_top]] = columns[is_top]
+    top_scores[rows[is_top], rank[is_top]] = scores[is_top]
+
+    return top_columns, top_scores
@@ -0,0 +1,228 @@
+import sqlite3
+import hashlib
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from typing import List, Optional, Union, Callable, Dict, Any, Sequence
+
+
+class CleanTextCache:
+    """
+    Persistent cache of cleaned texts in a SQLite file, so that texts are only cleaned once across runs.
+
+    Entries are keyed by a hash of the raw text and a `fingerprint` of the cleaning configuration,
+    so texts cleaned with another configuration are misses and eventually evicted.
+    Lookups and inserts are batched, a batch of texts is looked up with a single join in SQLite.
+    When the cleaned texts exceed `max_bytes`, the least recently used entries are evicted.
+
+    ## Examples
+        >>> cache = CleanTextCache("clean_text.sqlite", fingerprint=cleaning_fingerprint())
+        >>> clean_text = cache.clean(df["reviewText"], clean_reviews)
+        >>> cache.stats()["hit_rate"]
+    """
+
+    def __init__(
+            self,
+            path: Union[str, os.PathLike],
+            fingerprint: str = "",
+            max_bytes: int = 1 << 30,
+            evict_to: float = 0.9
+        ) -> None:
+
+        """
+        ## Params
+        path: pathlike,
+            the SQLite file of the cache, created if it does not exist.
+
+        fingerprint: str,
+            identifies the cleaning configuration, eg. from `cleaning_fingerprint`.
+
+        max_bytes: int,
+            the maximum size of the cleaned texts and keys in the cache, in bytes.
+
+        evict_to: float,
+            when the cache is full, least recently used entries are evicted until it is at `evict_to * max_bytes`,
+            so that eviction does not run on every insert.
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.evict_to = evict_to
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # The fingerprint personalizes the hash of the texts, blake2b takes at most 16 bytes of personalization
+        self._person = hashlib.blake2b(fingerprint.encode(), digest_size=16).digest()
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS clean_text "
+            "(key BLOB PRIMARY KEY, clean TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS clean_text_last_used ON clean_text (last_used)")
+        self._connection.execute("CREATE TEMP TABLE lookup (position INTEGER PRIMARY KEY, key BLOB NOT NULL)")
+        self._connection.commit()
+
+        self._size = self._stored_size()
+
+        if self._size > self.max_bytes:
+            self._evict(self._size - int(self.evict_to * self.max_bytes))
+
+
+    def __enter__(self) -> "CleanTextCache":
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[str]]:
+        """
+        The cleaned texts of `texts`, None for texts not in the cache.
+        """
+        keys = [self._key(text) for text in texts]
+        cleaned: List[Optional[str]] = [None] * len(keys)
+
+        with self._connection:
+            self._connection.execute("DELETE FROM lookup")
+            self._connection.executemany("INSERT INTO lookup VALUES (?, ?)", enumerate(keys))
+
+            for position, clean in self._connection.execute(
+                "SELECT lookup.position, clean_text.clean FROM lookup JOIN clean_text ON clean_text.key = lookup.key"
+            ):
+                cleaned[position] = clean
+
+            self._connection.execute(
+                "UPDATE clean_text SET last_used = ? WHERE key IN (SELECT key FROM lookup)", (time.time(),)
+            )
+
+        num_hits = sum(clean is not None for clean in cleaned)
+        self.hits += num_hits
+        self.misses += len(cleaned) - num_hits
+
+        return cleaned
+
+
+    def put_many(
+            self,
+            texts: Sequence[str],
+            cleaned: Sequence[str]
+        ) -> None:
+
+        """
+        Adds the `cleaned` texts of `texts` to the cache, and evicts entries if it is full.
+
+        The stored size is kept up to date from the sizes of the added and replaced entries,
+        so the cost of a batch does not grow with the cache.
+        """
+        now = time.time()
+        entries = {
+            self._key(text): (clean, 16 + len(clean.encode("utf-8", "surrogatepass")))
+            for text, clean in zip(texts, cleaned)
+        }
+
+        with self._connection:
+            self._connection.execute("DELETE FROM lookup")
+            self._connection.executemany("INSERT INTO lookup VALUES (?, ?)", enumerate(entries))
+
+            replaced_size = self._connection.execute(
+                "SELECT COALESCE(SUM(clean_text.size), 0) FROM lookup JOIN clean_text ON clean_text.key = lookup.key"
+            ).fetchone()[0]
+
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO clean_text VALUES (?, ?, ?, ?)",
+                ((key, clean, size, now) for key, (clean, size) in entries.items())
+            )
+
+        self._size += sum(size for _, size in entries.values()) - replaced_size
+
+        if self._size > self.max_bytes:
+            self._evict(self._size - int(self.evict_to * self.max_bytes))
+
+
+    def clean(
+            self,
+            text: pd.Series,
+            clean_function: Callable[[pd.Series], pd.Series]
+        ) -> pd.Series:
+
+        """
+        Cleans a Series of texts, with `clean_function` for the texts not in the cache, which are then added to it.
+        Nulls are kept as nulls.
+        """
+        values = text.to_numpy(dtype=object, copy=True)
+        not_null = text.notna().to_numpy()
+
+        cached = self.get_many(values[not_null].tolist())
+        missing = np.flatnonzero(not_null)[[clean is None for clean in cached]]
+        values[not_null] = cached
+
+        if len(missing):
+            missing_text = text.iloc[missing]
+            missing_cleaned = clean_function(missing_text).tolist()
+
+            values[missing] = missing_cleaned
+            self.put_many(missing_text.tolist(), missing_cleaned)
+
+        return pd.Series(values, index=text.index, name=text.name, dtype=object)
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hits, misses and evictions since the cache was opened, and the number of entries and bytes stored.
+        """
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "entries": self._connection.execute("SELECT COUNT(*) FROM clean_text").fetchone()[0],
+            "bytes": self._size,
+        }
+
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16, person=self._person).digest()
+
+
+    def _stored_size(self) -> int:
+        """
+        The size of all entries, only summed when the cache is opened.
+        """
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM clean_text").fetchone()[0]
+
+
+    def _evict(self, num_bytes: int) -> None:
+        """
+        Evicts the least recently used entries, at least `num_bytes` of them.
+        """
+        keys = []
+        freed = 0
+
+        for key, size in self._connection.execute("SELECT key, size FROM clean_text ORDER BY last_used"):
+            if freed >= num_bytes:
+                break
+
+            keys.append((key,))
+            freed += size
+
+        with self._connection:
+            self._connection.executemany("DELETE FROM clean_text WHERE key = ?", keys)
+
+        self.evictions += len(keys)
+        self._size -= freed
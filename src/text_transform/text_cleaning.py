@@ -0,0 +1,151 @@
+import re
+import hashlib
+import warnings
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from typing import Optional, Union, Iterable, FrozenSet
+
+# Batch text cleaning engine for the TF-IDF models.
+# Removes html, everything except letters and stop words, with the same output as cleaning each text on its own,
+# see `review_to_words`, but with the stop words loaded once and the letters extracted from whole batches.
+
+NON_LETTERS_PATTERN = re.compile(r"[^a-zA-Z]")
+
+# Texts without a match have no tags, comments or entities, so html parsing leaves their letters unchanged
+MARKUP_PATTERN = r"<[a-zA-Z/!?]|&[#a-zA-Z]"
+
+CLEANING_VERSION = "1"
+
+# Maps the utf-8 bytes of a text to its lowercased letters, every other byte to a space
+_LETTERS_TABLE = bytes(
+    byte + 32 if 65 <= byte <= 90 else byte if 97 <= byte <= 122 else 32 for byte in range(256)
+)
+
+
+@lru_cache(maxsize=None)
+def english_stop_words() -> FrozenSet[str]:
+    """
+    The english stop words of nltk, loaded once per process.
+    """
+    from nltk.corpus import stopwords
+
+    return frozenset(stopwords.words("english"))
+
+
+def cleaning_fingerprint(stop_words: Optional[Iterable[str]] = None) -> str:
+    """
+    Identifies the output of `clean_reviews` with `stop_words`, eg. for a `CleanTextCache`.
+    Change `CLEANING_VERSION` when the cleaning changes.
+    """
+    stop_words = english_stop_words() if stop_words is None else frozenset(stop_words)
+
+    return hashlib.sha256("\n".join([CLEANING_VERSION, *sorted(stop_words)]).encode()).hexdigest()
+
+
+def review_to_words(
+        raw_review: str,
+        stop_words: Optional[Iterable[str]] = None
+    ) -> str:
+
+    """
+    Removes html tags, everything except letters, and stop words of a single text, and lowercases it.
+
+    ## Params
+    raw_review: str,
+        the text to clean.
+
+    stop_words: list of str, optional,
+        the words to remove, default is the english stop words of nltk.
+    """
+    stop_words = english_stop_words() if stop_words is None else frozenset(stop_words)
+
+    review_text = _get_text(raw_review)
+    words = NON_LETTERS_PATTERN.sub(" ", review_text).lower().split()
+
+    return " ".join(word for word in words if word not in stop_words)
+
+
+def clean_reviews(
+        text: Union[pd.Series, pa.Array, pa.ChunkedArray],
+        stop_words: Optional[Iterable[str]] = None,
+        workers: Optional[int] = None,
+        batch_size: int = 50_000
+    ) -> pd.Series:
+
+    """
+    Cleans a batch of texts like `review_to_words`, with identical output. Nulls are kept as nulls.
+
+    Only texts that can contain tags or entities are parsed as html.
+    Letters are extracted with a byte translation table and stop words are loaded once.
+
+    ## Params
+    text: pd.Series or pyarrow string array,
+        the texts to clean.
+
+    stop_words: list of str, optional,
+        the words to remove, default is the english stop words of nltk.
+
+    workers: int, optional,
+        if specified batches of `batch_size` texts are cleaned in a pool of `workers` processes.
+
+    batch_size: int,
+        the number of texts each worker cleans at a time.
+
+    ## Examples
+        >>> clean_reviews(pd.Series(["<p>This is <b>GREAT</b>!</p>", None]))
+        0    great
+        1     None
+        dtype: object
+    """
+    if isinstance(text, (pa.Array, pa.ChunkedArray)):
+        text = text.to_pandas()
+
+    stop_words = english_stop_words() if stop_words is None else frozenset(stop_words)
+
+    if not workers or len(text) <= batch_size:
+        return _clean_batch(text, stop_words)
+
+    batches = [text.iloc[start:start + batch_size] for start in range(0, len(text), batch_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return pd.concat(list(pool.map(partial(_clean_batch, stop_words=stop_words), batches)))
+
+
+def _clean_batch(
+        text: pd.Series,
+        stop_words: FrozenSet[str]
+    ) -> pd.Series:
+
+    text = text.astype(object)
+    not_null = text.notna().to_numpy()
+    values = text.to_numpy(copy=True)
+
+    if not not_null.any():
+        return pd.Series(values, index=text.index, name=text.name, dtype=object)
+
+    has_markup = np.zeros(len(values), dtype=bool)
+    has_markup[not_null] = text[not_null].str.contains(MARKUP_PATTERN, regex=True).to_numpy(dtype=bool)
+    values[has_markup] = [_get_text(value) for value in values[has_markup]]
+
+    # Translated texts only hold letters and spaces, so they are joined and split again at line breaks
+    letters = b"\n".join([value.encode().translate(_LETTERS_TABLE) for value in values[not_null]])
+
+    values[not_null] = [
+        " ".join([word for word in words.split() if word not in stop_words])
+        for words in letters.decode("ascii").split("\n")
+    ]
+
+    return pd.Series(values, index=text.index, name=text.name, dtype=object)
+
+
+def _get_text(raw_review: str) -> str:
+    # The parser is left for BeautifulSoup to choose, as before, which warns about it on every call
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+
+        return BeautifulSoup(raw_review).get_text()
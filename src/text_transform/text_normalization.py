@@ -0,0 +1,173 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from typing import Optional, Union
+
+# Shared text normalization kernel for the extractors.
+# Collapses runs of whitespace to single spaces and truncates texts to a maximum number of words,
+# implemented with vectorized string kernels for each of the dataframe engines.
+
+WHITESPACE_PATTERN = r"\s+"
+
+# The characters other than a space that `str.split` splits on, ascii whitespace, ascii separators and unicode spaces
+OTHER_WHITESPACE_CHARACTERS = r"\t\n\v\f\r\x1c-\x1f\x85\xa0\x{1680}\x{2000}-\x{200a}\x{2028}\x{2029}\x{202f}\x{205f}\x{3000}"
+
+# Matches double spaces, and any character other than printable ascii, ie. other kinds of whitespace
+IRREGULAR_WHITESPACE_PATTERN = r"[^ -~]|  "
+
+# Matches runs of whitespace, and single whitespace characters other than a space
+COLLAPSE_PATTERN = f"[ {OTHER_WHITESPACE_CHARACTERS}]{{2,}}|[{OTHER_WHITESPACE_CHARACTERS}]"
+
+# Matches the words of a text, the same as `str.split` without arguments
+WORD_PATTERN = f"[^ {OTHER_WHITESPACE_CHARACTERS}]+"
+
+# The maximum repetition count of RE2, longer truncations split the texts into lists of words instead
+MAXIMUM_REGEX_WORDS = 1000
+
+
+def normalize_text_arrow(
+        text: Union[pa.Array, pa.ChunkedArray],
+        maximum_words: Optional[int] = None,
+        batch_size: int = 65_536,
+        threads: Optional[int] = None
+    ) -> pa.Array:
+
+    """
+    Strips and collapses whitespace in a string array, splitting on the same whitespace as `str.split`,
+    and keeps at most `maximum_words` words of each text if specified. Nulls are kept as nulls.
+
+    Only texts that can change are rewritten, with regex kernels:
+    texts with irregular whitespace are collapsed, and texts of more than `2 * maximum_words` characters are truncated.
+    Arrow kernels release the GIL, so batches of `batch_size` texts can be normalized in parallel threads.
+
+    ## Params
+    text: pyarrow string array,
+        the texts to normalize.
+
+    maximum_words: int, optional,
+        the maximum number of words to keep of each text.
+
+    batch_size: int,
+        the number of texts to normalize in each thread.
+
+    threads: int, optional,
+        the number of threads, default is `pyarrow.cpu_count()`.
+        Use 1 when already running in a pool of processes, eg. the workers of `AmazonReviewsExtractor`.
+    """
+    if isinstance(text, pa.ChunkedArray):
+        text = text.combine_chunks()
+
+    threads = threads or pa.cpu_count()
+
+    if len(text) <= batch_size or threads == 1:
+        return _normalize_batch(text, maximum_words)
+
+    with ThreadPoolExecutor(threads) as pool:
+        batches = pool.map(
+            partial(_normalize_batch, maximum_words=maximum_words),
+            [text.slice(start, batch_size) for start in range(0, len(text), batch_size)]
+        )
+
+        return pa.concat_arrays(list(batches))
+
+
+def _normalize_batch(
+        text: pa.Array,
+        maximum_words: Optional[int] = None
+    ) -> pa.Array:
+
+    """
+    Normalizes a single batch of texts, see `normalize_text_arrow`.
+    """
+    text = pa.compute.utf8_trim_whitespace(text)
+    irregular = pa.compute.match_substring_regex(text, IRREGULAR_WHITESPACE_PATTERN).fill_null(False)
+
+    if pa.compute.any(irregular).as_py():
+        text = pa.compute.replace_with_mask(text, irregular, _collapse(pa.compute.filter(text, irregular)))
+
+    if not maximum_words:
+        return text
+
+    # A text of at most 2 * maximum_words characters can not have more than maximum_words words
+    long = pa.compute.greater(pa.compute.binary_length(text), 2 * maximum_words).fill_null(False)
+
+    if not pa.compute.any(long).as_py():
+        return text
+
+    return pa.compute.replace_with_mask(text, long, _truncate(pa.compute.filter(text, long), maximum_words))
+
+
+def _collapse(text: pa.Array) -> pa.Array:
+    """
+    Replaces runs of whitespace with single spaces, and strips the texts.
+    """
+    return pa.compute.utf8_trim(pa.compute.replace_substring_regex(text, COLLAPSE_PATTERN, " "), " ")
+
+
+def _truncate(
+        text: pa.Array,
+        maximum_words: int
+    ) -> pa.Array:
+
+    """
+    Keeps the first `maximum_words` words of collapsed texts, whose words are separated by single spaces.
+    """
+    if maximum_words > MAXIMUM_REGEX_WORDS:
+        words = pa.compute.split_pattern(text, " ", max_splits=maximum_words)
+
+        return pa.compute.binary_join(pa.compute.list_slice(words, 0, maximum_words), " ")
+
+    # Texts with less words do not match, and are kept as they are
+    match = pa.compute.extract_regex(text, f"^(?P<words>(?:[^ ]+ ){{{maximum_words - 1}}}[^ ]+)")
+
+    return pa.compute.if_else(match.is_valid(), match.field("words"), text)
+
+
+def normalize_text_pandas(
+        text: pd.Series,
+        maximum_words: Optional[int] = None,
+        threads: Optional[int] = None
+    ) -> pd.Series:
+
+    """
+    Same as `normalize_text_arrow` for a pandas Series,
+    the texts are run through the Arrow kernel and returned with the original index.
+    """
+    normalized = normalize_text_arrow(
+        pa.array(text, type=pa.string(), from_pandas=True),
+        maximum_words,
+        threads = threads
+    )
+
+    return pd.Series(
+        normalized.to_numpy(zero_copy_only=False),
+        index = text.index,
+        name = text.name
+    )
+
+
+def normalize_text_spark(
+        text,
+        maximum_words: Optional[int] = None
+    ):
+
+    """
+    Same as `normalize_text_arrow` for a `pyspark.sql.Column`, built from native Spark SQL functions.
+
+    ## Examples
+        >>> df.withColumn("reviewText", normalize_text_spark(F.col("reviewText"), 100))
+    """
+    from pyspark.sql import functions as F
+
+    text = F.regexp_replace(text, r"^\s+|\s+$", "")
+
+    if not maximum_words:
+        return F.regexp_replace(text, WHITESPACE_PATTERN, " ")
+
+    return F.array_join(
+        F.slice(F.split(text, WHITESPACE_PATTERN), 1, maximum_words),
+        " "
+    )
@@ -0,0 +1,55 @@
+import json
+
+import pyarrow as pa
+
+from src.etl.amazon_reviews.ArrowAmazonReviewsExtractor import ArrowAmazonReviewsExtractor
+
+
+def write_reviews(path, num_rows=4000, style_from=3000):
+    """
+    Writes reviews where only the rows from `style_from` have a `style`, with other keys in the last rows,
+    so the field is missing from the first blocks and inferred differently in the later ones.
+    """
+    with open(path, "w") as file:
+        for i in range(num_rows):
+            review = {"overall": float(i % 5 + 1), "reviewText": f"review number {i}", "unixReviewTime": 1420156800 + i}
+
+            if i >= style_from:
+                review["style"] = {"Format:": " Paperback"} if i < (style_from + num_rows) // 2 else {"Size:": " Large"}
+
+            file.write(json.dumps(review) + "\n")
+
+
+def extract(path, **kwargs):
+    return ArrowAmazonReviewsExtractor(
+        path,
+        blocksize = 1 << 16,
+        balance_num_pos_neg_ratings = False,
+        **kwargs
+    ).load()
+
+
+def test_fields_only_in_later_blocks(tmp_path):
+    path = tmp_path / "reviews.json"
+    write_reviews(path)
+
+    for features in [None, ["overall", "reviewText", "style"]]:
+        for max_chunksize in [500_000, 1500]:
+            table = extract(path, features=features, max_chunksize=max_chunksize)
+
+            assert table.num_rows == 4000
+            assert table.schema.field("style").type == pa.struct([("Format:", pa.string()), ("Size:", pa.string())])
+            assert table["style"].null_count == 3000
+            assert table["style"][3200].as_py() == {"Format:": " Paperback", "Size:": None}
+            assert table["style"][3700].as_py() == {"Format:": None, "Size:": " Large"}
+            assert table["reviewText"][3700].as_py() == "review number 3700"
+
+
+def test_requested_field_missing_from_file(tmp_path):
+    path = tmp_path / "reviews.json"
+    write_reviews(path, style_from=4000)
+
+    table = extract(path, features=["overall", "reviewText", "style"])
+
+    assert table.column_names == ["overall", "reviewText", "style"]
+    assert table["style"].null_count == 4000